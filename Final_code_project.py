@@ -1,9 +1,23 @@
 """Smart Packing List - Short Trips (< 4 days)"""
 
-from datetime import datetime, date
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+from enum import IntEnum
+from functools import lru_cache
+import heapq
+import itertools
+from math import gcd
+import os
 import re
+import sys
+import threading
+import time
 import unicodedata
-from copy import deepcopy
+
+import instrumentation as metrics
 
 # -----------------------
 # Global state
@@ -83,6 +97,7 @@ def _yes_no(prompt):
 
 
 def ask_trip_start_date():
+    from datetime import date
     print()
     print("When does your trip start? Example: 25 10 14")
     while True:
@@ -332,12 +347,18 @@ def _strip_accents(s: str) -> str:
     return ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
 
 
+_PAREN_RE = re.compile(r'\(.*?\)')
+_AIRLINE_WORD_RE = re.compile(r'\b(airlines?|airways)\b')
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+_SPACES_RE = re.compile(r'\s+')
+
+
 def _normalize_name(s: str) -> str:
     s = _strip_accents(s.lower())
-    s = re.sub(r'\(.*?\)', ' ', s)              
-    s = re.sub(r'\b(airlines?|airways)\b', ' ', s) 
-    s = re.sub(r'[^a-z0-9]+', ' ', s)             
-    return re.sub(r'\s+', ' ', s).strip()
+    s = _PAREN_RE.sub(' ', s)
+    s = _AIRLINE_WORD_RE.sub(' ', s)
+    s = _NON_ALNUM_RE.sub(' ', s)
+    return _SPACES_RE.sub(' ', s).strip()
 
 
 def build_airline_index(AIRLINES: dict) -> dict:
@@ -373,6 +394,104 @@ def build_airline_index(AIRLINES: dict) -> dict:
     return idx
 
 
+# Bump after editing AIRLINES in place so the cached index is rebuilt.
+AIRLINES_VERSION = 0
+_AIRLINE_INDEX_CACHE = {"airlines": None, "key": None, "index": None}
+
+
+def invalidate_airline_index():
+    global AIRLINES_VERSION
+    AIRLINES_VERSION += 1
+
+
+def get_airline_index(airlines=None):
+    """build_airline_index, built once and reused until the table changes.
+
+    The cache holds the table itself (compared with `is`, never by id(), which
+    a new dict can reuse) and is keyed on AIRLINES_VERSION.
+    """
+    airlines = AIRLINES if airlines is None else airlines
+    cache = _AIRLINE_INDEX_CACHE
+    if cache["airlines"] is not airlines or cache["key"] != AIRLINES_VERSION:
+        cache.update(airlines=airlines, key=AIRLINES_VERSION, index=build_airline_index(airlines))
+    return cache["index"]
+
+
+@lru_cache(maxsize=4096)
+def _query_keys(user_text):
+    key = _normalize_name(user_text)
+    return key, key.replace(" ", "")
+
+
+@metrics.timed("airline.lookup")
+def get_airline_info(airline_name, airlines=None):
+    if not airline_name:
+        return None
+    key1, key2 = _query_keys(airline_name)
+    index = get_airline_index(airlines)
+    return index.get(key1) or index.get(key2)
+
+
+# Fuzzy search: character trigrams of the compact keys -> inverted index.
+_FUZZY_INDEX_CACHE = {"index": None, "fuzzy": None}
+
+
+def _trigrams(key):
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def build_trigram_index(index: dict) -> dict:
+    """compact airline key -> trigrams, inverted as trigram -> keys"""
+    records, sizes, postings = {}, {}, {}
+    for key, rec in index.items():
+        compact = key.replace(" ", "")
+        if compact in records:
+            continue
+        grams = _trigrams(compact)
+        records[compact] = rec
+        sizes[compact] = len(grams)
+        for g in grams:
+            postings.setdefault(g, []).append(compact)
+    return {"records": records, "sizes": sizes, "postings": postings}
+
+
+def get_trigram_index(airlines=None):
+    index = get_airline_index(airlines)
+    if _FUZZY_INDEX_CACHE["index"] is not index:   # rebuilt along with the exact index
+        _FUZZY_INDEX_CACHE.update(index=index, fuzzy=build_trigram_index(index))
+    return _FUZZY_INDEX_CACHE["fuzzy"]
+
+
+@metrics.timed("airline.search")
+def search_airlines(query, k=5, airlines=None, min_score=0.3):
+    """Top-k (score, record) pairs for a possibly misspelled airline name.
+
+    Score is the Dice overlap of trigrams (1.0 = same key). Only keys sharing
+    at least one trigram with the query are looked at.
+    """
+    if not query:
+        return []
+    _, compact = _query_keys(query)
+    if not compact:
+        return []
+    fuzzy = get_trigram_index(airlines)
+    grams = _trigrams(compact)
+    shared = {}
+    for g in grams:
+        for key in fuzzy["postings"].get(g, ()):
+            shared[key] = shared.get(key, 0) + 1
+
+    best = {}   # one entry per airline, aliases included
+    for key, n in shared.items():
+        score = 2.0 * n / (len(grams) + fuzzy["sizes"][key])
+        rec = fuzzy["records"][key]
+        if score >= min_score and score > best.get(id(rec), (0.0, None))[0]:
+            best[id(rec)] = (round(score, 3), rec)
+    ranked = heapq.nlargest(k, best.values(), key=lambda pair: pair[0])
+    return ranked
+
+
 def _ask_weight_kg():
     while True:
         try:
@@ -390,27 +509,71 @@ def _ask_weight_kg():
 _dim_re = re.compile(r'^\s*(\d{2,3})\s*[x×]\s*(\d{2,3})\s*[x×]\s*(\d{2,3})\s*$')
 
 
+def parse_dimensions(raw: str):
+    """'55 x 40 x 23' -> '55×40×23' (None if it doesn't look like L×W×H)"""
+    if not raw:
+        return None
+    raw = raw.lower().replace(" ", "")
+    match = _dim_re.match(raw.replace('×', 'x'))
+    if not match:
+        return None
+    L, W, H = match.groups()
+    return f"{L}×{W}×{H}"
+
+
+_dims_in_text_re = re.compile(r'(\d{2,3})\s*[x×]\s*(\d{2,3})\s*[x×]\s*(\d{2,3})')
+
+
+def dimensions_to_cm(raw):
+    """'55×40×24 (48×33×20 on Regional)' -> (55, 40, 24); the first L×W×H wins, None if none."""
+    if not raw:
+        return None
+    match = _dims_in_text_re.search(raw.lower())
+    return tuple(int(x) for x in match.groups()) if match else None
+
+
+BAG_FILL_FACTOR = 0.85   # soft packing never fills a case right into the corners
+
+
+def bag_volume_l(dims_cm, fill=BAG_FILL_FACTOR):
+    """Usable volume in litres of a bag of outer size L×W×H cm (tuple or string); None if unknown."""
+    if isinstance(dims_cm, str):
+        dims_cm = dimensions_to_cm(dims_cm)
+    if not dims_cm:
+        return None
+    L, W, H = dims_cm
+    return round(L * W * H / 1000 * fill, 1)
+
+
+# Numeric size on every airline record, next to the display string
+for _rec in AIRLINES.values():
+    _rec["dims_cm"] = dimensions_to_cm(_rec.get("dimensions_cm"))
+
+
 def _ask_dimensions_cm():
     while True:
-        raw = input("Enter max dimensions in cm (e.g., 55x40x23): ").lower().replace(" ", "")
-        raw = raw.replace('x', '×')
-        match = _dim_re.match(raw.replace('×', 'x'))
-        if not match:
+        dims = parse_dimensions(input("Enter max dimensions in cm (e.g., 55x40x23): "))
+        if not dims:
             print("Please use a pattern like 55x40x23 (only numbers).")
             continue
-        L, W, H = match.groups()
-        return f"{L}×{W}×{H}"
+        return dims
 
 
 def ask_airline_by_name(AIRLINES, STATE):
-    index = build_airline_index(AIRLINES)
-
     print("\nWhich airline are you travelling with?")
     user_airline = input("Type your airline name: ").strip()
-    key1 = _normalize_name(user_airline)
-    key2 = key1.replace(" ", "")
 
-    rec = index.get(key1) or index.get(key2)
+    rec = get_airline_info(user_airline, AIRLINES)
+
+    if not rec:
+        suggestions = search_airlines(user_airline, k=3, airlines=AIRLINES)
+        if suggestions:
+            print("\nDid you mean:")
+            for n, (_, candidate) in enumerate(suggestions, start=1):
+                print(f"  {n}. {candidate['airline']}")
+            pick = input("Enter a number (or press Enter if none match): ").strip()
+            if pick.isdigit() and 1 <= int(pick) <= len(suggestions):
+                rec = suggestions[int(pick) - 1][1]
 
     if rec:
         weight = rec.get("weight_kg")
@@ -486,24 +649,34 @@ activity_template = {
 }
 
 activity_weight = {
-    "Daypack":               {"weather": "All", "weight": 0.50},
-    "City Walking Shoes":    {"weather": "All", "weight": 0.80},
-    "Camera":                {"weather": "All", "weight": 0.40},
-    "Gift / Small Present":  {"weather": "All", "weight": 0.30},
-    "Swim Goggles":          {"weather": "All", "weight": 0.10},
-    "Beach Towel":           {"weather": "All", "weight": 0.40},
-    "Rash Guard / Wetsuit":  {"weather": "All", "weight": 0.70},
-    "Hiking Boots":          {"weather": "All", "weight": 1.20},
-    "Rain Jacket":           {"weather": "All", "weight": 0.40},
-    "Day Hiking Pack":       {"weather": "All", "weight": 0.60},
-    "Notebook / Laptop":     {"weather": "All", "weight": 1.50},
-    "Notebook / Study Materials": {"weather": "All", "weight": 0.80},
-    "Shirt / Blouse (Formal)": {"weather": "All", "weight": 0.20},
-    "Dress / Suit":          {"weather": "All", "weight": 0.80},
-    "Formal Shoes":          {"weather": "All", "weight": 1.00},
+    "Daypack":               {"weather": "All", "weight": 0.50, "volume_l": 2.0},
+    "City Walking Shoes":    {"weather": "All", "weight": 0.80, "volume_l": 4.5},
+    "Camera":                {"weather": "All", "weight": 0.40, "volume_l": 1.5},
+    "Gift / Small Present":  {"weather": "All", "weight": 0.30, "volume_l": 1.0},
+    "Swim Goggles":          {"weather": "All", "weight": 0.10, "volume_l": 0.3},
+    "Beach Towel":           {"weather": "All", "weight": 0.40, "volume_l": 2.5},
+    "Rash Guard / Wetsuit":  {"weather": "All", "weight": 0.70, "volume_l": 3.0},
+    "Hiking Boots":          {"weather": "All", "weight": 1.20, "volume_l": 6.0},
+    "Rain Jacket":           {"weather": "All", "weight": 0.40, "volume_l": 1.0},
+    "Day Hiking Pack":       {"weather": "All", "weight": 0.60, "volume_l": 3.0},
+    "Notebook / Laptop":     {"weather": "All", "weight": 1.50, "volume_l": 2.0},
+    "Notebook / Study Materials": {"weather": "All", "weight": 0.80, "volume_l": 1.5},
+    "Shirt / Blouse (Formal)": {"weather": "All", "weight": 0.20, "volume_l": 0.8},
+    "Dress / Suit":          {"weather": "All", "weight": 0.80, "volume_l": 3.0},
+    "Formal Shoes":          {"weather": "All", "weight": 1.00, "volume_l": 4.5},
 }
 
 
+ACTIVITIES = [
+    "Sightseeing",
+    "Family / Friends",
+    "Swimming / Surfing",
+    "Outdoor / Adventure",
+    "Work / Study",
+    "Formal Event / Party"
+]
+
+
 def choose_activities():
     print("\nWhat activities will you do on this trip?")
     print("1. Sightseeing")
@@ -513,18 +686,9 @@ def choose_activities():
     print("5. Work / Study")
     print("6. Formal Event / Party")
 
-    activities = [
-        "Sightseeing",
-        "Family / Friends",
-        "Swimming / Surfing",
-        "Outdoor / Adventure",
-        "Work / Study",
-        "Formal Event / Party"
-    ]
-
     chosen = []
     print("\nAnswer yes/no for each activity:\n")
-    for name in activities:
+    for name in ACTIVITIES:
         ans = input(name + "? (yes/no): ").strip().lower()
         if ans.startswith("y"):
             chosen.append(name)
@@ -557,73 +721,73 @@ def temp():
             return "Hot"
         print("Please enter a number between 1 and 5.")
         
-#Hash table of clothes + weight
+#Hash table of clothes + weight (kg) + packed volume (litres)
 
 clothes = {
     # Freezing
-    "Heavy Coat":      {"weather": "Freezing", "weight": 1.0},
-    "Thermal Shirt":   {"weather": "Freezing", "weight": 0.25},
-    "Thermal Leggings":{"weather": "Freezing", "weight": 0.30},
-    "Wool Sweater":    {"weather": "Freezing", "weight": 0.50},
-    "Long-Sleeve Shirt":{"weather": "Freezing", "weight": 0.20},
-    "Jeans":           {"weather": "Freezing", "weight": 0.60},
-    "Winter Pants":    {"weather": "Freezing", "weight": 0.70},
-    "Scarf":           {"weather": "Freezing", "weight": 0.20},
-    "Beanie":          {"weather": "Freezing", "weight": 0.10},
-    "Gloves":          {"weather": "Freezing", "weight": 0.15},
-    "Thick Socks":     {"weather": "Freezing", "weight": 0.10},
-    "Undershirt":      {"weather": "Freezing", "weight": 0.15},
-    "Boots":           {"weather": "Freezing", "weight": 1.20},
+    "Heavy Coat":      {"weather": "Freezing", "weight": 1.0, "volume_l": 8.0},
+    "Thermal Shirt":   {"weather": "Freezing", "weight": 0.25, "volume_l": 0.8},
+    "Thermal Leggings":{"weather": "Freezing", "weight": 0.30, "volume_l": 0.8},
+    "Wool Sweater":    {"weather": "Freezing", "weight": 0.50, "volume_l": 2.0},
+    "Long-Sleeve Shirt":{"weather": "Freezing", "weight": 0.20, "volume_l": 0.7},
+    "Jeans":           {"weather": "Freezing", "weight": 0.60, "volume_l": 1.5},
+    "Winter Pants":    {"weather": "Freezing", "weight": 0.70, "volume_l": 2.0},
+    "Scarf":           {"weather": "Freezing", "weight": 0.20, "volume_l": 0.8},
+    "Beanie":          {"weather": "Freezing", "weight": 0.10, "volume_l": 0.4},
+    "Gloves":          {"weather": "Freezing", "weight": 0.15, "volume_l": 0.3},
+    "Thick Socks":     {"weather": "Freezing", "weight": 0.10, "volume_l": 0.3},
+    "Undershirt":      {"weather": "Freezing", "weight": 0.15, "volume_l": 0.5},
+    "Boots":           {"weather": "Freezing", "weight": 1.20, "volume_l": 6.0},
 
     # Cold
-    "Coat":            {"weather": "Cold", "weight": 0.80},
-    "Sweater":         {"weather": "Cold", "weight": 0.45},
-    "Cardigan":        {"weather": "Cold", "weight": 0.40},
-    "Long-Sleeve Shirt (Cold)": {"weather": "Cold", "weight": 0.20},
-    "Turtleneck":      {"weather": "Cold", "weight": 0.30},
-    "Jeans (Cold)":    {"weather": "Cold", "weight": 0.60},
-    "Warm Pants":      {"weather": "Cold", "weight": 0.70},
-    "Warm Socks":      {"weather": "Cold", "weight": 0.10},
-    "Closed Shoes":    {"weather": "Cold", "weight": 0.90},
-    "Scarf (Cold)":    {"weather": "Cold", "weight": 0.20},
-    "Beanie (Cold)":   {"weather": "Cold", "weight": 0.10},
+    "Coat":            {"weather": "Cold", "weight": 0.80, "volume_l": 6.0},
+    "Sweater":         {"weather": "Cold", "weight": 0.45, "volume_l": 1.8},
+    "Cardigan":        {"weather": "Cold", "weight": 0.40, "volume_l": 1.5},
+    "Long-Sleeve Shirt (Cold)": {"weather": "Cold", "weight": 0.20, "volume_l": 0.7},
+    "Turtleneck":      {"weather": "Cold", "weight": 0.30, "volume_l": 0.9},
+    "Jeans (Cold)":    {"weather": "Cold", "weight": 0.60, "volume_l": 1.5},
+    "Warm Pants":      {"weather": "Cold", "weight": 0.70, "volume_l": 1.8},
+    "Warm Socks":      {"weather": "Cold", "weight": 0.10, "volume_l": 0.3},
+    "Closed Shoes":    {"weather": "Cold", "weight": 0.90, "volume_l": 4.0},
+    "Scarf (Cold)":    {"weather": "Cold", "weight": 0.20, "volume_l": 0.8},
+    "Beanie (Cold)":   {"weather": "Cold", "weight": 0.10, "volume_l": 0.4},
 
     # Cool
-    "Light Jacket":    {"weather": "Cool", "weight": 0.40},
-    "Sweatshirt":      {"weather": "Cool", "weight": 0.35},
-    "Hoodie":          {"weather": "Cool", "weight": 0.45},
-    "T-shirt":         {"weather": "Cool", "weight": 0.15},
-    "Long-Sleeve Shirt (Cool)": {"weather": "Cool", "weight": 0.20},
-    "Jeans (Cool)":    {"weather": "Cool", "weight": 0.60},
-    "Chinos":          {"weather": "Cool", "weight": 0.50},
-    "Sneakers":        {"weather": "Cool", "weight": 0.70},
-    "Socks":           {"weather": "Cool", "weight": 0.05},
+    "Light Jacket":    {"weather": "Cool", "weight": 0.40, "volume_l": 2.0},
+    "Sweatshirt":      {"weather": "Cool", "weight": 0.35, "volume_l": 1.5},
+    "Hoodie":          {"weather": "Cool", "weight": 0.45, "volume_l": 2.0},
+    "T-shirt":         {"weather": "Cool", "weight": 0.15, "volume_l": 0.5},
+    "Long-Sleeve Shirt (Cool)": {"weather": "Cool", "weight": 0.20, "volume_l": 0.7},
+    "Jeans (Cool)":    {"weather": "Cool", "weight": 0.60, "volume_l": 1.5},
+    "Chinos":          {"weather": "Cool", "weight": 0.50, "volume_l": 1.2},
+    "Sneakers":        {"weather": "Cool", "weight": 0.70, "volume_l": 4.0},
+    "Socks":           {"weather": "Cool", "weight": 0.05, "volume_l": 0.2},
 
     # Warm
-    "Short-Sleeve Top": {"weather": "Warm", "weight": 0.12},
-    "T-shirt (Warm)":   {"weather": "Warm", "weight": 0.15},
-    "Light Pants":      {"weather": "Warm", "weight": 0.35},
-    "Shorts":           {"weather": "Warm", "weight": 0.20},
-    "Casual Dress":     {"weather": "Warm", "weight": 0.25},
-    "Sneakers (Warm)":  {"weather": "Warm", "weight": 0.70},
-    "Socks (Warm)":     {"weather": "Warm", "weight": 0.05},
-    "Light Jacket (Evening)": {"weather": "Warm", "weight": 0.35},
-    "Sun Hat (Warm)":   {"weather": "Warm", "weight": 0.10},
+    "Short-Sleeve Top": {"weather": "Warm", "weight": 0.12, "volume_l": 0.4},
+    "T-shirt (Warm)":   {"weather": "Warm", "weight": 0.15, "volume_l": 0.5},
+    "Light Pants":      {"weather": "Warm", "weight": 0.35, "volume_l": 1.0},
+    "Shorts":           {"weather": "Warm", "weight": 0.20, "volume_l": 0.6},
+    "Casual Dress":     {"weather": "Warm", "weight": 0.25, "volume_l": 0.8},
+    "Sneakers (Warm)":  {"weather": "Warm", "weight": 0.70, "volume_l": 4.0},
+    "Socks (Warm)":     {"weather": "Warm", "weight": 0.05, "volume_l": 0.2},
+    "Light Jacket (Evening)": {"weather": "Warm", "weight": 0.35, "volume_l": 1.5},
+    "Sun Hat (Warm)":   {"weather": "Warm", "weight": 0.10, "volume_l": 1.0},
 
     # Hot
-    "Tank Top":         {"weather": "Hot", "weight": 0.10},
-    "T-shirt (Hot)":    {"weather": "Hot", "weight": 0.15},
-    "Shorts (Hot)":     {"weather": "Hot", "weight": 0.20},
-    "Summer Dress":     {"weather": "Hot", "weight": 0.25},
-    "Light Shirt":      {"weather": "Hot", "weight": 0.18},
-    "Swimwear":         {"weather": "Hot", "weight": 0.15},
-    "Flip-Flops":       {"weather": "Hot", "weight": 0.20},
-    "Sun Hat":          {"weather": "Hot", "weight": 0.10},
-    "Light Sandals":    {"weather": "Hot", "weight": 0.30},
-    "Beach Cover-Up":   {"weather": "Hot", "weight": 0.20},
+    "Tank Top":         {"weather": "Hot", "weight": 0.10, "volume_l": 0.3},
+    "T-shirt (Hot)":    {"weather": "Hot", "weight": 0.15, "volume_l": 0.5},
+    "Shorts (Hot)":     {"weather": "Hot", "weight": 0.20, "volume_l": 0.6},
+    "Summer Dress":     {"weather": "Hot", "weight": 0.25, "volume_l": 0.8},
+    "Light Shirt":      {"weather": "Hot", "weight": 0.18, "volume_l": 0.6},
+    "Swimwear":         {"weather": "Hot", "weight": 0.15, "volume_l": 0.3},
+    "Flip-Flops":       {"weather": "Hot", "weight": 0.20, "volume_l": 1.0},
+    "Sun Hat":          {"weather": "Hot", "weight": 0.10, "volume_l": 1.0},
+    "Light Sandals":    {"weather": "Hot", "weight": 0.30, "volume_l": 1.5},
+    "Beach Cover-Up":   {"weather": "Hot", "weight": 0.20, "volume_l": 0.6},
 
     # All
-    "Toiletries": {"weather": "All", "weight": 0.80},
+    "Toiletries": {"weather": "All", "weight": 0.80, "volume_l": 1.5},
 }
 
 template = {
@@ -661,25 +825,24 @@ template = {
 }
 
 
+@metrics.timed("show_items")
 def show_items(quantities):
     print("\nPacking list:\n")
     total = 0.0
+    catalog = list_catalog(quantities)
     for item, qty in quantities.items():
-        print(item + ":", qty)
-
-        if item in clothes:
-            weight = clothes[item]["weight"]
-        elif item in activity_weight:
-            weight = activity_weight[item]["weight"]
+        if item in catalog:
+            print(item + ":", qty)
         else:
-            weight = 0.0
+            print(item + ":", qty, "(weight unknown)")
 
-        total += weight * qty
+        total += catalog.weight_kg(item) * qty
 
     print("\nTotal weight:", round(total, 2), "kg")
     return total
 
 
+@metrics.timed("edit_items")
 def edit_items(quantities):
     print("\nEdit the quantities(press Enter to keep current):\n")
 
@@ -691,24 +854,613 @@ def edit_items(quantities):
         if new_val == "":
             continue
         if new_val.isdigit():
-            quantities[item] = int(new_val)
-            if quantities[item] == 0:
+            if int(new_val):
+                quantities[item] = int(new_val)
+            else:
                 del quantities[item]
         else:
             print("Not a number. Keeping previous value.")
     return quantities
 
 
+def ask_extra_items(quantities):
+    """Add items by name; close matches are offered, new items get a weight bucket."""
+    buckets = list(WEIGHT_BUCKETS)
+    while True:
+        text = input("\nItem to add (press Enter when done): ").strip()
+        if not text:
+            return quantities
+        if resolve_item(text, list_catalog(quantities)) is None:
+            matches = complete_items(text, 5, list_catalog(quantities))
+            if matches:
+                print("Did you mean:")
+                for n, name in enumerate(matches, 1):
+                    print(f"  {n}. {name}")
+                pick = input("Pick a number, or press Enter to add it as a new item: ").strip()
+                if pick.isdigit() and 1 <= int(pick) <= len(matches):
+                    text = matches[int(pick) - 1]
+        bucket = None
+        if resolve_item(text, list_catalog(quantities)) is None:
+            for n, b in enumerate(buckets, 1):
+                print(f"  {n}. {b} (≈ {WEIGHT_BUCKETS[b][0]} kg)")
+            pick = input("We don't know this item yet. How heavy is it? ").strip()
+            if not (pick.isdigit() and 1 <= int(pick) <= len(buckets)):
+                print("Not a valid choice. Item not added.")
+                continue
+            bucket = buckets[int(pick) - 1]
+        qty = input("How many? (press Enter for 1): ").strip()
+        if qty and not qty.isdigit():
+            print("Not a number. Item not added.")
+            continue
+        name = add_item(quantities, text, int(qty or 1), bucket)
+        print(f"Added: {name} (now {quantities[name]})")
+
+
+# -----------------------
+# 5b. Item catalog
+# -----------------------
+
+class Weather(IntEnum):
+    ALL = 0
+    FREEZING = 1
+    COLD = 2
+    COOL = 3
+    WARM = 4
+    HOT = 5
+
+
+_CATALOG_TOKENS = itertools.count(1)
+
+
+class ItemCatalog(Mapping):
+    """Interned item table: every item gets an integer ID.
+
+    Weights are whole grams and packed volumes whole millilitres in
+    array('i')s, weather bands are Weather codes in an array('b'), all
+    indexed by ID. It still reads like the old dict-of-dicts
+    (catalog[name]["weight"], .get(name, {}), update(table)), but engine
+    code should use weight_g / volume_ml / total_kg directly.
+    """
+
+    def __init__(self, tables=()):
+        self.names = []
+        self.ids = {}
+        self.grams = array('i')
+        self.volume = array('i')   # millilitres
+        self.weather = array('b')
+        self.token = next(_CATALOG_TOKENS)   # never reused, unlike id(); caches key on (token, version)
+        self.version = 0   # bumped on every change, for caches keyed on the catalog
+        for table in tables:
+            self.update(table)
+        self.loaded = len(self.names)   # items the table came with; later ones were added
+
+    def load_columns(self, names, grams, volume, weather):
+        """Replace the whole table, e.g. with columns mapped from a catalog file.
+
+        The columns may be read-only memoryviews; they are copied into
+        arrays only if an item is added or changed later.
+        """
+        self.names, self.grams, self.volume, self.weather = names, grams, volume, weather
+        self.ids = dict(zip(names, range(len(names))))
+        self.loaded = len(names)
+        self.version += 1
+
+    def add(self, name, weight_kg, weather="All", volume_l=0.0):
+        if not isinstance(self.grams, array):   # mapped columns: take a private copy first
+            self.grams, self.volume = array('i', self.grams), array('i', self.volume)
+            self.weather = array('b', self.weather)
+        code = Weather[weather.upper()] if isinstance(weather, str) else Weather(weather)
+        g = round(float(weight_kg) * 1000)
+        ml = round(float(volume_l or 0.0) * 1000)
+        item_id = self.ids.get(name)
+        if item_id is None:
+            item_id = len(self.names)
+            self.ids[name] = item_id
+            self.names.append(name)
+            self.grams.append(g)
+            self.volume.append(ml)
+            self.weather.append(code)
+        else:
+            self.grams[item_id] = g
+            self.volume[item_id] = ml
+            self.weather[item_id] = code
+        self.version += 1
+        return item_id
+
+    def update(self, table):
+        for name, rec in table.items():
+            self.add(name, rec["weight"], rec.get("weather", "All"), rec.get("volume_l", 0.0))
+
+    def item_id(self, name):
+        return self.ids.get(name)
+
+    def weight_g(self, name, default=0):
+        item_id = self.ids.get(name)
+        return default if item_id is None else self.grams[item_id]
+
+    def weight_kg(self, name, default=0.0):
+        item_id = self.ids.get(name)
+        return default if item_id is None else self.grams[item_id] / 1000
+
+    def volume_ml(self, name, default=0):
+        item_id = self.ids.get(name)
+        return default if item_id is None else self.volume[item_id]
+
+    def weather_of(self, name):
+        item_id = self.ids.get(name)
+        return None if item_id is None else Weather(self.weather[item_id])
+
+    def total_kg(self, quantities):
+        ids, grams = self.ids, self.grams
+        g = 0
+        for item, qty in quantities.items():
+            item_id = ids.get(item)
+            if item_id is not None:
+                g += grams[item_id] * qty
+        return round(g / 1000, 3)
+
+    def total_volume_l(self, quantities):
+        ids, volume = self.ids, self.volume
+        ml = 0
+        for item, qty in quantities.items():
+            item_id = ids.get(item)
+            if item_id is not None:
+                ml += volume[item_id] * qty
+        return round(ml / 1000, 3)
+
+    # Mapping view, so code written against WEIGHT_TABLE dicts keeps working
+    def __getitem__(self, name):
+        item_id = self.ids[name]
+        return {"weather": Weather(self.weather[item_id]).name.title(),
+                "weight": self.grams[item_id] / 1000,
+                "volume_l": self.volume[item_id] / 1000}
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _unit_grams(weight_table, item):
+    """Weight of one unit in whole grams (0 if the item is unknown)."""
+    if isinstance(weight_table, ItemCatalog):
+        return weight_table.weight_g(item)
+    return round(weight_table.get(item, {}).get("weight", 0.0) * 1000)
+
+
+def _unit_ml(weight_table, item):
+    """Packed volume of one unit in whole millilitres (0 if unknown)."""
+    if isinstance(weight_table, ItemCatalog):
+        return weight_table.volume_ml(item)
+    return round((weight_table.get(item, {}).get("volume_l") or 0.0) * 1000)
+
+
 # Merge clothes + activity_weight into one weight table for trimming
-WEIGHT_TABLE = {}
-WEIGHT_TABLE.update(clothes)
-WEIGHT_TABLE.update(activity_weight)
+WEIGHT_TABLE = ItemCatalog([clothes, activity_weight])
+_OVERLAY_SERIAL = itertools.count(1)
+
+
+class ItemOverlay(ItemCatalog):
+    """A shared catalog plus items of one's own (e.g. what one user typed in).
+
+    Lookups try the own items first, then the shared table; add() only
+    writes to the own items, so the shared table, and every cache keyed on
+    it, is left alone. `version` pairs the shared table's version with a
+    serial that is new on every add and never reused by another overlay,
+    so caches keyed on (id, version) never mix two users' items.
+    """
+
+    def __init__(self, base=None):
+        self.base = WEIGHT_TABLE if base is None else base
+        self.own = ItemCatalog()
+        self.token = next(_CATALOG_TOKENS)
+        self._serial = next(_OVERLAY_SERIAL)
+
+    @property
+    def version(self):
+        return (self.base.version, self._serial)
+
+    @property
+    def names(self):
+        return list(self)
+
+    @property
+    def ids(self):
+        """name -> ID over both tables: the shared IDs, then the own-only items after them."""
+        ids = dict(self.base.ids)
+        for name in self.own.names:
+            ids.setdefault(name, len(ids))
+        return ids
+
+    @property
+    def grams(self):
+        """Weights indexed like ids (an own item wins over a shared one of the same name)."""
+        ids, grams = self.ids, array('i', self.base.grams)
+        grams.extend([0] * (len(ids) - len(grams)))
+        for name, item_id in self.own.ids.items():
+            grams[ids[name]] = self.own.grams[item_id]
+        return grams
+
+    def _table(self, name):
+        return self.own if name in self.own.ids else self.base
+
+    def add(self, name, weight_kg, weather="All", volume_l=0.0):
+        item_id = self.own.add(name, weight_kg, weather, volume_l)
+        self._serial = next(_OVERLAY_SERIAL)
+        return item_id
+
+    def weight_g(self, name, default=0):
+        return self._table(name).weight_g(name, default)
+
+    def weight_kg(self, name, default=0.0):
+        return self._table(name).weight_kg(name, default)
+
+    def volume_ml(self, name, default=0):
+        return self._table(name).volume_ml(name, default)
+
+    def weather_of(self, name):
+        return self._table(name).weather_of(name)
+
+    def total_kg(self, quantities):
+        return round(sum(self.weight_g(i) * q for i, q in quantities.items()) / 1000, 3)
+
+    def total_volume_l(self, quantities):
+        return round(sum(self.volume_ml(i) * q for i, q in quantities.items()) / 1000, 3)
+
+    def __getitem__(self, name):
+        return self._table(name)[name]
+
+    def __contains__(self, name):
+        return name in self.own.ids or name in self.base
+
+    def __iter__(self):
+        yield from self.base
+        yield from (name for name in self.own if name not in self.base)
+
+    def __len__(self):
+        return len(self.base) + sum(name not in self.base for name in self.own)
+
+
+def list_catalog(items, weight_table=None):
+    """The catalog to price `items` with.
+
+    That is weight_table (default WEIGHT_TABLE), except for a PackingList
+    whose own catalog is an ItemOverlay over it: then the overlay, so the
+    list's custom items are not counted as 0 kg.
+    """
+    catalog = getattr(items, "catalog", None)
+    if weight_table is None:
+        return WEIGHT_TABLE if catalog is None else catalog
+    if isinstance(catalog, ItemOverlay) and catalog.base is weight_table:
+        return catalog
+    return weight_table
+
+# -----------------------
+# 5c. Item search and add-item
+# -----------------------
+# Completions come from a prefix index over the words of every item name:
+# a trie flattened into sorted arrays of (word, item), where the subtree of
+# any prefix is a contiguous slice found with two bisects. Matches are wanted
+# best first (shortest name, then alphabetical): a short slice is sorted on
+# the spot, and for the few prefixes with long slices the sorted IDs are
+# stored when the index is built. A query then walks its rarest word's
+# matches in that order and stops after k.
+
+WEIGHT_BUCKETS = {"Light": (0.2, 0.6), "Medium": (0.5, 1.5), "Heavy": (1.0, 4.0)}   # kg, litres
+EAGER_SPAN = 256   # slices longer than this have their ranked IDs stored
+SHORT_PREFIX_LEN = 2
+COMPLETIONS_KEPT = 10   # per short prefix
+_ITEM_INDEX_CACHE = {"key": None, "index": None}
+
+
+def _normalize_item(s):
+    s = _strip_accents(s.lower())
+    return _SPACES_RE.sub(' ', _NON_ALNUM_RE.sub(' ', s)).strip()
+
+
+def _word_table(entries, rank):
+    """(word, item ID) pairs -> parallel sorted arrays (words, IDs)."""
+    entries = sorted(entries, key=lambda e: (e[0], rank[e[1]]))
+    return [w for w, _ in entries], array('i', (i for _, i in entries))
+
+
+def _prefix_range(table, prefix):
+    words = table[0]
+    return bisect_left(words, prefix), bisect_left(words, prefix + "\uffff")
+
+
+def _ranked_prefixes(table, rank):
+    """{prefix: its item IDs best first} for every prefix whose slice is longer than EAGER_SPAN."""
+    words, ids = table
+    ranked, todo = {}, [""]
+    while todo:
+        prefix = todo.pop()
+        start, end = _prefix_range(table, prefix)
+        if prefix:
+            ranked[prefix] = array('i', sorted(set(ids[start:end]), key=rank.__getitem__))
+        n = len(prefix)
+        while start < end:
+            if len(words[start]) == n:   # the prefix itself as a whole word
+                start = bisect_right(words, words[start], start, end)
+                continue
+            child = words[start][:n + 1]
+            child_end = bisect_left(words, child + "\uffff", start, end)
+            if child_end - start > EAGER_SPAN:
+                todo.append(child)
+            start = child_end
+    return ranked
+
+
+def build_item_index(catalog):
+    """Prefix index over a catalog's item names (see get_item_index)."""
+    keys = [_normalize_item(name) for name in catalog.names]
+    rank = array('i', bytes(4 * len(keys)))
+    for pos, item_id in enumerate(sorted(range(len(keys)), key=lambda i: (len(keys[i]), keys[i]))):
+        rank[item_id] = pos
+    words = [tuple(sorted(set(key.split()))) for key in keys]
+    index = {
+        "keys": keys, "rank": rank, "words": words,
+        "exact": {key: item_id for item_id, key in reversed(list(enumerate(keys)))},
+        "first": _word_table(((key.split()[0], i) for i, key in enumerate(keys) if key), rank),
+        "any": _word_table(((w, i) for i, ws in enumerate(words) for w in ws), rank),
+        "short": {},
+    }
+    index["ranked"] = {which: _ranked_prefixes(index[which], rank) for which in ("first", "any")}
+    for n in range(1, SHORT_PREFIX_LEN + 1):
+        for prefix in sorted({w[:n] for w in index["any"][0] if len(w) >= n}):
+            index["short"][prefix] = _complete(index, [prefix], COMPLETIONS_KEPT)
+    return index
+
+
+def _complete(index, tokens, k):
+    """Top-k IDs: exact name, then names starting with the first word, then the rest.
+
+    Every token must start some word of the name. Each of the two groups is
+    found by walking its rarest token's matches best first.
+    """
+    keys, words, rank = index["keys"], index["words"], index["rank"]
+    found = []
+    exact = index["exact"].get(" ".join(tokens))
+    if exact is not None:
+        found.append(exact)
+    first = tokens[0]
+    spans = {(which, j): _prefix_range(index[which], tokens[j])
+             for which in ("first", "any") for j in range(len(tokens))}
+
+    for group in ("first", "any"):
+        which, j = min([(group, 0)] + [("any", j) for j in range(1, len(tokens))],
+                       key=lambda d: spans[d][1] - spans[d][0])
+        start, end = spans[which, j]
+        if end - start > EAGER_SPAN:
+            candidates = index["ranked"][which][tokens[j]]
+        else:
+            candidates = sorted(index[which][1][start:end], key=rank.__getitem__)
+        needed = tokens[:j] + tokens[j + 1:] if which == "any" else tokens[1:]
+        for item_id in candidates:
+            if item_id in found or (group == "first" and not keys[item_id].startswith(first)):
+                continue
+            item_words = words[item_id]
+            for t in needed:
+                pos = bisect_left(item_words, t)
+                if pos == len(item_words) or not item_words[pos].startswith(t):
+                    break
+            else:
+                found.append(item_id)
+                if len(found) == k:
+                    return found
+    return found
+
+
+def get_item_index(catalog=None):
+    """build_item_index, rebuilt only when the catalog changes."""
+    catalog = WEIGHT_TABLE if catalog is None else catalog
+    key = (catalog.token, catalog.version)
+    if _ITEM_INDEX_CACHE["key"] != key:
+        _ITEM_INDEX_CACHE["index"] = build_item_index(catalog)
+        _ITEM_INDEX_CACHE["key"] = key
+    return _ITEM_INDEX_CACHE["index"]
+
+
+@metrics.timed("items.complete")
+def complete_items(text, k=8, catalog=None):
+    """Catalog item names matching what has been typed so far, best first.
+
+    Every word typed must start a word of the item name ("lo sl sh" finds
+    "Long-Sleeve Shirt"); accents, case and punctuation are ignored.
+    """
+    catalog = WEIGHT_TABLE if catalog is None else catalog
+    tokens = _normalize_item(text or "").split()
+    if not tokens:
+        return []
+    if isinstance(catalog, ItemOverlay):   # the few own items by a scan, the shared ones by their index
+        own = sorted((name for name in catalog.own.names
+                      if all(any(w.startswith(t) for w in _normalize_item(name).split()) for t in tokens)),
+                     key=lambda name: (len(name), name))
+        return (own + [name for name in complete_items(text, k, catalog.base)
+                       if name not in catalog.own])[:k]
+    index = get_item_index(catalog)
+    if len(tokens) == 1 and k <= COMPLETIONS_KEPT and tokens[0] in index["short"]:
+        return [catalog.names[i] for i in index["short"][tokens[0]][:k]]
+    return [catalog.names[i] for i in _complete(index, tokens, k)]
+
+
+def resolve_item(text, catalog=None):
+    """The catalog name `text` refers to ("t shirt" -> "T-shirt"), or None."""
+    catalog = WEIGHT_TABLE if catalog is None else catalog
+    if text in catalog:
+        return text
+    if isinstance(catalog, ItemOverlay):
+        key = _normalize_item(text or "")
+        own = [name for name in catalog.own.names if _normalize_item(name) == key]
+        return own[0] if own else resolve_item(text, catalog.base)
+    item_id = get_item_index(catalog)["exact"].get(_normalize_item(text or ""))
+    return None if item_id is None else catalog.names[item_id]
+
+
+def add_item(items, text, qty=1, bucket=None, catalog=None):
+    """Add qty of an item typed as free text to a packing list; returns the catalog name.
+
+    Known items are matched by resolve_item. A new item needs a weight
+    bucket (Light / Medium / Heavy, see WEIGHT_BUCKETS) and gets that
+    weight and volume, so it never counts as 0 kg. It is defined on the
+    PackingList itself (PackingList.define) or in an ItemOverlay catalog;
+    the shared catalog is never changed.
+    """
+    catalog = list_catalog(items, catalog)
+    name = resolve_item(text, catalog)
+    if name is None:
+        name = " ".join((text or "").split())
+        if not name:
+            raise ValueError("Item name is empty.")
+        if bucket not in WEIGHT_BUCKETS:
+            hint = ", ".join(complete_items(name, 3, catalog))
+            raise ValueError(f"Unknown item {name!r}: choose a weight bucket "
+                             f"({' / '.join(WEIGHT_BUCKETS)})" + (f" or one of: {hint}" if hint else ""))
+        weight_kg, volume_l = WEIGHT_BUCKETS[bucket]
+        if isinstance(items, PackingList):
+            items.define(name, weight_kg, volume_l=volume_l)
+        elif isinstance(catalog, ItemOverlay):
+            catalog.add(name, weight_kg, volume_l=volume_l)
+        else:
+            raise TypeError(f"Can't define {name!r}: new items go on a PackingList or an ItemOverlay, "
+                            "never into the shared catalog.")
+    items[name] = items.get(name, 0) + int(qty)
+    return name
+
+
+# -----------------------
+# 5d. Catalog file
+# -----------------------
+# With PACKING_CATALOG pointing at a compiled catalog (see catalog_file.py),
+# the items, templates, activities and airlines come from that file instead
+# of the tables above. It is memory-mapped and loaded in place, so modules
+# holding WEIGHT_TABLE, AIRLINES or template see the new data, and every
+# cache keyed on the catalog version or AIRLINES_VERSION is rebuilt.
+# refresh_catalog, called at the start of each plan and app run, reloads the
+# file when it has been replaced. A reload edits the shared tables in place,
+# so threads that read them (e.g. the service with --workers 0) wrap their
+# work in catalog_reading(): a reload waits until no such block is running.
+
+CATALOG_CHECK_S = 1.0   # how often refresh_catalog looks at the file
+_CATALOG = {"path": None, "artifact": None, "checked": 0.0, "failed": None}
+_CATALOG_LOCK = threading.Lock()
+_CATALOG_READERS = {"count": 0, "reloading": False}
+_CATALOG_READERS_COND = threading.Condition()
+_CATALOG_THREAD = threading.local()
+
+
+@contextmanager
+def catalog_reading():
+    """Keep catalog reloads out while the block runs; other readers still run alongside.
+
+    refresh_catalog inside the block does nothing (the next call after it
+    picks the new file up), so a reader never reloads under another reader.
+    """
+    with _CATALOG_READERS_COND:
+        _CATALOG_READERS_COND.wait_for(lambda: not _CATALOG_READERS["reloading"])
+        _CATALOG_READERS["count"] += 1
+    _CATALOG_THREAD.depth = getattr(_CATALOG_THREAD, "depth", 0) + 1
+    try:
+        yield
+    finally:
+        _CATALOG_THREAD.depth -= 1
+        with _CATALOG_READERS_COND:
+            _CATALOG_READERS["count"] -= 1
+            _CATALOG_READERS_COND.notify_all()
+
+
+@contextmanager
+def _catalog_reloading():
+    """Wait for the catalog_reading blocks to finish; new ones wait for the reload."""
+    if getattr(_CATALOG_THREAD, "depth", 0):
+        raise RuntimeError("Can't reload the catalog inside catalog_reading().")
+    with _CATALOG_READERS_COND:
+        _CATALOG_READERS["reloading"] = True
+        _CATALOG_READERS_COND.wait_for(lambda: not _CATALOG_READERS["count"])
+    try:
+        yield
+    finally:
+        with _CATALOG_READERS_COND:
+            _CATALOG_READERS["reloading"] = False
+            _CATALOG_READERS_COND.notify_all()
+
+
+def use_catalog(path):
+    """Load a compiled catalog into WEIGHT_TABLE, the templates and AIRLINES -> its artifact.
+
+    Items added at run time (after the table was built or loaded) are kept
+    unless the file now has them. Bag sizes (dims_cm) are worked out again
+    from each airline's dimensions_cm, so an edited size takes effect.
+    """
+    from catalog_file import CatalogArtifact
+    artifact = CatalogArtifact(path)
+    tables = artifact.tables()
+    with _CATALOG_LOCK, _catalog_reloading():
+        added = [(name, WEIGHT_TABLE[name]) for name in WEIGHT_TABLE.names[WEIGHT_TABLE.loaded:]]
+        WEIGHT_TABLE.load_columns(artifact.names(), artifact.column("grams"),
+                                  artifact.column("volume"), artifact.column("weather"))
+        added = {name: rec for name, rec in added if name not in WEIGHT_TABLE}
+        if added:   # otherwise the mapped columns stay as they are, shared with other processes
+            WEIGHT_TABLE.update(added)
+        for table, new in ((template, tables["templates"]),
+                           (activity_template, tables["activity_templates"]),
+                           (AIRLINES, tables["airlines"])):
+            table.clear()
+            table.update(new)
+        ACTIVITIES[:] = tables["activities"]
+        for rec in AIRLINES.values():
+            rec["dims_cm"] = dimensions_to_cm(rec.get("dimensions_cm"))
+        invalidate_airline_index()
+        _CATALOG.update(path=path, artifact=artifact, checked=time.monotonic())
+    metrics.count("catalog.loads")
+    return artifact
+
+
+def refresh_catalog():
+    """Reload the catalog file if it was replaced; True if it was (cheap to call often)."""
+    path = _CATALOG["path"]
+    now = time.monotonic()
+    if path is None or now - _CATALOG["checked"] < CATALOG_CHECK_S:
+        return False
+    if getattr(_CATALOG_THREAD, "depth", 0):   # inside catalog_reading: leave it for later
+        return False
+    _CATALOG["checked"] = now
+    from catalog_file import file_signature
+    try:
+        signature = file_signature(path)
+    except OSError:   # being replaced or gone: keep the catalog already loaded
+        return False
+    if signature in (_CATALOG["artifact"].signature, _CATALOG["failed"]):
+        return False
+    try:
+        use_catalog(path)
+    except (OSError, ValueError) as exc:   # keep serving the catalog already loaded
+        _CATALOG["failed"] = signature   # and don't retry this file every second
+        metrics.count("catalog.reload_failed")
+        print(f"Catalog {path} not reloaded: {exc}", file=sys.stderr)
+        return False
+    return True
+
+
+if os.environ.get("PACKING_CATALOG"):
+    use_catalog(os.environ["PACKING_CATALOG"])
+
 
 # -----------------------
 # 6. Greedy Algorithm
 # ----------------------
 
+@metrics.timed("total_weight")
 def total_weight(quantities, weight_table):
+    weight_table = list_catalog(quantities, weight_table)
+    if isinstance(quantities, PackingList) and quantities.catalog is weight_table:
+        return quantities.total_kg   # running total, no pass over the list
+    if isinstance(weight_table, ItemCatalog):
+        return weight_table.total_kg(quantities)
     w = 0.0
     for item, qty in quantities.items():
         if item in weight_table:
@@ -716,6 +1468,16 @@ def total_weight(quantities, weight_table):
     return round(w, 3)
 
 
+def total_volume(quantities, weight_table):
+    """Packed volume of a list in litres (items without a volume count as 0)."""
+    weight_table = list_catalog(quantities, weight_table)
+    if isinstance(quantities, PackingList) and quantities.catalog is weight_table:
+        return quantities.volume_l
+    if isinstance(weight_table, ItemCatalog):
+        return weight_table.total_volume_l(quantities)
+    return round(sum(_unit_ml(weight_table, i) * q for i, q in quantities.items()) / 1000, 3)
+
+
 PRIORITY_RANK = {"Underwear": 0, "Socks": 1, "T-shirt": 2, "Jeans": 2,
                  "Sneakers": 4, "Toiletries": 5}
 
@@ -727,71 +1489,450 @@ def _priority(item):
 HARD_KEEP = {"Underwear", "Socks"}
 
 
+COMFORT_MARGIN_KG = 0.8
+
+
+def weight_status(margin):
+    """'ok', 'close' or 'over' for a margin (kg) below the target weight."""
+    if margin >= COMFORT_MARGIN_KG:
+        return "ok"
+    if margin >= 0:
+        return "close"
+    return "over"
+
+
 def show_weight_status(items, weight_table, limit_kg, buffer=0.3):
     tw = total_weight(items, weight_table)
+    if limit_kg is None:
+        print(f"\n[Weight] total={tw} kg  |  no weight limit")
+        return
     target = float(limit_kg) - float(buffer)
     print(f"\n[Weight] total={tw} kg  |  limit={limit_kg} kg  |  target ≤ {round(target, 2)} kg")
-    margin = round(target - tw, 3)
-    if margin >= 0.8:
+    status = weight_status(round(target - tw, 3))
+    if status == "ok":
         print("Status: ✅ OK (comfortable margin)")
-    elif margin >= 0:
+    elif status == "close":
         print("Status: ⚠️ Close to the limit")
     else:
         print("Status: ❌ Over the limit")
 
 
+def show_volume_status(items, weight_table, volume_l):
+    if volume_l is None:
+        return
+    tv = total_volume(items, weight_table)
+    fits = "✅ Fits the bag" if tv <= volume_l else "❌ Too bulky for the bag"
+    print(f"[Volume] packed={tv} L  |  bag holds ≈ {volume_l} L  →  {fits}")
+
+
+def _limit_g(target):
+    """Largest whole number of grams k with k / 1000 <= target (kg)."""
+    k = int(target * 1000)
+    while (k + 1) / 1000 <= target:
+        k += 1
+    while k / 1000 > target:
+        k -= 1
+    return k
+
+
+def _trim_targets(items, weight_table, limit_kg, safety_buffer, volume_limit_l):
+    """Shared set-up for the trimmers: weight target (kg), totals and whole-unit caps.
+
+    limit_kg=None means only the volume is limited (cap_g is None then);
+    volume_limit_l=None means only the weight is (vol_before/vol_cap None).
+    """
+    before = total_weight(items, weight_table)
+    target = float("inf") if limit_kg is None else max(0.0, float(limit_kg) - float(safety_buffer))
+    cap_g = None if limit_kg is None else _limit_g(target)
+    vol_before = vol_cap = None
+    if volume_limit_l is not None:
+        vol_before = total_volume(items, weight_table)
+        vol_cap = _limit_g(float(volume_limit_l))   # same rounding, in millilitres
+    fits = before <= target and (vol_before is None or vol_before <= float(volume_limit_l))
+    return target, before, cap_g, vol_before, vol_cap, fits
+
+
+def _trim_info(before, after, removed, note, vol_before, current, weight_table):
+    info = {"before": before, "after": after, "removed": removed, "note": note}
+    if vol_before is not None:
+        info["volume_before"] = vol_before
+        info["volume_after"] = total_volume(current, weight_table)
+    return info
+
+
+@metrics.timed("trim.greedy")
 def greedy_trim_to_limit_verbose(items, weight_table, limit_kg,
-                                 safety_buffer=0.3, respect_hard_keep=True, max_passes=2):
-    target = max(0.0, float(limit_kg) - float(safety_buffer))
-    current = deepcopy(items)
-    before = total_weight(current, weight_table)
+                                 safety_buffer=0.3, respect_hard_keep=True, max_passes=2,
+                                 volume_limit_l=None):
+    # Same removal order as expanding every quantity into single units, but we
+    # walk (item, quantity) runs and keep running totals in grams (and
+    # millilitres), so each run is handled in one step instead of re-summing
+    # the list per unit. A run loses enough units to clear whichever of the
+    # two limits is still exceeded.
+    weight_table = list_catalog(items, weight_table)
+    current = dict(items)
+    target, before, limit, vol_before, vlimit, fits = _trim_targets(
+        current, weight_table, limit_kg, safety_buffer, volume_limit_l)
     removed_trace = []
-    if before <= target:
-        return current, {"before": before, "after": before, "note": "Already within target."}
+    if fits:
+        return current, _trim_info(before, before, [], "Already within target.",
+                                   vol_before, current, weight_table)
+
+    unit_g = {item: _unit_grams(weight_table, item) for item in current}
+    running = sum(unit_g[i] * q for i, q in current.items() if i in weight_table)
+    limit = running if limit is None else limit
+    if vol_before is None:
+        unit_ml, vol, vlimit = dict.fromkeys(current, 0), 0, 0
+    else:
+        unit_ml = {item: _unit_ml(weight_table, item) for item in current}
+        vol = sum(unit_ml[i] * q for i, q in current.items())
 
-    def sorted_units(avoid_hard):
-        units = [(i, 1) for i, q in current.items() for _ in range(q)]
-        def key(u):
-            item = u[0]
+    def sorted_runs(avoid_hard):
+        runs = [(i, q) for i, q in current.items() if q > 0]
+        def key(run):
+            item = run[0]
             pri = _priority(item)
             if avoid_hard and item in HARD_KEEP:
                 pri = -100
-            w = weight_table.get(item, {}).get("weight", 0.0)
-            return (pri, w)
-        units.sort(key=key, reverse=True)
-        return units
+            return (pri, unit_g[item])
+        runs.sort(key=key, reverse=True)   # stable, so ties keep list order
+        return runs
 
+    examined = 0
     for pass_id in range(max_passes):
         avoid_hard = respect_hard_keep and pass_id == 0
-        units = sorted_units(avoid_hard)
-        for item, _ in units:
-            if total_weight(current, weight_table) <= target:
+        for item, qty in sorted_runs(avoid_hard):
+            if running <= limit and vol <= vlimit:
                 break
+            examined += qty
             if avoid_hard and item in HARD_KEEP:
                 continue
-            if current.get(item, 0) > 0:
-                current[item] -= 1
-                if current[item] == 0:
-                    del current[item]
-                removed_trace.append(item)
-        if total_weight(current, weight_table) <= target:
+            w = unit_g[item] if item in weight_table else 0
+            v = unit_ml[item]
+            n_w = 0 if running <= limit else (qty if w <= 0 else -(-(running - limit) // w))
+            n_v = 0 if vol <= vlimit or v <= 0 else -(-(vol - vlimit) // v)
+            n = min(qty, max(n_w, n_v))
+            if n == 0:
+                continue
+            current[item] -= n
+            if current[item] == 0:
+                del current[item]
+            running -= w * n
+            vol -= v * n
+            removed_trace.extend([item] * n)
+        if running <= limit and vol <= vlimit:
             break
 
+    metrics.count("trim.units_examined", examined)
+    metrics.count("trim.units_removed", len(removed_trace))
+
     after = total_weight(current, weight_table)
-    note = "Reached target." if after <= target else "Could not reach target without cutting essentials."
-    info = {"before": before, "after": after, "removed": removed_trace, "note": note}
-    return current, info
+    reached = after <= target and vol <= vlimit
+    note = "Reached target." if reached else "Could not reach target without cutting essentials."
+    return current, _trim_info(before, after, removed_trace, note, vol_before, current, weight_table)
+
+
+# -----------------------
+# 6b. Exact (knapsack) trim
+# -----------------------
+
+EXACT_TIME_BUDGET_S = 0.25
+
+
+def _importance_tiers(items, respect_hard_keep):
+    """Group items by priority, most important group first."""
+    tiers = {}
+    for item in items:
+        rank = _priority(item)
+        if respect_hard_keep and item in HARD_KEEP:
+            rank = -100
+        tiers.setdefault(rank, []).append(item)
+    return [tiers[r] for r in sorted(tiers)]
+
+
+def _max_subset_sum(pieces, cap, deadline):
+    """Bounded subset-sum with a Python int as bitset.
+
+    pieces = [(item, count, grams, millilitres)]. Returns the best sum <= cap
+    and the pieces used, or None if the deadline passed.
+    """
+    mask = (1 << (cap + 1)) - 1
+    reach = 1
+    history = [reach]
+    for _, _, g, _ in pieces:
+        reach = (reach | (reach << g)) & mask
+        history.append(reach)
+        if time.perf_counter() > deadline:
+            return None
+    best = reach.bit_length() - 1
+    used = []
+    s = best
+    for i in range(len(pieces) - 1, -1, -1):
+        if not (history[i] >> s) & 1:
+            used.append(pieces[i])
+            s -= pieces[i][2]
+    return best, used
+
+
+def _max_weight_within_volume(pieces, cap, vcap, deadline):
+    """Two-constraint version: the most grams <= cap whose volume stays <= vcap.
+
+    Keeps the smallest volume that reaches each weight, on a grid of the gcd
+    of the piece weights (10 g for the built-in catalog) so the table stays
+    short. Same return value as _max_subset_sum.
+    """
+    step = 0
+    for piece in pieces:
+        step = gcd(step, piece[2])
+    step = step or 1
+    size = cap // step
+    unreachable = vcap + 1
+    least = [0] + [unreachable] * size
+    took = []
+    for _, _, g, ml in pieces:
+        w = g // step
+        taken = bytearray(size + 1)
+        for s in range(size, w - 1, -1):
+            v = least[s - w] + ml
+            if v < least[s]:
+                least[s] = v
+                taken[s] = 1
+        took.append(taken)
+        if time.perf_counter() > deadline:
+            return None
+    best = max(s for s, v in enumerate(least) if v < unreachable)
+    used = []
+    s = best
+    for i in range(len(pieces) - 1, -1, -1):
+        if took[i][s]:
+            used.append(pieces[i])
+            s -= pieces[i][2] // step
+    return best * step, used
+
+
+@metrics.timed("trim.exact")
+def exact_trim_to_limit(items, weight_table, limit_kg, safety_buffer=0.3,
+                        respect_hard_keep=True, time_budget_s=EXACT_TIME_BUDGET_S,
+                        volume_limit_l=None):
+    """Keep the most weight of the most important items that still fits.
+
+    Priorities are lexicographic: HARD_KEEP first (if respected), then
+    PRIORITY_RANK from 0 upwards. Each group gets the largest weight that
+    fits in what the groups before it left over (subset-sum on whole grams,
+    or a weight x volume knapsack when volume_limit_l is given, which keeps
+    the least volume among equally heavy choices). Falls back to the greedy
+    trim if the time budget runs out.
+    """
+    weight_table = list_catalog(items, weight_table)
+    current = dict(items)
+    target, before, cap, vol_before, vcap, fits = _trim_targets(
+        current, weight_table, limit_kg, safety_buffer, volume_limit_l)
+    if fits:
+        info = _trim_info(before, before, [], "Already within target.", vol_before, current, weight_table)
+        return current, dict(info, solver="exact")
+
+    deadline = time.perf_counter() + time_budget_s
+    grams = {item: _unit_grams(weight_table, item) for item in current if item in weight_table}
+    ml = {item: _unit_ml(weight_table, item) if vol_before is not None else 0 for item in current}
+    if cap is None:
+        cap = sum(grams.get(i, 0) * q for i, q in current.items())
+    overfull = False
+    if vcap is not None:   # weightless items always stay, so their volume is spoken for
+        vcap -= sum(ml[i] * q for i, q in current.items() if grams.get(i, 0) <= 0)
+        overfull, vcap = vcap < 0, max(0, vcap)
+    kept = {}
+    removed_by_tier = []
+    for tier in _importance_tiers([i for i, q in current.items() if q > 0], respect_hard_keep):
+        pieces = []
+        for item in tier:
+            g = grams.get(item, 0)
+            if g <= 0:
+                kept[item] = current[item]   # weightless items always stay
+                continue
+            left, k = current[item], 1
+            while left > 0:   # binary split: 1, 2, 4, ... copies per piece
+                n = min(k, left)
+                pieces.append((item, n, g * n, ml[item] * n))
+                left -= n
+                k *= 2
+        metrics.count("trim.units_examined", sum(p[1] for p in pieces))
+        if vcap is None:
+            result = _max_subset_sum(pieces, cap, deadline)
+        elif sum(p[2] for p in pieces) <= cap and sum(p[3] for p in pieces) <= vcap:
+            result = sum(p[2] for p in pieces), pieces   # the whole group fits
+        else:
+            # Also when the group would fit the volume whole: of the subsets with the
+            # most weight it keeps the least volume, so later groups get the most room.
+            result = _max_weight_within_volume(pieces, cap, vcap, deadline)
+        if result is None:
+            trimmed, info = greedy_trim_to_limit_verbose(items, weight_table, limit_kg,
+                                                         safety_buffer=safety_buffer,
+                                                         respect_hard_keep=respect_hard_keep,
+                                                         volume_limit_l=volume_limit_l)
+            info["solver"] = "greedy"
+            info["note"] += " (Exact trim ran out of time; used greedy.)"
+            metrics.count("trim.exact_timeouts")
+            return trimmed, info
+        best, used = result
+        cap -= best
+        if vcap is not None:
+            vcap -= sum(p[3] for p in used)
+        tier_kept = {}
+        for item, n, _, _ in used:
+            tier_kept[item] = tier_kept.get(item, 0) + n
+        kept.update(tier_kept)
+        removed_by_tier.append([(item, current[item] - tier_kept.get(item, 0))
+                                for item in tier if grams.get(item, 0) > 0])
 
+    removed_trace = []
+    for tier_removed in reversed(removed_by_tier):
+        tier_removed.sort(key=lambda r: grams[r[0]], reverse=True)
+        for item, n in tier_removed:
+            removed_trace.extend([item] * n)
+    metrics.count("trim.units_removed", len(removed_trace))
+
+    for item in list(current):
+        if current[item] > 0 and kept.get(item, 0) == 0:
+            del current[item]
+        elif current[item] > 0:
+            current[item] = kept[item]
 
-def run_trim_final(items, use_verbose=True, safety_buffer=0.3):
-    limit = float(STATE.get("weight_kg") or 10.0)
+    after = total_weight(current, weight_table)
+    cut_hard = respect_hard_keep and any(i in HARD_KEEP for i in removed_trace)
+    if overfull:
+        note = "Could not fit the bag volume: items without a weight already fill it."
+    else:
+        note = "Reached target by cutting essentials." if cut_hard else "Reached target."
+    info = _trim_info(before, after, removed_trace, note, vol_before, current, weight_table)
+    return current, dict(info, solver="exact")
+
+
+TRIM_SOLVERS = ("greedy", "exact")
+
+
+def trim_to_limit(items, weight_table, limit_kg, safety_buffer=0.3,
+                  respect_hard_keep=True, max_passes=2, solver="greedy", volume_limit_l=None):
+    if solver == "exact":
+        return exact_trim_to_limit(items, weight_table, limit_kg, safety_buffer=safety_buffer,
+                                   respect_hard_keep=respect_hard_keep,
+                                   volume_limit_l=volume_limit_l)
+    if solver != "greedy":
+        raise ValueError(f"Unknown trim solver: {solver!r} (use one of {TRIM_SOLVERS})")
+    return greedy_trim_to_limit_verbose(items, weight_table, limit_kg, safety_buffer=safety_buffer,
+                                        respect_hard_keep=respect_hard_keep, max_passes=max_passes,
+                                        volume_limit_l=volume_limit_l)
+
+
+# Trim results are pure functions of the list, the limits and the catalog, and
+# the same template-derived lists come up again and again (every Streamlit
+# rerun, every user), so they are memoized process-wide.
+
+TRIM_CACHE_SIZE = 2048
+TRIM_CACHE_TTL_S = 3600
+
+
+class TrimCache:
+    """Bounded LRU cache with a time-to-live; safe to share between threads."""
+
+    def __init__(self, maxsize=TRIM_CACHE_SIZE, ttl_s=TRIM_CACHE_TTL_S):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data = OrderedDict()   # key -> (expires_at, value), oldest first
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] < time.monotonic():
+                del self._data[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl_s, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                    "misses": self.misses, "evictions": self.evictions,
+                    "hit_rate": self.hits / lookups if lookups else 0.0}
+
+
+TRIM_CACHE = TrimCache()
+
+
+def trim_key(items, weight_table, limit_kg, safety_buffer=0.3, respect_hard_keep=True,
+             max_passes=2, solver="greedy", volume_limit_l=None):
+    """Canonical, hashable key for everything a trim result depends on.
+
+    Items are sorted and zero quantities dropped, so equal lists give equal
+    keys whatever order they were built in; the catalog is identified by its
+    token and version, so editing it invalidates old entries, and a new
+    catalog never picks up an old one's (as it could by a reused id()).
+    """
+    return (tuple(sorted((i, q) for i, q in items.items() if q)),
+            None if limit_kg is None else float(limit_kg), float(safety_buffer),
+            bool(respect_hard_keep), int(max_passes), solver,
+            None if volume_limit_l is None else float(volume_limit_l),
+            weight_table.token, weight_table.version)
+
+
+def cached_trim_to_limit(items, weight_table, limit_kg, safety_buffer=0.3, respect_hard_keep=True,
+                         max_passes=2, solver="greedy", volume_limit_l=None, cache=None):
+    """trim_to_limit through TRIM_CACHE (or `cache`); returns fresh copies the caller may edit.
+
+    Only ItemCatalog tables are cached (they carry a version); plain dicts
+    go straight to trim_to_limit.
+    """
+    weight_table = list_catalog(items, weight_table)
+    args = (items, weight_table, limit_kg, safety_buffer, respect_hard_keep, max_passes, solver,
+            volume_limit_l)
+    if not isinstance(weight_table, ItemCatalog):
+        return trim_to_limit(*args)
+    cache = TRIM_CACHE if cache is None else cache
+    key = trim_key(*args)
+    result = cache.get(key)
+    metrics.count("trim_cache.hit" if result is not None else "trim_cache.miss")
+    if result is None:
+        result = trim_to_limit(*args)
+        cache.put(key, result)
+    trimmed, info = result
+    return dict(trimmed), dict(info, removed=list(info.get("removed", [])))
+
+
+def run_trim_final(items, use_verbose=True, safety_buffer=0.3, solver="greedy", limit_kg=None,
+                   volume_limit_l=None):
+    limit = limit_kg
+    if limit is None and volume_limit_l is None:
+        limit = float(STATE.get("weight_kg") or 10.0)
+    catalog = list_catalog(items)
     print("\n--- Before Trim ---")
-    show_weight_status(items, WEIGHT_TABLE, limit, buffer=safety_buffer)
-    trimmed, info = greedy_trim_to_limit_verbose(items, WEIGHT_TABLE, limit,
-                                                 safety_buffer=safety_buffer,
-                                                 respect_hard_keep=True, max_passes=2)
+    show_weight_status(items, catalog, limit, buffer=safety_buffer)
+    show_volume_status(items, catalog, volume_limit_l)
+    trimmed, info = trim_to_limit(items, catalog, limit,
+                                  safety_buffer=safety_buffer,
+                                  respect_hard_keep=True, max_passes=2, solver=solver,
+                                  volume_limit_l=volume_limit_l)
     print("\n--- After Trim ---")
-    show_weight_status(trimmed, WEIGHT_TABLE, limit, buffer=safety_buffer)
+    show_weight_status(trimmed, catalog, limit, buffer=safety_buffer)
+    show_volume_status(trimmed, catalog, volume_limit_l)
     if info.get("removed"):
         print("Removed:", ", ".join(info["removed"]))
     print(info.get("note", ""))
@@ -799,7 +1940,1087 @@ def run_trim_final(items, use_verbose=True, safety_buffer=0.3):
 
 
 # -----------------------
-# 7. Main 
+# 6c. Batch weight evaluation (NumPy)
+# -----------------------
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise ImportError("Batch weight evaluation needs NumPy (pip install numpy).") from None
+    return numpy
+
+
+def quantities_matrix(lists, catalog=None):
+    """Packing lists (dicts) -> int32 matrix, one row per list, one column per item ID.
+
+    Items the catalog does not know are left out, as in total_weight. An
+    ItemOverlay numbers its own items after the shared ones (see its ids).
+    """
+    np = _numpy()
+    catalog = WEIGHT_TABLE if catalog is None else catalog
+    ids = catalog.ids
+    rows, cols, vals = [], [], []
+    for row, quantities in enumerate(lists):
+        for item, qty in quantities.items():
+            item_id = ids.get(item)
+            if item_id is not None:
+                rows.append(row)
+                cols.append(item_id)
+                vals.append(qty)
+    matrix = np.zeros((len(lists), len(catalog)), dtype=np.int32)
+    matrix[rows, cols] = vals
+    return matrix
+
+
+def batch_weight_report(quantities, limit_kg, buffer=0.3, catalog=None):
+    """Totals, margins and status for many packing lists at once.
+
+    quantities is a (lists x catalog items) matrix, e.g. from
+    quantities_matrix, or a list of dicts. limit_kg is one limit or one per
+    list. The totals come from a single matrix-vector product in whole grams,
+    so they match total_weight exactly. Returns a dict of NumPy arrays:
+    "total" (kg), "margin" (kg below limit - buffer) and "status"
+    ('ok' / 'close' / 'over', same thresholds as show_weight_status).
+    """
+    np = _numpy()
+    catalog = WEIGHT_TABLE if catalog is None else catalog
+    if not hasattr(quantities, "shape"):
+        quantities = quantities_matrix(quantities, catalog)
+    grams = np.frombuffer(catalog.grams, dtype=np.int32).astype(np.int64)
+    total = np.asarray(quantities, dtype=np.int64) @ grams / 1000
+    target = np.asarray(limit_kg, dtype=float) - float(buffer)
+    margin = np.round(target - total, 3)
+    status = np.select([margin >= COMFORT_MARGIN_KG, margin >= 0], ["ok", "close"], "over")
+    return {"total": np.round(total, 3), "margin": margin, "status": status}
+
+
+# -----------------------
+# 6d. Multi-bag allocation
+# -----------------------
+# A bag is {"name", "limit_kg", "volume_l", "paid"}; None means no limit.
+# Free bags are filled first and paid bags only take what is left, so the
+# result keeps as much as possible for free and moves the rest, if it can,
+# to a paid bag before anything is left behind.
+
+PERSONAL_ITEM_CM = (40, 30, 15)   # typical under-seat size
+CHECKED_BAG_KG = 23.0
+CHECKED_BAG_CM = (75, 50, 30)
+ALLOCATION_TIME_BUDGET_S = 0.5
+_COMBINED_RE = re.compile(r'combined|with personal item')
+
+
+def cabin_bags(rules, personal_item=True, checked_kg=None):
+    """Baggage rules (resolve_baggage_rules) -> the bags to allocate into.
+
+    If the airline's extras say the weight is shared ("combined hand + cabin
+    bag", "total with personal item"), carry-on and personal item become one
+    bag with that weight limit and their volumes added up.
+    """
+    carry_on = {"name": "Carry-on", "limit_kg": rules.get("limit_kg"),
+                "volume_l": rules.get("volume_l"), "paid": False}
+    bags = [carry_on]
+    if personal_item:
+        personal_l = bag_volume_l(PERSONAL_ITEM_CM)
+        if _COMBINED_RE.search((rules.get("extras") or "").lower()):
+            carry_on["name"] = "Carry-on + personal item"
+            if carry_on["volume_l"] is not None:
+                carry_on["volume_l"] = round(carry_on["volume_l"] + personal_l, 1)
+        else:
+            bags.append({"name": "Personal item", "limit_kg": None, "volume_l": personal_l,
+                         "paid": False})
+    if checked_kg:
+        bags.append({"name": "Checked bag", "limit_kg": float(checked_kg),
+                     "volume_l": bag_volume_l(CHECKED_BAG_CM), "paid": True})
+    return bags
+
+
+def _fill_bags(items, bags, weight_table, safety_buffer, solver):
+    """Fill bags one after another, each taking the best of what the ones before left."""
+    remaining = dict(items)
+    manifests = []
+    for bag in bags:
+        packed, info = trim_to_limit(remaining, weight_table, bag["limit_kg"],
+                                     safety_buffer=safety_buffer, solver=solver,
+                                     volume_limit_l=bag["volume_l"])
+        manifests.append(dict(info, bag=bag["name"], paid=bag["paid"], items=packed))
+        for item, qty in packed.items():
+            remaining[item] -= qty
+            if remaining[item] == 0:
+                del remaining[item]
+    return manifests, remaining
+
+
+@metrics.timed("allocate")
+def allocate_bags(items, bags, weight_table=None, safety_buffer=0.3, solver="exact",
+                  time_budget_s=ALLOCATION_TIME_BUDGET_S):
+    """Split a packing list across several bags, leaving behind as little as possible.
+
+    Each bag is a knapsack with its own weight and volume limit. The exact
+    solver fills the free bags with exact_trim_to_limit and tries every order
+    of them (up to 4 bags), keeping the order that packs the most weight of
+    the most important items (same priorities as exact_trim_to_limit). The
+    greedy solver fills them in the given order with the greedy trim; it is
+    also what is left when the time budget runs out. Returns {"bags": one
+    manifest per bag (the trim info plus "bag", "paid", "items"),
+    "moved_to_paid", "left_behind", "solver", "note"}.
+    """
+    weight_table = list_catalog(items, weight_table)
+    if solver not in TRIM_SOLVERS:
+        raise ValueError(f"Unknown trim solver: {solver!r} (use one of {TRIM_SOLVERS})")
+    free = [b for b in bags if not b.get("paid")]
+    paid = [b for b in bags if b.get("paid")]
+    deadline = time.perf_counter() + time_budget_s
+
+    best = _fill_bags(items, free, weight_table, safety_buffer, "greedy")
+    used = "greedy"
+    if solver == "exact" and len(free) <= 4:
+        tiers = _importance_tiers(list(items), True)
+
+        def score(remaining):   # weight left behind per tier, most important first
+            return [sum(_unit_grams(weight_table, i) * remaining.get(i, 0) for i in tier)
+                    for tier in tiers]
+
+        best_score = None
+        for order in itertools.permutations(free):
+            if time.perf_counter() > deadline:
+                metrics.count("allocate.timeouts")
+                break
+            manifests, remaining = _fill_bags(items, order, weight_table, safety_buffer, "exact")
+            if best_score is None or score(remaining) < best_score:
+                pos = {id(bag): k for k, bag in enumerate(order)}
+                manifests = [manifests[pos[id(bag)]] for bag in free]   # in the order given
+                best, best_score, used = (manifests, remaining), score(remaining), "exact"
+
+    manifests, remaining = best
+    paid_manifests, left_behind = _fill_bags(remaining, paid, weight_table, safety_buffer, used)
+    moved = {}
+    for m in paid_manifests:
+        for item, qty in m["items"].items():
+            moved[item] = moved.get(item, 0) + qty
+
+    if left_behind:
+        note = f"{sum(left_behind.values())} item(s) do not fit any bag."
+    elif moved:
+        note = f"{sum(moved.values())} item(s) need the paid bag."
+    else:
+        note = "Everything fits in the free bags."
+    return {"bags": manifests + paid_manifests, "moved_to_paid": moved,
+            "left_behind": left_behind, "solver": used, "note": note}
+
+
+# -----------------------
+# 6e. Smart suggestions (swap / reduce)
+# -----------------------
+# Instead of only deleting units, suggest lighter items that do the same job:
+# every item has a role, and an item can stand in for another of the same
+# role if its weather band is the same or next to it ("All" items only stand
+# in for other "All" items, so a rain jacket never replaces a winter coat).
+
+ITEM_ROLES = {
+    # Tops and layers
+    "Thermal Shirt": "base layer", "Undershirt": "base layer", "Thermal Leggings": "base layer (legs)",
+    "Long-Sleeve Shirt": "top", "Long-Sleeve Shirt (Cold)": "top", "Turtleneck": "top",
+    "T-shirt": "top", "Long-Sleeve Shirt (Cool)": "top", "Short-Sleeve Top": "top",
+    "T-shirt (Warm)": "top", "Tank Top": "top", "T-shirt (Hot)": "top", "Light Shirt": "top",
+    "Wool Sweater": "warm layer", "Sweater": "warm layer", "Cardigan": "warm layer",
+    "Sweatshirt": "warm layer", "Hoodie": "warm layer",
+    "Heavy Coat": "coat", "Coat": "coat", "Light Jacket": "coat", "Light Jacket (Evening)": "coat",
+    "Rain Jacket": "rain jacket",
+    # Bottoms and dresses
+    "Jeans": "trousers", "Winter Pants": "trousers", "Jeans (Cold)": "trousers",
+    "Warm Pants": "trousers", "Jeans (Cool)": "trousers", "Chinos": "trousers",
+    "Light Pants": "trousers", "Shorts": "shorts", "Shorts (Hot)": "shorts",
+    "Casual Dress": "dress", "Summer Dress": "dress", "Beach Cover-Up": "cover-up",
+    # Accessories
+    "Scarf": "scarf", "Scarf (Cold)": "scarf", "Gloves": "gloves",
+    "Beanie": "hat", "Beanie (Cold)": "hat", "Sun Hat (Warm)": "hat", "Sun Hat": "hat",
+    "Thick Socks": "socks", "Warm Socks": "socks", "Socks": "socks", "Socks (Warm)": "socks",
+    # Shoes
+    "Boots": "shoes", "Closed Shoes": "shoes", "Sneakers": "shoes", "Sneakers (Warm)": "shoes",
+    "City Walking Shoes": "shoes", "Hiking Boots": "hiking shoes",
+    "Flip-Flops": "sandals", "Light Sandals": "sandals",
+    # Activity gear
+    "Daypack": "day bag", "Day Hiking Pack": "day bag",
+    "Swimwear": "swimwear", "Rash Guard / Wetsuit": "swim layer", "Swim Goggles": "swim gear",
+    "Beach Towel": "towel", "Camera": "camera", "Gift / Small Present": "gift",
+    "Notebook / Laptop": "laptop", "Notebook / Study Materials": "study materials",
+    "Shirt / Blouse (Formal)": "formal top", "Dress / Suit": "formal outfit",
+    "Formal Shoes": "formal shoes", "Toiletries": "toiletries",
+}
+
+_SUBSTITUTES_CACHE = {"key": None, "index": None}
+
+
+def _bands_compatible(band, other):
+    if band == Weather.ALL or other == Weather.ALL:
+        return band == other
+    return abs(band - other) <= 1
+
+
+def build_substitution_index(catalog):
+    """item -> [(substitute, grams saved per unit)], biggest saving first."""
+    by_role = {}
+    for name, role in ITEM_ROLES.items():
+        if name in catalog:
+            by_role.setdefault(role, []).append(name)
+    index = {}
+    for role, names in by_role.items():
+        for name in names:
+            g, band = catalog.weight_g(name), catalog.weather_of(name)
+            subs = [(other, g - catalog.weight_g(other)) for other in names
+                    if other != name and catalog.weight_g(other) < g
+                    and _bands_compatible(band, catalog.weather_of(other))]
+            if subs:
+                index[name] = sorted(subs, key=lambda s: s[1], reverse=True)
+    return index
+
+
+def get_substitution_index(catalog=None):
+    """build_substitution_index, rebuilt only when the catalog changes."""
+    catalog = WEIGHT_TABLE if catalog is None else catalog
+    if isinstance(catalog, ItemOverlay):   # own items have no ITEM_ROLES, so no substitutes
+        catalog = catalog.base
+    key = (catalog.token, catalog.version)
+    if _SUBSTITUTES_CACHE["key"] != key:
+        _SUBSTITUTES_CACHE["index"] = build_substitution_index(catalog)
+        _SUBSTITUTES_CACHE["key"] = key
+    return _SUBSTITUTES_CACHE["index"]
+
+
+def _action_text(action, catalog):
+    if action["action"] == "swap":
+        return (f"Swap {action['item']} ({catalog.weight_kg(action['item'])} kg) for "
+                f"{action['to']} ({catalog.weight_kg(action['to'])} kg)"
+                + (f" × {action['qty']}" if action["qty"] > 1 else ""))
+    if action["action"] == "reduce":
+        return f"Pack {action['by']} fewer {action['item']}"
+    return f"Leave {action['item']} at home"
+
+
+@metrics.timed("suggest")
+def suggest_actions(items, limit_kg, buffer=0.3, weight_table=None, volume_limit_l=None):
+    """The fewest swap / reduce actions that bring a list under its target.
+
+    Candidates are a swap to each lighter substitute (all units of an item)
+    and a reduce down to one unit (never for HARD_KEEP). Each step takes,
+    if one exists, the smallest action that clears what is left on its own,
+    otherwise the one that clears the most; every item is touched at most
+    once. Leaving an item at home ("remove") is only offered if swaps and
+    reductions cannot reach the target. Returns {"actions", "reached",
+    "after", "volume_after"}; actions carry "saves_kg", "saves_l" and "text".
+    """
+    catalog = list_catalog(items, weight_table)
+    subs = get_substitution_index(catalog)
+    total_g = sum(catalog.weight_g(i) * q for i, q in items.items())
+    total_ml = sum(catalog.volume_ml(i) * q for i, q in items.items())
+    excess_g = 0 if limit_kg is None else total_g - _limit_g(max(0.0, float(limit_kg) - float(buffer)))
+    excess_ml = 0 if volume_limit_l is None else total_ml - _limit_g(float(volume_limit_l))
+
+    def candidates(allow_remove):
+        out = []
+        for item, qty in items.items():
+            if qty <= 0:
+                continue
+            g, ml = catalog.weight_g(item), catalog.volume_ml(item)
+            for sub, saved in subs.get(item, ()):
+                out.append({"action": "swap", "item": item, "to": sub, "qty": qty,
+                            "g": saved * qty, "ml": (ml - catalog.volume_ml(sub)) * qty})
+            if item in HARD_KEEP:
+                continue
+            if qty > 1:
+                out.append({"action": "reduce", "item": item, "by": qty - 1,
+                            "g": g * (qty - 1), "ml": ml * (qty - 1)})
+            elif allow_remove:
+                out.append({"action": "remove", "item": item, "by": 1, "g": g, "ml": ml})
+        return out
+
+    def shrink(c, need_g, need_ml):
+        """A reduce that clears the rest with fewer units, if it can."""
+        if c["action"] != "reduce":
+            return c
+        unit_g, unit_ml = c["g"] // c["by"], c["ml"] // c["by"]
+        by = max(-(-need_g // unit_g) if need_g > 0 and unit_g else 0,
+                 -(-need_ml // unit_ml) if need_ml > 0 and unit_ml else 0, 1)
+        return dict(c, by=by, g=unit_g * by, ml=unit_ml * by) if by < c["by"] else c
+
+    chosen, touched = [], set()
+    for allow_remove in (False, True):
+        pool = candidates(allow_remove)
+        while excess_g > 0 or excess_ml > 0:
+            pool = [c for c in pool if c["item"] not in touched and c.get("to") not in touched]
+            if not pool:
+                break
+            covering = [shrink(c, excess_g, excess_ml) for c in pool
+                        if c["g"] >= excess_g and c["ml"] >= excess_ml]
+            if covering:
+                pick = min(covering, key=lambda c: (c["g"] + c["ml"], c["action"] != "swap"))
+            else:
+                def cleared(c):
+                    return ((min(c["g"], excess_g) / excess_g if excess_g > 0 else 0)
+                            + (min(c["ml"], excess_ml) / excess_ml if excess_ml > 0 else 0))
+                pick = max(pool, key=cleared)
+            chosen.append(pick)
+            touched.add(pick["item"])
+            if pick["action"] == "swap":
+                touched.add(pick["to"])
+            excess_g -= pick["g"]
+            excess_ml -= pick["ml"]
+        if excess_g <= 0 and excess_ml <= 0:
+            break
+
+    actions = []
+    for c in chosen:
+        action = {k: v for k, v in c.items() if k not in ("g", "ml")}
+        action.update(saves_kg=c["g"] / 1000, saves_l=c["ml"] / 1000)
+        action["text"] = _action_text(action, catalog)
+        actions.append(action)
+    after = apply_actions(items, actions)
+    return {"actions": actions, "reached": excess_g <= 0 and excess_ml <= 0,
+            "after": total_weight(after, catalog),
+            "volume_after": None if volume_limit_l is None else total_volume(after, catalog)}
+
+
+def apply_actions(items, actions):
+    """A copy of the list with suggest_actions' actions applied."""
+    result = dict(items)
+    for a in actions:
+        if a["action"] == "swap":
+            result[a["to"]] = result.get(a["to"], 0) + a["qty"]
+            n = a["qty"]
+        else:
+            n = a["by"]
+        result[a["item"]] -= n
+        if result[a["item"]] <= 0:
+            del result[a["item"]]
+    return result
+
+
+# -----------------------
+# 6f. Packing list with edit history
+# -----------------------
+
+PACKING_HISTORY_SIZE = 500   # changes kept for undo; older ones are dropped
+
+
+class PackingList(MutableMapping):
+    """A packing list (item -> quantity) that records every change as a delta.
+
+    One change — a quantity edit, a whole trim, a swap — is one history
+    entry: a label and the (item, old qty, new qty) triples it touched.
+    undo/redo replay a single entry, so they cost as much as the change
+    itself, never a copy of the list, and weight and volume are running
+    totals in grams / millilitres updated by each delta. `version` counts
+    applied changes; diff(a, b) nets out everything between two versions
+    (e.g. what a trim removed). Only the newest max_history entries are
+    kept, so memory stays flat over long sessions. Setting a quantity to
+    0 removes the item.
+    """
+
+    def __init__(self, items=(), catalog=None, max_history=PACKING_HISTORY_SIZE):
+        self.catalog = WEIGHT_TABLE if catalog is None else catalog
+        self._qty = {}
+        self._grams = self._ml = 0
+        self._priced_at = self.catalog.version
+        self._log = deque(maxlen=max_history)
+        self._pos = 0       # entries of _log currently applied (the rest can be redone)
+        self._dropped = 0   # entries that fell off the front of _log
+        for item, qty in dict(items).items():
+            self._set(item, qty)
+
+    # Mapping interface
+    def __getitem__(self, item):
+        return self._qty[item]
+
+    def __iter__(self):
+        return iter(self._qty)
+
+    def __len__(self):
+        return len(self._qty)
+
+    def __setitem__(self, item, qty):
+        self.change({item: qty})
+
+    def __delitem__(self, item):
+        if item not in self._qty:
+            raise KeyError(item)
+        self.change({item: 0})
+
+    def clear(self):
+        self.replace({}, "clear")
+
+    def __repr__(self):
+        return f"PackingList({self._qty!r}, version={self.version})"
+
+    def to_dict(self):
+        return dict(self._qty)
+
+    # Running totals
+    def _set(self, item, qty):
+        old = self._qty.get(item, 0)
+        qty = max(0, int(qty))
+        if qty:
+            self._qty[item] = qty
+        else:
+            self._qty.pop(item, None)
+        self._grams += (qty - old) * self.catalog.weight_g(item)
+        self._ml += (qty - old) * self.catalog.volume_ml(item)
+        return old, qty
+
+    def _reprice(self):
+        """Recompute the totals once if the catalog's weights changed under us."""
+        if self._priced_at != self.catalog.version:
+            self._grams = sum(self.catalog.weight_g(i) * q for i, q in self._qty.items())
+            self._ml = sum(self.catalog.volume_ml(i) * q for i, q in self._qty.items())
+            self._priced_at = self.catalog.version
+
+    @property
+    def total_kg(self):
+        self._reprice()
+        return round(self._grams / 1000, 3)
+
+    @property
+    def volume_l(self):
+        self._reprice()
+        return round(self._ml / 1000, 3)
+
+    # Recording changes
+    def change(self, quantities, label="edit"):
+        """Set several quantities as one history entry; returns the changes made."""
+        changes = []
+        for item, qty in quantities.items():
+            old, new = self._set(item, qty)
+            if old != new:
+                changes.append((item, old, new))
+        if changes:
+            while len(self._log) > self._pos:   # a new change discards what could be redone
+                self._log.pop()
+            if len(self._log) == self._log.maxlen:
+                self._dropped += 1
+            self._log.append((label, tuple(changes)))
+            self._pos = len(self._log)
+        return changes
+
+    def replace(self, items, label="replace"):
+        """Make the list equal to `items` (e.g. a trim result), recording only what differs."""
+        target = dict(items)
+        delta = {i: 0 for i in self._qty if i not in target}
+        delta.update((i, q) for i, q in target.items() if self._qty.get(i, 0) != q)
+        return self.change(delta, label)
+
+    def define(self, name, weight_kg, weather="All", volume_l=0.0):
+        """Give this list an item of its own, e.g. one the user typed in.
+
+        The item goes into an ItemOverlay over the list's catalog (made on
+        first use); the shared catalog is not touched.
+        """
+        if not isinstance(self.catalog, ItemOverlay):
+            self.catalog = ItemOverlay(self.catalog)
+        self.catalog.add(name, weight_kg, weather, volume_l)
+
+    def swap(self, item, to, qty=None):
+        """Replace qty units (default: all) of item with the same number of `to`."""
+        if item == to:
+            return []
+        qty = self._qty.get(item, 0) if qty is None else min(qty, self._qty.get(item, 0))
+        return self.change({item: self._qty.get(item, 0) - qty, to: self._qty.get(to, 0) + qty},
+                           "swap")
+
+    def trim(self, limit_kg, safety_buffer=0.3, solver="greedy", volume_limit_l=None):
+        """Trim in place (one history entry); returns the trim info."""
+        trimmed, info = cached_trim_to_limit(self._qty, self.catalog, limit_kg, safety_buffer,
+                                             solver=solver, volume_limit_l=volume_limit_l)
+        self.replace(trimmed, "trim")
+        return info
+
+    # History
+    @property
+    def version(self):
+        return self._dropped + self._pos
+
+    @property
+    def can_undo(self):
+        return self._pos > 0
+
+    @property
+    def can_redo(self):
+        return self._pos < len(self._log)
+
+    def undo(self):
+        """Revert the last change; returns its label, or None if there is nothing to undo."""
+        if not self._pos:
+            return None
+        self._pos -= 1
+        label, changes = self._log[self._pos]
+        for item, old, _ in changes:
+            self._set(item, old)
+        return label
+
+    def redo(self):
+        if self._pos == len(self._log):
+            return None
+        label, changes = self._log[self._pos]
+        for item, _, new in changes:
+            self._set(item, new)
+        self._pos += 1
+        return label
+
+    def history(self):
+        """[(version after the change, label, items touched)], oldest first; undone ones included."""
+        return [(self._dropped + n + 1, label, len(changes))
+                for n, (label, changes) in enumerate(self._log)]
+
+    def diff(self, since, until=None):
+        """{item: (qty at `since`, qty at `until`)} for items that differ (until: now)."""
+        until = self.version if until is None else until
+        lo, hi = sorted((since, until))
+        if lo < self._dropped or hi > self._dropped + len(self._log):
+            raise ValueError(f"Versions {since}..{until} are not in the history "
+                             f"({self._dropped}..{self._dropped + len(self._log)})")
+        net = {}
+        for _, changes in itertools.islice(self._log, lo - self._dropped, hi - self._dropped):
+            for item, old, new in changes:
+                net[item] = (net[item][0] if item in net else old, new)
+        if since > until:
+            net = {item: (b, a) for item, (a, b) in net.items()}
+        return {item: qa for item, qa in net.items() if qa[0] != qa[1]}
+
+
+# -----------------------
+# 7. Headless pipeline
+# -----------------------
+# No prompts and no STATE: a trip spec goes in, a plain dict comes out, so
+# servers, batch jobs and threads can call this directly. The CLI below and
+# the Streamlit app are front-ends over these functions.
+
+@metrics.timed("list.build")
+def build_initial_items(weather_key, activities_selected):
+    """Weather template + the items for each chosen activity."""
+    items = template[weather_key].copy()
+    for act in activities_selected:
+        extra_items = activity_template.get(act, {})
+        for item, qty in extra_items.items():
+            items[item] = items.get(item, 0) + qty
+    return items
+
+
+def limit_from_rules(weight_kg):
+    """Airline weight string ('8.0', '0', None) -> kg, or None for no fixed limit."""
+    try:
+        limit = float(weight_kg)
+    except (TypeError, ValueError):
+        return None
+    return limit if limit > 0 else None
+
+
+def resolve_baggage_rules(airline=None, weight_kg=None, dimensions_cm=None):
+    """Airline name and/or manual rules -> the rules we check against.
+
+    Manual weight_kg / dimensions_cm win over the airline table. Besides
+    the display strings, rules carry "limit_kg", the numeric "dims_cm"
+    (L, W, H) and the usable "volume_l" of such a bag (None when unknown).
+    """
+    rec = get_airline_info(airline) if airline and weight_kg is None else None
+    if rec:
+        weight = rec.get("weight_kg")
+        rules = {"airline": rec.get("airline"), "matched": True,
+                 "weight_kg": "0" if weight is None else str(weight),
+                 "dimensions_cm": rec.get("dimensions_cm"), "extras": rec.get("extras")}
+    else:
+        rules = {"airline": airline or "Unknown airline", "matched": False,
+                 "weight_kg": None if weight_kg is None else str(weight_kg),
+                 "dimensions_cm": parse_dimensions(dimensions_cm) or dimensions_cm, "extras": None}
+    rules["limit_kg"] = limit_from_rules(rules["weight_kg"])
+    rules["dims_cm"] = (rec.get("dims_cm") if rec else None) or dimensions_to_cm(rules["dimensions_cm"])
+    rules["volume_l"] = bag_volume_l(rules["dims_cm"])
+    return rules
+
+
+def _weight_fields(total, limit_kg, buffer):
+    if limit_kg is None:
+        return {"total": total, "limit": None, "target": None, "margin": None, "status": "no limit"}
+    target = round(float(limit_kg) - float(buffer), 3)
+    margin = round(target - total, 3)
+    return {"total": total, "limit": float(limit_kg), "target": target, "margin": margin,
+            "status": weight_status(margin)}
+
+
+def weight_report(items, limit_kg, buffer=0.3, weight_table=None):
+    weight_table = list_catalog(items, weight_table)
+    return _weight_fields(total_weight(items, weight_table), limit_kg, buffer)
+
+
+def _fit_fields(total, volume, limit_kg, volume_l, buffer):
+    report = _weight_fields(total, limit_kg, buffer)
+    report["volume"] = volume
+    report["volume_limit"] = volume_l
+    report["volume_margin"] = None if volume_l is None else round(volume_l - volume, 3)
+    report["fits_weight"] = report["status"] != "over"
+    report["fits_volume"] = volume_l is None or volume <= volume_l
+    report["fits"] = report["fits_weight"] and report["fits_volume"]
+    return report
+
+
+def check_fit(items, limit_kg=None, volume_l=None, buffer=0.3, weight_table=None):
+    """Weight and bag volume together: weight_report plus "volume", "volume_limit",
+    "volume_margin", "fits_weight", "fits_volume" and "fits" (both)."""
+    weight_table = list_catalog(items, weight_table)
+    return _fit_fields(total_weight(items, weight_table), total_volume(items, weight_table),
+                       limit_kg, volume_l, buffer)
+
+
+def resolve_itinerary(legs):
+    """Legs -> (effective rules, rules per leg).
+
+    A leg is an airline name or a dict with "airline" and/or manual
+    "weight_kg" / "dimensions_cm", resolved like resolve_baggage_rules. The
+    effective rules are the strictest of all legs: the lowest weight limit
+    and, axis by axis, the smallest bag (every sizer must accept the bag).
+    """
+    leg_rules = []
+    for leg in legs:
+        leg = {"airline": leg} if isinstance(leg, str) else leg
+        leg_rules.append(resolve_baggage_rules(leg.get("airline"), leg.get("weight_kg"),
+                                               leg.get("dimensions_cm")))
+    if not leg_rules:
+        raise ValueError("An itinerary needs at least one leg.")
+    limits = [r["limit_kg"] for r in leg_rules if r["limit_kg"] is not None]
+    boxes = [sorted(r["dims_cm"], reverse=True) for r in leg_rules if r["dims_cm"]]
+    dims = tuple(min(axis) for axis in zip(*boxes)) if boxes else None
+    limit = min(limits) if limits else None
+    effective = {"airline": " → ".join(r["airline"] for r in leg_rules),
+                 "matched": all(r["matched"] for r in leg_rules),
+                 "weight_kg": "0" if limit is None else str(limit),
+                 "dimensions_cm": "×".join(map(str, dims)) if dims else None,
+                 "extras": "; ".join(r["extras"] for r in leg_rules if r.get("extras")) or None,
+                 "limit_kg": limit, "dims_cm": dims, "volume_l": bag_volume_l(dims)}
+    return effective, leg_rules
+
+
+def itinerary_report(items, leg_rules, buffer=0.3, weight_table=None):
+    """check_fit for every leg, from a single weight and volume sum of the list."""
+    weight_table = list_catalog(items, weight_table)
+    total, volume = total_weight(items, weight_table), total_volume(items, weight_table)
+    return [dict(_fit_fields(total, volume, r["limit_kg"], r["volume_l"], buffer), airline=r["airline"])
+            for r in leg_rules]
+
+
+def _check_trip(spec):
+    """spec -> (weather, activities), or ValueError for an unknown band or activity."""
+    weather = spec.get("weather")
+    if weather not in template:
+        raise ValueError(f"Unknown weather: {weather!r} (use one of {list(template)})")
+    activities = list(spec.get("activities") or [])
+    unknown = [a for a in activities if a not in activity_template]
+    if unknown:
+        raise ValueError(f"Unknown activities: {unknown}")
+    return weather, activities
+
+
+@metrics.timed("pipeline.plan_trip")
+def plan_trip(spec, weight_table=None):
+    """Trip spec -> packing list, fit report (check_fit) and (optionally) trim result.
+
+    spec keys: "weather" (a template key), "activities" (list), "airline"
+    or manual "weight_kg" / "dimensions_cm" (or "legs", a list of those for
+    a multi-flight trip, see resolve_itinerary), and optionally "items" (an
+    edited list to use instead of the template one), "safety_buffer"
+    (default 0.3), "trim" (default True) and "solver" ("greedy"/"exact").
+    The trim respects the bag volume as well as the weight limit. With
+    "allocate": True the list is also split across cabin_bags (options
+    "personal_item", default True, and "checked_kg" for a paid bag).
+    """
+    refresh_catalog()
+    weight_table = WEIGHT_TABLE if weight_table is None else weight_table
+    weather, activities = _check_trip(spec)
+
+    from_base = spec.get("items") is None and weight_table is WEIGHT_TABLE
+    if spec.get("items") is not None:
+        items = dict(spec["items"])
+    elif from_base:
+        items = base_list(weather, activities)
+    else:
+        items = build_initial_items(weather, activities)
+    leg_rules = None
+    if spec.get("legs"):
+        rules, leg_rules = resolve_itinerary(spec["legs"])
+    else:
+        rules = resolve_baggage_rules(spec.get("airline"), spec.get("weight_kg"),
+                                      spec.get("dimensions_cm"))
+    buffer = float(spec.get("safety_buffer", 0.3))
+    limit, volume = rules["limit_kg"], rules["volume_l"]
+    report = check_fit(items, limit, volume, buffer, weight_table)
+
+    trim = None
+    if spec.get("trim", True) and (limit is not None or volume is not None):
+        solver = spec.get("solver", "greedy")
+        if from_base:
+            trimmed, info = base_trim(weather, activities, limit, buffer, solver, volume)
+        else:
+            trimmed, info = trim_to_limit(items, weight_table, limit,
+                                          safety_buffer=buffer, respect_hard_keep=True,
+                                          max_passes=2, solver=solver, volume_limit_l=volume)
+        trim = {"items": trimmed, "info": info,
+                "weight": check_fit(trimmed, limit, volume, buffer, weight_table)}
+
+    allocation = None
+    if spec.get("allocate"):
+        bags = cabin_bags(rules, spec.get("personal_item", True), spec.get("checked_kg"))
+        allocation = allocate_bags(items, bags, weight_table, buffer, spec.get("solver", "exact"))
+
+    legs = None
+    if leg_rules is not None:
+        legs = itinerary_report(trim["items"] if trim else items, leg_rules, buffer, weight_table)
+
+    return {"weather": weather, "activities": activities, "rules": rules, "legs": legs,
+            "items": items, "weight": report, "trim": trim, "allocation": allocation}
+
+
+def items_to_rows(items, weight_table=None):
+    """Packing list -> rows for a table/CSV (Item, Quantity, weights)."""
+    weight_table = list_catalog(items, weight_table)
+    rows = []
+    for item, qty in items.items():
+        w = _unit_grams(weight_table, item) / 1000
+        rows.append({
+            "Item": item,
+            "Quantity": qty,
+            "Weight each (kg)": w,
+            "Total weight (kg)": round(w * qty, 3)
+        })
+    return rows
+
+
+def _allowance(rec):
+    """Airline record -> (limit_kg, bag volume_l), either may be None."""
+    return (limit_from_rules(rec.get("weight_kg")),
+            bag_volume_l(rec.get("dims_cm") or dimensions_to_cm(rec.get("dimensions_cm"))))
+
+
+@metrics.timed("compare_airlines")
+def compare_airlines(items, airlines=None, buffer=0.3, solver="greedy", weight_table=None):
+    """One packing list against every airline -> one row per airline, in table order.
+
+    The list's weight and volume are summed once; each airline then only
+    costs a subtraction. Trims are computed once per distinct allowance and
+    shared by every airline that has it; a bag the list already fits counts
+    as no volume limit, so more airlines share a trim.
+    Rows: airline, limit_kg, volume_l, total, volume, margin, volume_margin,
+    status, fits, and for lists that do not fit: trimmed, removed, note.
+    """
+    airlines = AIRLINES if airlines is None else airlines
+    weight_table = list_catalog(items, weight_table)
+    total = total_weight(items, weight_table)
+    volume = total_volume(items, weight_table)
+    trims = {}
+    rows = []
+    for rec in airlines.values():
+        limit, bag_l = _allowance(rec)
+        margin = None if limit is None else round(limit - buffer - total, 3)
+        volume_margin = None if bag_l is None else round(bag_l - volume, 3)
+        fits = (margin is None or margin >= 0) and (volume_margin is None or volume_margin >= 0)
+        row = {"airline": rec.get("airline"), "limit_kg": limit, "volume_l": bag_l,
+               "total": total, "volume": volume, "margin": margin, "volume_margin": volume_margin,
+               "status": "no limit" if margin is None else weight_status(margin), "fits": fits,
+               "trimmed": None, "removed": [], "note": "Already within target."}
+        if not fits:
+            key = (limit, bag_l if volume_margin is not None and volume_margin < 0 else None)
+            if key not in trims:
+                trims[key] = cached_trim_to_limit(items, weight_table, key[0], safety_buffer=buffer,
+                                                  solver=solver, volume_limit_l=key[1])
+            trimmed, info = trims[key]
+            row.update(trimmed=dict(trimmed), removed=list(info["removed"]), note=info["note"])
+        rows.append(row)
+    metrics.count("compare_airlines.trims", len(trims))
+    return rows
+
+
+# -----------------------
+# 7b. Precomputed base lists
+# -----------------------
+# The starting list only depends on the weather band (5) and the set of
+# activities (2^6 = 64), so all 320 are built once, with their totals and
+# their greedy trim for every distinct airline allowance (weight limit and bag
+# volume). Activities are taken in ACTIVITIES order, so the cached list does
+# not depend on the order picked.
+
+BASE_LISTS_FORMAT = 2
+_BASE_LISTS = {"key": None, "table": None}
+_BASE_LISTS_LOCK = threading.Lock()
+
+
+def activity_mask(activities):
+    """Activities -> bitmask over ACTIVITIES (bit i = ACTIVITIES[i])."""
+    mask = 0
+    for act in activities:
+        if act not in ACTIVITIES:
+            raise ValueError(f"Unknown activity: {act!r}")
+        mask |= 1 << ACTIVITIES.index(act)
+    return mask
+
+
+def airline_allowances(airlines=None):
+    """Distinct (limit_kg, bag volume_l) pairs in the airline table; either may be None."""
+    airlines = AIRLINES if airlines is None else airlines
+    pairs = {_allowance(rec) for rec in airlines.values()}
+    pairs.discard((None, None))
+    return sorted(pairs, key=lambda p: (p[0] or 0, p[1] or 0))
+
+
+def _base_lists_key():
+    return (WEIGHT_TABLE.version, AIRLINES_VERSION)
+
+
+def base_lists_fingerprint(buffer=0.3, solver="greedy"):
+    """Content hash of everything a base list or its trim depends on."""
+    import hashlib
+    import json
+    payload = json.dumps([BASE_LISTS_FORMAT, template, activity_template, ACTIVITIES,
+                          WEIGHT_TABLE.names, list(WEIGHT_TABLE.grams), list(WEIGHT_TABLE.volume),
+                          PRIORITY_RANK, sorted(HARD_KEEP), airline_allowances(), buffer, solver],
+                         sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def build_base_lists(buffer=0.3, solver="greedy"):
+    table = {}
+    allowances = airline_allowances()
+    for weather in template:
+        for mask in range(1 << len(ACTIVITIES)):
+            acts = [a for i, a in enumerate(ACTIVITIES) if mask >> i & 1]
+            items = build_initial_items(weather, acts)
+            entry = {"items": items, "total": total_weight(items, WEIGHT_TABLE), "trims": {}}
+            for limit, volume in allowances:
+                entry["trims"][(limit, volume, buffer, solver)] = trim_to_limit(
+                    items, WEIGHT_TABLE, limit, safety_buffer=buffer, solver=solver,
+                    volume_limit_l=volume)
+            table[(weather, mask)] = entry
+    return table
+
+
+def get_base_lists():
+    """The 320-entry table; built (or loaded, see PACKING_BASE_LISTS) on first use."""
+    key = _base_lists_key()
+    if _BASE_LISTS["key"] != key:
+        with _BASE_LISTS_LOCK:
+            if _BASE_LISTS["key"] != key:
+                path = os.environ.get("PACKING_BASE_LISTS")
+                table = load_base_lists(path) if path and os.path.exists(path) else None
+                _BASE_LISTS["table"] = table or build_base_lists()
+                _BASE_LISTS["key"] = key
+    return _BASE_LISTS["table"]
+
+
+def _base_entry(weather, activities):
+    if weather not in template:
+        raise ValueError(f"Unknown weather: {weather!r} (use one of {list(template)})")
+    return get_base_lists()[(weather, activity_mask(activities))]
+
+
+@metrics.timed("list.base")
+def base_list(weather, activities):
+    """Copy of the starting list for this weather band and activity set."""
+    return dict(_base_entry(weather, activities)["items"])
+
+
+def base_total(weather, activities):
+    return _base_entry(weather, activities)["total"]
+
+
+def base_trim(weather, activities, limit_kg, safety_buffer=0.3, solver="greedy", volume_l=None):
+    """trim_to_limit on the base list.
+
+    Precomputed for the airline allowances; any other limit (a client's own
+    weight or buffer) goes through the bounded TRIM_CACHE, so the table does
+    not grow with every value asked for.
+    """
+    entry = _base_entry(weather, activities)
+    key = (None if limit_kg is None else float(limit_kg),
+           None if volume_l is None else float(volume_l), float(safety_buffer), solver)
+    if key not in entry["trims"]:
+        return cached_trim_to_limit(entry["items"], WEIGHT_TABLE, key[0], safety_buffer=key[2],
+                                    solver=solver, volume_limit_l=key[1])
+    trimmed, info = entry["trims"][key]
+    return dict(trimmed), dict(info, removed=list(info.get("removed", [])))
+
+
+def save_base_lists(path):
+    """Write the base-list table (greedy trims at the default buffer) as JSON."""
+    import json
+    lists = []
+    for (weather, mask), entry in get_base_lists().items():
+        trims = [{"limit": k[0], "volume": k[1], "buffer": k[2], "solver": k[3], "items": t, "info": i}
+                 for k, (t, i) in entry["trims"].items() if k[2:] == (0.3, "greedy")]
+        lists.append({"weather": weather, "mask": mask, "items": entry["items"],
+                      "total": entry["total"], "trims": trims})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"format": BASE_LISTS_FORMAT, "fingerprint": base_lists_fingerprint(),
+                   "lists": lists}, f)
+
+
+def load_base_lists(path):
+    """Read a table written by save_base_lists; None if it is stale or unreadable."""
+    import json
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("format") != BASE_LISTS_FORMAT or data.get("fingerprint") != base_lists_fingerprint():
+        return None
+    table = {}
+    for entry in data["lists"]:
+        trims = {(t["limit"], t["volume"], t["buffer"], t["solver"]): (t["items"], t["info"])
+                 for t in entry["trims"]}
+        table[(entry["weather"], entry["mask"])] = {"items": entry["items"],
+                                                    "total": entry["total"], "trims": trims}
+    return table
+
+
+# -----------------------
+# 7c. Group trips
+# -----------------------
+# Families and teams pack together, and some items only need to come once
+# per group. Everyone's own list is built as usual (from the base-list
+# table); the shareable units are taken out of all of them, and the group
+# carries only as many as it needs. Those units are handed out heaviest
+# first, each to the bag with the most spare weight that still has room
+# for it, so the shared load ends up where there is margin for it.
+
+SHARED_ITEMS = {   # item -> travellers one unit serves (None: the whole group)
+    "Toiletries": 4,     # a shared wash bag; toothbrushes weigh next to nothing
+    "Camera": None,
+    "Beach Towel": 2,
+    "Notebook / Laptop": None,
+}
+_GROUP_KEYS = ("travellers", "shared", "safety_buffer")
+
+
+def _group_units(people, shared):
+    """Take the shared items out of everyone's list -> ({item: (needed by, units)}, units removed)."""
+    needs, removed = {}, {}
+    for person in people:
+        for item in shared:
+            qty = person["items"].pop(item, 0)
+            if qty:
+                count, most = needs.get(item, (0, 0))
+                needs[item] = (count + 1, max(most, qty))
+                removed[item] = removed.get(item, 0) + qty
+    units = {item: (count, most * (1 if shared[item] is None else -(-count // shared[item])))
+             for item, (count, most) in needs.items()}
+    return units, removed
+
+
+def _spare(person, weight_table, buffer):
+    """Spare grams and millilitres in a traveller's bag (inf when not limited)."""
+    rules = person["rules"]
+    grams = round(total_weight(person["items"], weight_table) * 1000)
+    ml = round(total_volume(person["items"], weight_table) * 1000)
+    spare_g = (float("inf") if rules["limit_kg"] is None
+               else _limit_g(max(0.0, rules["limit_kg"] - buffer)) - grams)
+    spare_ml = float("inf") if rules["volume_l"] is None else _limit_g(rules["volume_l"]) - ml
+    return spare_g, spare_ml
+
+
+@metrics.timed("pipeline.plan_group")
+def plan_group(spec, weight_table=None):
+    """Group spec -> one list per traveller, with the shared items carried once.
+
+    spec keys: "travellers", a list of plan_trip-style specs ("name",
+    "weather", "activities", "airline" or manual "weight_kg" /
+    "dimensions_cm", optional "items"); any other key of the group spec is
+    a default for every traveller (a family on one flight gives "weather"
+    and "airline" once). Optional "shared" replaces SHARED_ITEMS and
+    "safety_buffer" (default 0.3) applies to every bag. Each shared unit
+    goes to the bag with the most spare weight that also has the room;
+    units no bag can take are returned in "unplaced".
+    Returns {"travellers": [{"name", "rules", "items", "carries",
+    "weight" (check_fit)}], "shared": {item: {"needed_by", "units",
+    "carried_by"}}, "unplaced", "saved_kg", "note"}.
+    """
+    refresh_catalog()
+    weight_table = WEIGHT_TABLE if weight_table is None else weight_table
+    travellers = spec.get("travellers") or []
+    if not travellers:
+        raise ValueError("A group needs at least one traveller.")
+    shared = SHARED_ITEMS if spec.get("shared") is None else spec["shared"]
+    buffer = float(spec.get("safety_buffer", 0.3))
+    defaults = {k: v for k, v in spec.items() if k not in _GROUP_KEYS}
+
+    rules_seen = {}   # most of a group shares a handful of airlines
+    people = []
+    for n, traveller in enumerate(travellers, 1):
+        traveller = dict(defaults, **traveller)
+        if traveller.get("items") is not None:
+            items = {i: q for i, q in traveller["items"].items() if q}
+        else:
+            weather, activities = _check_trip(traveller)
+            items = (base_list(weather, activities) if weight_table is WEIGHT_TABLE
+                     else build_initial_items(weather, activities))
+        key = (traveller.get("airline"), traveller.get("weight_kg"), str(traveller.get("dimensions_cm")))
+        if key not in rules_seen:
+            rules_seen[key] = resolve_baggage_rules(traveller.get("airline"), traveller.get("weight_kg"),
+                                                    traveller.get("dimensions_cm"))
+        people.append({"name": traveller.get("name") or f"Traveller {n}", "rules": rules_seen[key],
+                       "items": items, "carries": {}})
+
+    units, removed = _group_units(people, shared)
+    spare = [list(_spare(p, weight_table, buffer)) for p in people]
+    heap = [(-g, k) for k, (g, _) in enumerate(spare)]
+    heapq.heapify(heap)
+    pieces = sorted(((_unit_grams(weight_table, item), _unit_ml(weight_table, item), item)
+                     for item, (_, qty) in units.items() for _ in range(qty)), reverse=True)
+    smallest = min((ml for _, ml, _ in pieces), default=0)
+    unplaced = {}
+    for grams, ml, item in pieces:
+        skipped, taker = [], None
+        while heap and -heap[0][0] >= grams:
+            entry = heapq.heappop(heap)
+            if spare[entry[1]][1] >= ml:
+                taker = entry[1]
+                break
+            if spare[entry[1]][1] >= smallest:
+                skipped.append(entry)   # no room for this one, but for a smaller piece
+        if taker is None:
+            unplaced[item] = unplaced.get(item, 0) + 1
+        else:
+            spare[taker][0] -= grams
+            spare[taker][1] -= ml
+            carries = people[taker]["carries"]
+            carries[item] = carries.get(item, 0) + 1
+            heapq.heappush(heap, (-spare[taker][0], taker))
+        for entry in skipped:
+            heapq.heappush(heap, entry)
+
+    carried_by = {item: [] for item in units}
+    out = []
+    for person in people:
+        items = person["items"]
+        for item, qty in person["carries"].items():
+            items[item] = items.get(item, 0) + qty
+            carried_by[item].append(person["name"])
+        rules = person["rules"]
+        out.append({"name": person["name"], "rules": dict(rules), "items": items,
+                    "carries": person["carries"],
+                    "weight": check_fit(items, rules["limit_kg"], rules["volume_l"], buffer, weight_table)})
+
+    saved_g = sum(_unit_grams(weight_table, item) * (removed[item] - qty)
+                  for item, (_, qty) in units.items())
+    over = sum(not t["weight"]["fits"] for t in out)
+    if unplaced:
+        note = f"{sum(unplaced.values())} shared item(s) do not fit any bag."
+    elif over:
+        note = f"{over} traveller(s) are over their limit."
+    else:
+        note = "Everyone's bag fits."
+    return {"travellers": out,
+            "shared": {item: {"needed_by": count, "units": qty, "carried_by": carried_by[item]}
+                       for item, (count, qty) in units.items()},
+            "unplaced": unplaced, "saved_kg": round(saved_g / 1000, 3), "note": note}
+
+
+# -----------------------
+# 8. Main 
 # -----------------------
 
 def main():
@@ -812,45 +3033,85 @@ def main():
     # Airline (sets STATE["weight_kg"], STATE["dimensions_cm"])
     ask_airline_by_name(AIRLINES, STATE)
 
+    # Other flights on this trip: the bag has to pass the strictest of them
+    legs = [{k: STATE.get(k) for k in ("airline", "weight_kg", "dimensions_cm")}]
+    while _yes_no("\nDo you have another flight on this trip with a different airline?"):
+        leg = {}
+        ask_airline_by_name(AIRLINES, leg)
+        legs.append(leg)
+    if len(legs) > 1:
+        rules, _ = resolve_itinerary(legs)
+        STATE["legs"] = legs
+        STATE["weight_kg"], STATE["dimensions_cm"] = rules["weight_kg"], rules["dimensions_cm"]
+        print(f"\nWe'll pack for the strictest rules of all {len(legs)} flights: "
+              f"{rules['limit_kg'] or 'no'} kg limit, bag up to {rules['dimensions_cm'] or 'any size'} cm.")
+
     # Activities
     activities = choose_activities()
     STATE["activities"] = activities
 
-    # Temperature → base packing template
+    # Temperature → base packing template + activity-specific items
     weather = temp()
-    items = template[weather].copy()
-
-    # Add activity-specific items
-    for act in activities:
-        extra_items = activity_template.get(act, {})
-        for item, qty in extra_items.items():
-            items[item] = items.get(item, 0) + qty
+    STATE["weather"] = weather
+    items = PackingList(base_list(weather, activities))
+    trims = []
 
     # Show packing list + total weight
-    total_kg = show_items(items)
+    show_items(items)
 
     # Let user edit (clothes + activity items)
     if input("\nDo you want change the number of your clothes? (yes/no): ").lower().startswith("y"):
         edit_items(items)
-        total_kg = show_items(items)
-
-    # Check against airline weight limit (if we have one)
-    limit_str = STATE.get("weight_kg")
-    if limit_str and limit_str != "0":
-        try:
-            limit = float(limit_str)
-            if total_kg > limit:
-                print(f"\nYour list is over your airline's carry-on limit of {limit} kg.")
-                if input("Do you want help reducing the list automatically? (yes/no): ").lower().startswith("y"):
-                    trimmed, info = run_trim_final(items)
-                    items.clear()
-                    items.update(trimmed)
-                    total_kg = show_items(items)
-        except ValueError:
-            pass
+        show_items(items)
+
+    # Anything else to bring (free text, matched against the catalog)
+    if _yes_no("\nDo you want to add other items?"):
+        ask_extra_items(items)
+        show_items(items)
+
+    # Check against airline weight limit and bag size (if we have them)
+    limit = limit_from_rules(STATE.get("weight_kg"))
+    volume = bag_volume_l(STATE.get("dimensions_cm"))
+    fit = check_fit(items, limit, volume, buffer=0)
+    show_volume_status(items, WEIGHT_TABLE, volume)
+    if not fit["fits"]:
+        if not fit["fits_weight"]:
+            print(f"\nYour list is over your airline's carry-on limit of {limit} kg.")
+        if not fit["fits_volume"]:
+            print(f"\nYour list probably won't fit a {STATE.get('dimensions_cm')} cm bag "
+                  f"(≈ {fit['volume']} L packed, ≈ {volume} L of room).")
+        suggestions = suggest_actions(items, limit, 0.3, volume_limit_l=volume)
+        if suggestions["actions"]:
+            print("\nSmart suggestions:")
+            for a in suggestions["actions"]:
+                print(f"  - {a['text']} (saves {a['saves_kg']:.2f} kg)")
+            if input("Apply these suggestions? (yes/no): ").lower().startswith("y"):
+                items.replace(apply_actions(items, suggestions["actions"]), "suggestions")
+                show_items(items)
+                fit = check_fit(items, limit, volume, buffer=0.3)
+        if not fit["fits"] and input("Do you want help reducing the list automatically? (yes/no): ").lower().startswith("y"):
+            exact = input("Keep as much of your important items as possible (slower)? (yes/no): ")
+            solver = "exact" if exact.lower().startswith("y") else "greedy"
+            trimmed, info = run_trim_final(items, solver=solver, limit_kg=limit, volume_limit_l=volume)
+            items.replace(trimmed, "trim")
+            show_items(items)
+            if _yes_no("Keep the trimmed list?"):
+                trims.append((info, limit, volume, solver))   # only kept trims go into the history
+            else:
+                items.undo()
+                show_items(items)
 
     print("\nThanks! Your packing list is ready ✅")
 
+    if _yes_no("\nSave this packing list on this computer?"):
+        from packing_store import open_store   # sqlite3 is only loaded when saving
+        store = open_store()
+        trip_id = store.save_trip(STATE, items)
+        for info, limit_kg, volume_l, solver in trims:
+            store.record_trim(trip_id, info, limit_kg, volume_l, solver)
+        STATE["trip_id"] = trip_id
+        print(f"Saved as trip #{trip_id} in {store.path}.")
+
     print("\nInfo collected so far (for debugging):")
     for k, v in STATE.items():
         print(f"  {k}: {v}")
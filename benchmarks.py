@@ -0,0 +1,528 @@
+"""Benchmark suite for the packing engine.
+
+Runs offline on synthetic data with fixed seeds, so two runs (or two
+commits) see exactly the same inputs.
+
+    python benchmarks.py                          all benchmarks, table on stdout
+    python benchmarks.py --quick                  smaller sizes (smoke run)
+    python benchmarks.py --only trim              benchmarks whose name contains "trim"
+    python benchmarks.py --json bench.json        also write machine-readable results
+    python benchmarks.py --compare base.json      flag cases slower than the baseline
+    python benchmarks.py --imports                what each entry point imports at startup
+"""
+
+import argparse
+from copy import deepcopy
+from datetime import datetime, timezone
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from Final_code_project import (WEIGHT_TABLE, AIRLINES, template, activity_template, ACTIVITIES,
+                                HARD_KEEP, ItemCatalog, _priority, total_weight,
+                                greedy_trim_to_limit_verbose, exact_trim_to_limit,
+                                build_airline_index, _normalize_name, get_airline_info,
+                                search_airlines, items_to_rows, quantities_matrix,
+                                batch_weight_report, plan_trip, plan_group, trim_to_limit,
+                                cached_trim_to_limit, PackingList, complete_items, get_item_index, _normalize_item)
+
+SEED = 2024
+
+
+# -----------------------
+# Reference implementation (unit-by-unit greedy, as originally shipped)
+# -----------------------
+
+def _greedy_trim_reference(items, weight_table, limit_kg,
+                           safety_buffer=0.3, respect_hard_keep=True, max_passes=2):
+    target = max(0.0, float(limit_kg) - float(safety_buffer))
+    current = deepcopy(items)
+    before = total_weight(current, weight_table)
+    removed_trace = []
+    if before <= target:
+        return current, {"before": before, "after": before, "removed": [], "note": "Already within target."}
+
+    def sorted_units(avoid_hard):
+        units = [(i, 1) for i, q in current.items() for _ in range(q)]
+        def key(u):
+            item = u[0]
+            pri = _priority(item)
+            if avoid_hard and item in HARD_KEEP:
+                pri = -100
+            w = weight_table.get(item, {}).get("weight", 0.0)
+            return (pri, w)
+        units.sort(key=key, reverse=True)
+        return units
+
+    for pass_id in range(max_passes):
+        avoid_hard = respect_hard_keep and pass_id == 0
+        units = sorted_units(avoid_hard)
+        for item, _ in units:
+            if total_weight(current, weight_table) <= target:
+                break
+            if avoid_hard and item in HARD_KEEP:
+                continue
+            if current.get(item, 0) > 0:
+                current[item] -= 1
+                if current[item] == 0:
+                    del current[item]
+                removed_trace.append(item)
+        if total_weight(current, weight_table) <= target:
+            break
+
+    after = total_weight(current, weight_table)
+    note = "Reached target." if after <= target else "Could not reach target without cutting essentials."
+    info = {"before": before, "after": after, "removed": removed_trace, "note": note}
+    return current, info
+
+
+# -----------------------
+# Synthetic data
+# -----------------------
+
+def synthetic_list(units):
+    """Every template + activity item, with quantities spread to reach `units`."""
+    names = []
+    for weather_items in template.values():
+        names.extend(n for n in weather_items if n not in names)
+    for act_items in activity_template.values():
+        names.extend(n for n in act_items if n not in names)
+    items = {}
+    for i in range(units):
+        name = names[i % len(names)]
+        items[name] = items.get(name, 0) + 1
+    return items
+
+
+def synthetic_catalog(n, seed=SEED):
+    """The real catalog plus n made-up items weighing 10 g to 1.5 kg."""
+    rng = random.Random(seed)
+    catalog = ItemCatalog([WEIGHT_TABLE])
+    for i in range(n):
+        catalog.add(f"Item {i:06d}", rng.randint(10, 1500) / 1000, rng.randrange(6))
+    return catalog
+
+
+def synthetic_catalog_list(n, seed=SEED):
+    """One to three units of each of the first n synthetic catalog items."""
+    rng = random.Random(seed)
+    return {f"Item {i:06d}": rng.randint(1, 3) for i in range(n)}
+
+
+def synthetic_airlines(n):
+    """n made-up carriers with pronounceable names, in AIRLINES format."""
+    syllables = ["ka", "lo", "ra", "vi", "tu", "ne", "so", "mi", "da", "pe", "zu", "ha"]
+    airlines = {}
+    for i in range(n):
+        parts = [syllables[(i // 12 ** j) % 12] for j in range(4)]
+        name = "".join(parts).title() + (" Air" if i % 2 else " Airways")
+        airlines[str(i + 1)] = {"airline": name, "dimensions_cm": "55×40×23",
+                                "extras": None, "weight_kg": "8.0"}
+    return airlines
+
+
+def airline_query_mix(airlines, n, seed=SEED):
+    """Exact names, shouted/suffixed names, one-swap typos and misses, a quarter each."""
+    rng = random.Random(seed)
+    names = [rec["airline"] for rec in airlines.values()]
+    queries = []
+    for i in range(n):
+        name = rng.choice(names)
+        kind = i % 4
+        if kind == 0:
+            queries.append(name)
+        elif kind == 1:
+            queries.append(f"  {name.upper()} airlines ")
+        elif kind == 2 and len(name) > 3:
+            j = rng.randrange(len(name) - 1)
+            queries.append(name[:j] + name[j + 1] + name[j] + name[j + 2:])
+        else:
+            queries.append(f"zz{rng.randrange(10 ** 6)} air")
+    return queries
+
+
+# -----------------------
+# Benchmarks
+# -----------------------
+# Each bench_* yields result records: {"bench", "case", "best_ms",
+# "median_ms", "p95_ms", "repeat", ...extra fields such as the kept weight}.
+
+def _time(fn, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        runs.append(time.perf_counter() - start)
+    runs.sort()
+    return runs[0], runs[len(runs) // 2], runs[min(len(runs) - 1, int(0.95 * len(runs)))]
+
+
+def _record(bench, case, fn, repeat, per=1, **extra):
+    best, median, p95 = _time(fn, repeat)
+    return dict({"bench": bench, "case": case, "best_ms": best * 1000 / per,
+                 "median_ms": median * 1000 / per, "p95_ms": p95 * 1000 / per,
+                 "repeat": repeat}, **extra)
+
+
+def bench_trim_greedy(quick):
+    for units in ((10, 100, 1000) if quick else (10, 100, 1000, 10000)):
+        items = synthetic_list(units)
+        ref = _greedy_trim_reference(items, WEIGHT_TABLE, 8.0)
+        assert ref == greedy_trim_to_limit_verbose(items, WEIGHT_TABLE, 8.0), f"differs at {units} units"
+        repeat = 5 if units <= 1000 else 1
+        yield _record("trim_greedy", f"reference/{units}u",
+                      lambda: _greedy_trim_reference(items, WEIGHT_TABLE, 8.0), repeat)
+        yield _record("trim_greedy", f"incremental/{units}u",
+                      lambda: greedy_trim_to_limit_verbose(items, WEIGHT_TABLE, 8.0), repeat)
+
+
+def bench_trim_exact(quick):
+    for units in ((10, 100, 1000) if quick else (10, 100, 300, 1000, 10000)):
+        items = synthetic_list(units)
+        _, info = exact_trim_to_limit(items, WEIGHT_TABLE, 8.0)
+        yield _record("trim_exact", f"{units}u", lambda: exact_trim_to_limit(items, WEIGHT_TABLE, 8.0),
+                      5, kept_kg=info["after"], solver=info.get("solver"))
+        _, info = exact_trim_to_limit(items, WEIGHT_TABLE, 8.0, volume_limit_l=37.4)
+        yield _record("trim_exact", f"{units}u+volume",
+                      lambda: exact_trim_to_limit(items, WEIGHT_TABLE, 8.0, volume_limit_l=37.4),
+                      5, kept_kg=info["after"], solver=info.get("solver"))
+
+
+def bench_trim_adversarial(quick):
+    units = 2000 if quick else 20000
+    # 200 items at the same priority and weight: every comparison is a tie
+    flat = ItemCatalog()
+    for i in range(200):
+        flat.add(f"Tie {i:03d}", 0.25)
+    tied = {f"Tie {i:03d}": units // 200 for i in range(200)}
+    # Three quarters HARD_KEEP units, so the first pass cannot reach the target
+    essentials = ItemCatalog([{"Socks": {"weight": 0.05}, "Underwear": {"weight": 0.06},
+                               "T-shirt": {"weight": 0.20}}])
+    hard = {"Socks": units // 2, "Underwear": units // 4, "T-shirt": units // 4}
+    for case, items, table in (("equal-priority", tied, flat), ("hard-keep-heavy", hard, essentials)):
+        for solver, trim in (("greedy", greedy_trim_to_limit_verbose), ("exact", exact_trim_to_limit)):
+            _, info = trim(items, table, 10.0)
+            yield _record("trim_adversarial", f"{case}/{solver}/{units}u",
+                          lambda: trim(items, table, 10.0), 3,
+                          kept_kg=info["after"], note=info["note"])
+
+
+def bench_catalog_scale(quick):
+    for n in ((60, 1000, 10000) if quick else (60, 1000, 10000, 100000)):
+        catalog = synthetic_catalog(n)
+        items = synthetic_catalog_list(n)
+        repeat = 5 if n <= 10000 else 2
+        yield _record("catalog_scale", f"total_weight/{n}", lambda: total_weight(items, catalog), repeat)
+        yield _record("catalog_scale", f"greedy/{n}",
+                      lambda: greedy_trim_to_limit_verbose(items, catalog, 10.0), repeat)
+        _, info = exact_trim_to_limit(items, catalog, 10.0)
+        yield _record("catalog_scale", f"exact/{n}", lambda: exact_trim_to_limit(items, catalog, 10.0),
+                      repeat, kept_kg=info["after"], solver=info.get("solver"))
+
+
+def bench_airline(quick):
+    n_queries = 100 if quick else 400
+    queries = airline_query_mix(AIRLINES, n_queries)
+
+    def rebuild_per_query():
+        for q in queries:
+            index = build_airline_index(AIRLINES)
+            key = _normalize_name(q)
+            index.get(key) or index.get(key.replace(" ", ""))
+
+    yield _record("airline", "lookup/rebuild-per-query", rebuild_per_query, 3, per=n_queries)
+    yield _record("airline", "lookup/cached", lambda: [get_airline_info(q) for q in queries], 10,
+                  per=n_queries)
+    for n in ((len(AIRLINES), 1000) if quick else (len(AIRLINES), 1000, 5000)):
+        airlines = AIRLINES if n == len(AIRLINES) else synthetic_airlines(n)
+        mix = airline_query_mix(airlines, n_queries)
+        search_airlines("warm up", airlines=airlines)   # builds the index once
+        yield _record("airline", f"fuzzy/{n}", lambda: [search_airlines(q, airlines=airlines) for q in mix],
+                      5, per=n_queries)
+
+
+def bench_export(quick):
+    try:
+        import pandas as pd
+    except ImportError:
+        pd = None
+    for n in ((60, 1000) if quick else (60, 1000, 10000, 100000)):
+        catalog = synthetic_catalog(n)
+        items = synthetic_catalog_list(n)
+        repeat = 5 if n <= 10000 else 2
+        yield _record("export", f"items_to_rows/{n}", lambda: items_to_rows(items, catalog), repeat)
+        if pd is not None:
+            yield _record("export", f"items_to_dataframe/{n}",
+                          lambda: pd.DataFrame(items_to_rows(items, catalog)), repeat)
+
+
+def bench_batch(quick):
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return
+    n_lists = 1000 if quick else 10000
+    lists = [synthetic_list(10 + i % 200) for i in range(n_lists)]
+    matrix = quantities_matrix(lists)
+    yield _record("batch", f"total_weight-loop/{n_lists}",
+                  lambda: [total_weight(q, WEIGHT_TABLE) for q in lists], 3)
+    yield _record("batch", f"batch_weight_report/{n_lists}", lambda: batch_weight_report(matrix, 10.0), 3)
+
+
+def bench_pipeline(quick):
+    spec = {"weather": "Cold", "activities": ["Sightseeing", "Work / Study"], "airline": "KLM"}
+    plan_trip(spec)   # builds the base-list table
+    yield _record("pipeline", "plan_trip", lambda: [plan_trip(spec) for _ in range(100)], 5, per=100)
+    rng = random.Random(SEED)
+    for n in (50, 500):
+        group = {"airline": "KLM", "travellers": [
+            {"weather": rng.choice(list(template)), "activities": rng.sample(ACTIVITIES, rng.randint(0, 3))}
+            for _ in range(n)]}
+        yield _record("pipeline", f"plan_group/{n}", lambda: plan_group(group), 5)
+    items = synthetic_list(60)
+    yield _record("pipeline", "trim/uncached", lambda: [trim_to_limit(items, WEIGHT_TABLE, 8.0)
+                                                        for _ in range(100)], 5, per=100)
+    cached_trim_to_limit(items, WEIGHT_TABLE, 8.0)
+    yield _record("pipeline", "trim/cache-hit", lambda: [cached_trim_to_limit(items, WEIGHT_TABLE, 8.0)
+                                                         for _ in range(100)], 5, per=100)
+
+
+def bench_history(quick):
+    """One quantity edit plus a fresh total: copy-and-resum vs PackingList deltas."""
+    for n in ((1000,) if quick else (100, 1000, 10000)):
+        catalog = synthetic_catalog(n)
+        items = synthetic_catalog_list(n)
+        names = list(items)
+        plist = PackingList(items, catalog)
+
+        def copy_and_sum():
+            for k in range(100):
+                edited = dict(items)
+                edited[names[k]] = 5
+                catalog.total_kg(edited)
+
+        def delta():
+            for k in range(100):
+                plist[names[k]] = 5 + k % 2
+                plist.total_kg
+
+        def undo_redo():
+            for _ in range(50):
+                plist.undo()
+            for _ in range(50):
+                plist.redo()
+
+        yield _record("history", f"copy+total/{n}", copy_and_sum, 5, per=100)
+        yield _record("history", f"delta+total/{n}", delta, 5, per=100)
+        yield _record("history", f"undo-redo/{n}", undo_redo, 5, per=100)
+
+
+def bench_complete(quick):
+    """Autocomplete keystrokes: a linear scan of the names vs the prefix index."""
+    for n in ((1000, 10000) if quick else (1000, 10000, 50000)):
+        catalog = synthetic_catalog(n)
+        rng = random.Random(SEED)
+        names = list(catalog)
+        typed = []
+        for name in rng.sample(names, 50):
+            typed += [name[:k] for k in range(1, min(len(name), 8) + 1)]
+        typed += [f"it {rng.randrange(n):06d}"[:6] for _ in range(50)]
+        normalized = [_normalize_item(name).split() for name in names]
+
+        def scan():
+            for text in typed:
+                tokens = _normalize_item(text).split()
+                [names[i] for i, words in enumerate(normalized)
+                 if all(any(w.startswith(t) for w in words) for t in tokens)][:8]
+
+        yield _record("complete", f"build-index/{n}", lambda: get_item_index(catalog), 1,
+                      note="rebuilt on catalog change only")
+        get_item_index(catalog)
+        if n <= 10000:
+            yield _record("complete", f"scan/{n}", scan, 1, per=len(typed))
+        yield _record("complete", f"index/{n}", lambda: [complete_items(t, 8, catalog) for t in typed],
+                      5, per=len(typed))
+
+
+# Entry points measured from a cold interpreter; "" is the interpreter floor
+STARTUP_MODULES = ("", "instrumentation", "Final_code_project", "bulk_packing")
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def _cold(code, *flags, env=None):
+    return subprocess.run([sys.executable, *flags, "-c", code], cwd=_HERE, env=env,
+                          capture_output=True, text=True, check=True)
+
+
+def import_report(module, top=10):
+    """Modules a cold `import module` loads beyond the bare interpreter, by self time.
+
+    -> (total µs, [(module name, self µs, cumulative µs)]) from python -X importtime.
+    """
+    def parse(stderr):
+        rows = {}
+        for line in stderr.splitlines():
+            if line.startswith("import time:") and "|" in line and "self" not in line:
+                own, cumulative, name = line[len("import time:"):].split("|")
+                rows[name.strip()] = (int(own), int(cumulative))
+        return rows
+    floor = parse(_cold("pass", "-X", "importtime").stderr)
+    rows = parse(_cold(f"import {module}", "-X", "importtime").stderr)
+    extra = [(name, own, cum) for name, (own, cum) in rows.items() if name not in floor]
+    return sum(own for _, own, _ in extra), sorted(extra, key=lambda r: r[1], reverse=True)[:top]
+
+
+def _stale_bytecode(module):
+    import importlib.util
+    source = os.path.join(_HERE, module + ".py")
+    cached = importlib.util.cache_from_source(source)
+    return not os.path.exists(cached) or os.path.getmtime(cached) < os.path.getmtime(source)
+
+
+def bench_startup(quick):
+    for module in STARTUP_MODULES:
+        code = f"import {module}" if module else "pass"
+        yield _record("startup", f"import/{module or 'interpreter'}", lambda: _cold(code),
+                      5 if quick else 15)
+
+
+def bench_catalog_file(quick):
+    """A large catalog built from Python dicts vs loaded from its compiled, mapped file."""
+    import tempfile
+    from catalog_file import CatalogArtifact, compile_catalog, export_catalog
+    n = 10000 if quick else 100000
+    with tempfile.TemporaryDirectory() as tmp:
+        source_path, artifact_path = os.path.join(tmp, "catalog.json"), os.path.join(tmp, "catalog.pkc")
+        export_catalog(source_path)
+        with open(source_path, encoding="utf-8") as f:
+            source = json.load(f)
+        catalog = synthetic_catalog(n)
+        items = source["items"] = {name: catalog[name] for name in catalog}
+        with open(source_path, "w", encoding="utf-8") as f:
+            json.dump(source, f)
+        yield _record("catalog_file", f"compile/{n}", lambda: compile_catalog(source_path, artifact_path), 1)
+
+        def mapped():
+            artifact = CatalogArtifact(artifact_path)
+            ItemCatalog().load_columns(artifact.names(), artifact.column("grams"),
+                                       artifact.column("volume"), artifact.column("weather"))
+
+        yield _record("catalog_file", f"from-dicts/{n}", lambda: ItemCatalog([items]), 3)
+        yield _record("catalog_file", f"mapped/{n}", mapped, 5)
+        env = dict(os.environ, PACKING_CATALOG=artifact_path)
+        yield _record("catalog_file", f"import/{n}-items",
+                      lambda: _cold("import Final_code_project", env=env), 5)
+
+
+def bench_app(quick):
+    """Streamlit reruns (script run through AppTest, no browser) with a long list."""
+    try:
+        from streamlit.testing.v1 import AppTest
+    except ImportError:
+        return
+    script = os.path.join(_HERE, "Streamlit_code")
+    sizes = (300,) if quick else (100, 300)
+    # The app reads the shared WEIGHT_TABLE, so the made-up items go there (runs last)
+    rng = random.Random(SEED)
+    for i in range(max(sizes)):
+        if f"Item {i:06d}" not in WEIGHT_TABLE:
+            WEIGHT_TABLE.add(f"Item {i:06d}", rng.randint(10, 1500) / 1000, rng.randrange(6))
+    for n in sizes:
+        at = AppTest.from_file(script, default_timeout=60)
+        at.session_state["items"] = synthetic_catalog_list(n)
+        at.session_state["weight_kg_str"] = "10"
+        at.run()
+        yield _record("app", f"rerun/{n}-items", at.run, 10 if quick else 20)
+
+
+BENCHMARKS = [bench_trim_greedy, bench_trim_exact, bench_trim_adversarial, bench_catalog_scale,
+              bench_airline, bench_export, bench_batch, bench_pipeline, bench_history,
+              bench_complete, bench_startup, bench_catalog_file, bench_app]
+
+
+# -----------------------
+# Running and comparing
+# -----------------------
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                             text=True, timeout=10)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run(only=None, quick=False, out=sys.stdout):
+    """Run the selected benchmarks -> {"meta": ..., "results": [records]}."""
+    results = []
+    for bench in BENCHMARKS:
+        if only and only not in bench.__name__:
+            continue
+        for rec in bench(quick):
+            results.append(rec)
+            print(f"{rec['bench']:<17} {rec['case']:<36} {rec['best_ms']:>11.4f} ms"
+                  f"  (median {rec['median_ms']:.4f}, p95 {rec['p95_ms']:.4f})", file=out)
+    meta = {"commit": _git_commit(), "python": platform.python_version(),
+            "platform": platform.platform(), "seed": SEED, "quick": quick,
+            "time": datetime.now(timezone.utc).isoformat(timespec="seconds")}
+    return {"meta": meta, "results": results}
+
+
+def compare(current, baseline, threshold=1.25, out=sys.stdout):
+    """Print current/baseline ratios of best times; returns the cases over `threshold`."""
+    base = {(r["bench"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    print(f"\nvs baseline {baseline['meta'].get('commit')}:", file=out)
+    for rec in current["results"]:
+        old = base.get((rec["bench"], rec["case"]))
+        if not old or not old["best_ms"]:
+            continue
+        ratio = rec["best_ms"] / old["best_ms"]
+        slower = ratio > threshold
+        print(f"{rec['bench']:<17} {rec['case']:<36} {ratio:>6.2f}x{'  <-- slower' if slower else ''}",
+              file=out)
+        if slower:
+            regressions.append((rec["bench"], rec["case"], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Packing engine benchmarks.")
+    parser.add_argument("--quick", action="store_true", help="smaller sizes")
+    parser.add_argument("--only", help="run only benchmarks whose name contains this")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--compare", help="baseline JSON from an earlier --json run")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default 1.25)")
+    parser.add_argument("--imports", action="store_true",
+                        help="print what each entry point imports at startup, then exit")
+    args = parser.parse_args(argv)
+
+    if args.imports:
+        for module in STARTUP_MODULES[1:]:
+            total, rows = import_report(module)
+            print(f"\n{module}: {total / 1000:.1f} ms over the interpreter floor")
+            if _stale_bytecode(module):
+                print("  (compiled from source: run `python -m compileall .` so imports load bytecode)")
+            for name, own, cumulative in rows:
+                print(f"  {name:<40} {own / 1000:>7.2f} ms self {cumulative / 1000:>8.2f} ms cumulative")
+        return 0
+
+    current = run(args.only, args.quick)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare(current, json.load(f), args.threshold)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,234 @@
+"""Bulk mode: packing lists for a whole trip export, streamed row by row.
+
+Reads trips from CSV or JSONL, builds each list with the same logic as the
+app (plan_trip: template + activity_template, checked against the AIRLINES
+limit, optionally trimmed) and writes one CSV row per packed item in the
+items_to_dataframe layout. Work is spread over a process pool a chunk at a
+time, so memory stays bounded however large the input is.
+
+Usage:
+    python bulk_packing.py trips.csv lists.csv --trim --workers 4
+    python bulk_packing.py trips.jsonl lists.csv --summary summary.csv --resume
+
+Input fields: trip_id, weather, activities (';'-separated in CSV, a list in
+JSONL), airline, and optionally weight_kg, dimensions_cm, safety_buffer,
+solver. A crashed run can be continued with --resume: output is written in
+input order and a <output>.progress file records how far it got. A line
+that is not a JSON object, or a trip the engine rejects, gets a summary row
+with status "error" (and no item rows) instead of stopping the run. With
+PACKING_CATALOG set (see catalog_file.py) every worker maps the same
+compiled catalog, so its pages are shared rather than copied per process.
+"""
+
+from collections import deque
+import csv
+import json
+import os
+import sys
+import time
+
+from Final_code_project import plan_trip, items_to_rows
+
+ITEM_COLUMNS = ["Item", "Quantity", "Weight each (kg)", "Total weight (kg)"]
+OUTPUT_COLUMNS = ["trip_id"] + ITEM_COLUMNS
+SUMMARY_COLUMNS = ["trip_id", "airline", "limit_kg", "total_before", "total_after",
+                   "status", "fits", "removed", "note"]
+
+
+# -----------------------
+# Reading trips
+# -----------------------
+
+def read_trips(path):
+    """Yield trip specs from a .csv or .jsonl file, one at a time."""
+    if path.endswith(".jsonl") or path.endswith(".ndjson"):
+        with open(path, encoding="utf-8") as f:
+            for n, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    trip = json.loads(line)
+                except ValueError as exc:
+                    trip = {"_error": f"Line {n} is not valid JSON: {exc}"}
+                if not isinstance(trip, dict):
+                    trip = {"_error": f"Line {n} is not a JSON object."}
+                yield trip
+    else:
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield _spec_from_csv(row)
+
+
+def _spec_from_csv(row):
+    spec = {k: v for k, v in row.items() if v not in (None, "")}
+    acts = spec.get("activities", "")
+    spec["activities"] = [a.strip() for a in acts.split(";") if a.strip()]
+    return spec
+
+
+# -----------------------
+# Worker side
+# -----------------------
+
+def plan_chunk(trips, trim=False, solver="greedy"):
+    """Plan a list of trips -> [(item rows, summary row)] in the same order."""
+    results = []
+    for trip in trips:
+        if not isinstance(trip, dict):
+            trip = {"_error": "Trip is not a JSON object."}
+        trip_id = trip.get("trip_id", "")
+        try:
+            if "_error" in trip:   # read_trips could not parse this line
+                raise ValueError(trip["_error"])
+            spec = dict(trip, trim=trim)
+            spec.setdefault("solver", solver)
+            plan = plan_trip(spec)
+        except (ValueError, TypeError, KeyError, AttributeError) as exc:
+            results.append(([], {"trip_id": trip_id, "status": "error", "note": str(exc)}))
+            continue
+        final = plan["trim"] or {"items": plan["items"], "info": None, "weight": plan["weight"]}
+        info = final["info"] or {}
+        rows = [dict(r, trip_id=trip_id) for r in items_to_rows(final["items"])]
+        summary = {
+            "trip_id": trip_id,
+            "airline": plan["rules"]["airline"],
+            "limit_kg": plan["rules"]["limit_kg"],
+            "total_before": plan["weight"]["total"],
+            "total_after": final["weight"]["total"],
+            "status": final["weight"]["status"],
+            "fits": final["weight"]["fits"],
+            "removed": len(info.get("removed", [])),
+            "note": info.get("note", ""),
+        }
+        results.append((rows, summary))
+    return results
+
+
+# -----------------------
+# Driver
+# -----------------------
+
+def _chunks(trips, size, skip=0):
+    chunk = []
+    for n, trip in enumerate(trips):
+        if n < skip:
+            continue
+        chunk.append(trip)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _load_progress(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_progress(path, progress):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(progress, f)
+    os.replace(tmp, path)   # atomic, so a crash never leaves half a checkpoint
+
+
+def _open_output(path, columns, offset):
+    """Open a CSV for appending from byte `offset` (0 = fresh file with header)."""
+    if offset:
+        f = open(path, "r+", newline="", encoding="utf-8")
+        f.seek(offset)
+        f.truncate()   # drop anything written after the last checkpoint
+    else:
+        f = open(path, "w", newline="", encoding="utf-8")
+    writer = csv.DictWriter(f, fieldnames=columns, extrasaction="ignore")
+    if not offset:
+        writer.writeheader()
+    return f, writer
+
+
+def run_bulk(input_path, output_path, summary_path=None, trim=False, solver="greedy",
+             workers=None, chunk_size=500, resume=False, progress_every=5.0, log=sys.stderr):
+    """Stream trips from input_path into output_path; returns the number of trips done."""
+    progress_path = output_path + ".progress"
+    progress = _load_progress(progress_path) if resume else None
+    progress = progress or {"trips_done": 0, "output_bytes": 0, "summary_bytes": 0}
+
+    out_f, out_w = _open_output(output_path, OUTPUT_COLUMNS, progress["output_bytes"])
+    sum_f = sum_w = None
+    if summary_path:
+        sum_f, sum_w = _open_output(summary_path, SUMMARY_COLUMNS, progress["summary_bytes"])
+
+    done = progress["trips_done"]
+    started, last_report, done_at_start = time.perf_counter(), 0.0, done
+    chunks = _chunks(read_trips(input_path), chunk_size, skip=done)
+
+    def write(results):
+        nonlocal done, last_report
+        for rows, summary in results:
+            out_w.writerows(rows)
+            if sum_w:
+                sum_w.writerow(summary)
+        out_f.flush()
+        if sum_f:
+            sum_f.flush()
+        done += len(results)
+        progress.update(trips_done=done, output_bytes=out_f.tell(),
+                        summary_bytes=sum_f.tell() if sum_f else 0)
+        _save_progress(progress_path, progress)
+        now = time.perf_counter()
+        if log and now - last_report >= progress_every:
+            rate = (done - done_at_start) / max(now - started, 1e-9)
+            print(f"{done:,} trips written ({rate:,.0f}/s)", file=log)
+            last_report = now
+
+    try:
+        if workers == 0:
+            for chunk in chunks:
+                write(plan_chunk(chunk, trim, solver))
+        else:
+            # Imported here: the pool pulls in multiprocessing, which workers don't need
+            from concurrent.futures import ProcessPoolExecutor
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                in_flight = deque()
+                max_in_flight = 2 * workers   # bounds memory: only these chunks are held
+                for chunk in chunks:
+                    in_flight.append(pool.submit(plan_chunk, chunk, trim, solver))
+                    if len(in_flight) >= max_in_flight:
+                        write(in_flight.popleft().result())
+                while in_flight:
+                    write(in_flight.popleft().result())
+    finally:
+        out_f.close()
+        if sum_f:
+            sum_f.close()
+
+    if log:
+        print(f"Done: {done:,} trips in {time.perf_counter() - started:.1f} s", file=log)
+    return done
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Generate packing lists for a trip export.")
+    parser.add_argument("input", help="trips as .csv or .jsonl")
+    parser.add_argument("output", help="CSV with one row per packed item")
+    parser.add_argument("--summary", help="optional CSV with one row per trip")
+    parser.add_argument("--trim", action="store_true", help="trim lists that are over the limit")
+    parser.add_argument("--solver", choices=("greedy", "exact"), default="greedy")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes (default: CPU count, 0 = no pool)")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--resume", action="store_true", help="continue an interrupted run")
+    args = parser.parse_args(argv)
+    run_bulk(args.input, args.output, summary_path=args.summary, trim=args.trim,
+             solver=args.solver, workers=args.workers, chunk_size=args.chunk_size,
+             resume=args.resume)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""Catalog file: items, templates and airline rules outside the code.
+
+The source is a JSON file anyone can edit (a new baggage limit, a heavier
+coat); the compiler checks it and turns it into a compact binary artifact
+that the engine memory-maps at startup:
+
+    python catalog_file.py export catalog.json             # the built-in tables, as a source file
+    python catalog_file.py compile catalog.json catalog.pkc
+    python catalog_file.py info catalog.pkc
+    PACKING_CATALOG=catalog.pkc streamlit run Streamlit_code
+
+Source format (CATALOG_FORMAT 1):
+
+    {"format": 1, "version": "2026-10",             # version: any label, shown by info
+     "items": {"Heavy Coat": {"weather": "Freezing", "weight": 1.0, "volume_l": 8.0}, ...},
+     "templates": {"Freezing": {"Heavy Coat": 1, ...}, ...},
+     "activity_templates": {"Sightseeing": {"Daypack": 1, ...}, ...},
+     "activities": ["Sightseeing", ...],            # optional: order of activity_templates
+     "airlines": {"1": {"airline": "Aegean Airlines", "weight_kg": "8.0", ...}, ...}}
+
+Artifact layout (ARTIFACT_FORMAT 1), little-endian, sections 8-byte aligned:
+
+    header    magic, format, item count, SHA-1 of the source, section table
+    grams     int32 per item          weights in whole grams, indexed by item ID
+    volume    int32 per item          packed volume in millilitres
+    weather   int8 per item           Weather codes
+    names     UTF-8, NUL-separated    item names in ID order
+    tables    JSON                    version, templates, activities, airlines
+
+The numeric columns are never copied: ItemCatalog reads them straight from
+the mapping, so only the pages holding the items a request touches are
+read, and every process mapping the same file shares those pages through
+the OS page cache. compile writes to a temporary file and renames it, so a
+running engine (see refresh_catalog) keeps its old mapping until it has
+loaded the new one.
+"""
+
+from array import array
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+
+CATALOG_FORMAT = 1
+ARTIFACT_FORMAT = 1
+MAGIC = b"PACKCAT\0"
+SECTIONS = ("grams", "volume", "weather", "names", "tables")
+_HEADER = struct.Struct("<8sII20s")
+_SECTION = struct.Struct("<QQ")   # offset, length
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+# -----------------------
+# Source files
+# -----------------------
+
+def export_catalog(path):
+    """Write the engine's current items, templates and airlines as a source file."""
+    import Final_code_project as engine
+    source = {
+        "format": CATALOG_FORMAT,
+        "version": "built-in",
+        "items": {name: engine.WEIGHT_TABLE[name] for name in engine.WEIGHT_TABLE},
+        "templates": engine.template,
+        "activity_templates": engine.activity_template,
+        "activities": engine.ACTIVITIES,
+        # dims_cm is worked out from dimensions_cm on load, so only the string is the source
+        "airlines": {key: {k: v for k, v in rec.items() if k != "dims_cm"}
+                     for key, rec in engine.AIRLINES.items()},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(source, f, indent=1, ensure_ascii=False)
+
+
+def check_source(source):
+    """Raise ValueError for anything the engine could not use; returns the source."""
+    from Final_code_project import dimensions_to_cm
+    if source.get("format") != CATALOG_FORMAT:
+        raise ValueError(f"Catalog format {source.get('format')!r}, expected {CATALOG_FORMAT}")
+    items = source.get("items") or {}
+    for name, rec in items.items():
+        if not name or "\0" in name:
+            raise ValueError(f"Bad item name: {name!r}")
+        if not isinstance(rec.get("weight"), (int, float)) or rec["weight"] < 0:
+            raise ValueError(f"{name}: weight must be a number of kg >= 0")
+    listed = [(group, item) for key in ("templates", "activity_templates")
+              for group, entries in (source.get(key) or {}).items() for item in entries]
+    unknown = sorted({item for _, item in listed if item not in items})
+    if unknown:
+        raise ValueError(f"Items used in templates but missing from items: {unknown}")
+    activities = source.get("activities", list(source.get("activity_templates") or {}))
+    if sorted(activities) != sorted(source.get("activity_templates") or {}):
+        raise ValueError("activities must list exactly the activity_templates keys")
+    for key, rec in (source.get("airlines") or {}).items():
+        if not rec.get("airline"):
+            raise ValueError(f"Airline {key!r} has no name")
+        if rec.get("dimensions_cm") and dimensions_to_cm(rec["dimensions_cm"]) is None:
+            raise ValueError(f"{rec['airline']}: can't read a L×W×H size from {rec['dimensions_cm']!r}")
+    return source
+
+
+# -----------------------
+# Compiler
+# -----------------------
+
+def compile_catalog(source_path, out_path):
+    """Check a source file and write its artifact (atomically) -> item count."""
+    from Final_code_project import ItemCatalog
+    with open(source_path, "rb") as f:
+        raw = f.read()
+    source = check_source(json.loads(raw))
+    catalog = ItemCatalog([source["items"]])   # same rounding and weather codes as the engine
+    tables = {key: source.get(key) or {} for key in ("templates", "activity_templates", "airlines")}
+    tables["activities"] = source.get("activities", list(tables["activity_templates"]))
+    tables["version"] = str(source.get("version", ""))
+    columns = [catalog.grams, catalog.volume, catalog.weather]
+    if sys.byteorder == "big":
+        columns = [array(c.typecode, c) for c in columns]
+        for c in columns:
+            c.byteswap()
+    blobs = [c.tobytes() for c in columns]
+    blobs.append("\0".join(catalog.names).encode("utf-8"))
+    blobs.append(json.dumps(tables, ensure_ascii=False).encode("utf-8"))
+
+    offset = _align(_HEADER.size + _SECTION.size * len(SECTIONS))
+    table, body = [], bytearray()
+    for blob in blobs:
+        table.append((offset + len(body), len(blob)))
+        body += blob + bytes(_align(len(blob)) - len(blob))
+    header = _HEADER.pack(MAGIC, ARTIFACT_FORMAT, len(catalog), hashlib.sha1(raw).digest())
+    header += b"".join(_SECTION.pack(*entry) for entry in table)
+
+    tmp = out_path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(header + bytes(offset - len(header)) + body)
+    os.replace(tmp, out_path)   # readers keep mapping the old file until they reload
+    return len(catalog)
+
+
+# -----------------------
+# Reader
+# -----------------------
+
+def file_signature(path_or_fd):
+    """What changes when the artifact is replaced: (inode, size, mtime)."""
+    st = os.fstat(path_or_fd) if isinstance(path_or_fd, int) else os.stat(path_or_fd)
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class CatalogArtifact:
+    """A compiled catalog, memory-mapped read-only."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.signature = file_signature(f.fileno())
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self._map) < _HEADER.size + _SECTION.size * len(SECTIONS):
+            raise ValueError(f"{path}: not a compiled catalog")
+        magic, fmt, self.count, digest = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a compiled catalog")
+        if fmt != ARTIFACT_FORMAT:
+            raise ValueError(f"{path}: catalog artifact format {fmt}, expected {ARTIFACT_FORMAT}")
+        self.digest = digest.hex()
+        self._sections = {name: _SECTION.unpack_from(self._map, _HEADER.size + _SECTION.size * i)
+                          for i, name in enumerate(SECTIONS)}
+        if any(off + length > len(self._map) for off, length in self._sections.values()):
+            raise ValueError(f"{path}: truncated catalog artifact")
+        self._tables = None
+
+    def _view(self, name):
+        offset, length = self._sections[name]
+        return memoryview(self._map)[offset:offset + length]
+
+    def column(self, name):
+        """grams / volume (int32) or weather (int8), read in place from the mapping."""
+        view = self._view(name).cast("b" if name == "weather" else "i")
+        if sys.byteorder == "big" and name != "weather":
+            view = array("i", view)   # the file is little-endian: swap a private copy
+            view.byteswap()
+        return view
+
+    def names(self):
+        return bytes(self._view("names")).decode("utf-8").split("\0") if self.count else []
+
+    def tables(self):
+        """version, templates, activity_templates, activities, airlines (decoded once)."""
+        if self._tables is None:
+            self._tables = json.loads(bytes(self._view("tables")))
+        return self._tables
+
+    def info(self):
+        tables = self.tables()
+        return {"path": self.path, "format": ARTIFACT_FORMAT, "version": tables["version"],
+                "source_sha1": self.digest, "items": self.count,
+                "templates": len(tables["templates"]), "activities": len(tables["activities"]),
+                "airlines": len(tables["airlines"]), "bytes": len(self._map)}
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Export, compile or inspect a packing catalog.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("export", help="write the built-in tables as a source file").add_argument("source")
+    compile_p = sub.add_parser("compile", help="check a source file and build its artifact")
+    compile_p.add_argument("source")
+    compile_p.add_argument("artifact")
+    sub.add_parser("info", help="describe an artifact").add_argument("artifact")
+    args = parser.parse_args(argv)
+    if args.command == "export":
+        export_catalog(args.source)
+        print(f"Wrote {args.source}")
+    elif args.command == "compile":
+        try:
+            n = compile_catalog(args.source, args.artifact)
+        except ValueError as exc:
+            sys.exit(f"{args.source}: {exc}")
+        print(f"Compiled {n:,} items into {args.artifact}")
+    else:
+        for key, value in CatalogArtifact(args.artifact).info().items():
+            print(f"{key:>12}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""Lightweight timing and counters for the packing pipeline.
+
+Off by default and close to free when off: timers hand back a shared no-op
+context, decorated functions pay one flag check per call, and counters
+return straight away. Turn it on with enable() or the environment:
+
+    PACKING_METRICS=1                 collect timings and counters
+    PACKING_METRICS_FILE=out.json     collect and write them at exit (.prom = Prometheus text)
+    PACKING_PROFILE=cprofile:out.prof profile the whole run (or tracemalloc:out.txt)
+
+Usage:
+    with stage("trim"):            # context manager
+        ...
+    @timed("airline.lookup")       # decorator
+    def get_airline_info(...): ...
+    count("trim.units_examined", n)
+"""
+
+import atexit
+from collections import deque
+from contextlib import contextmanager, nullcontext
+import functools
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_enabled = (os.environ.get("PACKING_METRICS", "") not in ("", "0")
+            or bool(os.environ.get("PACKING_METRICS_FILE")))
+_counters = {}
+_timings = {}   # stage -> {"count", "total", "max", "recent": deque of seconds}
+RECENT_SAMPLES = 1000   # per stage, for percentiles
+_NULL = nullcontext()
+
+
+def enable(on=True):
+    global _enabled
+    _enabled = bool(on)
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _timings.clear()
+
+
+def count(name, n=1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + n
+
+
+def observe(stage_name, seconds):
+    """Record one duration for a stage."""
+    with _lock:
+        t = _timings.get(stage_name)
+        if t is None:
+            t = _timings[stage_name] = {"count": 0, "total": 0.0, "max": 0.0,
+                                        "recent": deque(maxlen=RECENT_SAMPLES)}
+        t["count"] += 1
+        t["total"] += seconds
+        t["max"] = max(t["max"], seconds)
+        t["recent"].append(seconds)
+
+
+class _Timer:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def stage(name):
+    """Context manager timing a block (a no-op while metrics are off)."""
+    return _Timer(name) if _enabled else _NULL
+
+
+def timed(name):
+    """Decorator timing every call of a function under `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def _percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def snapshot():
+    """Counters and per-stage timing summaries (seconds) as a plain dict."""
+    with _lock:
+        stages = {}
+        for name, t in _timings.items():
+            recent = list(t["recent"])
+            stages[name] = {"count": t["count"], "total": t["total"], "max": t["max"],
+                            "mean": t["total"] / t["count"],
+                            "p50": _percentile(recent, 0.50), "p95": _percentile(recent, 0.95)}
+        return {"counters": dict(_counters), "stages": stages}
+
+
+def _prom_name(name):
+    return "packing_" + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def to_prometheus(snap=None):
+    snap = snapshot() if snap is None else snap
+    lines = []
+    for name, value in sorted(snap["counters"].items()):
+        metric = _prom_name(name) + "_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    for name, t in sorted(snap["stages"].items()):
+        metric = _prom_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} summary")
+        lines.append(f'{metric}{{quantile="0.5"}} {t["p50"]:.9f}')
+        lines.append(f'{metric}{{quantile="0.95"}} {t["p95"]:.9f}')
+        lines.append(f"{metric}_sum {t['total']:.9f}")
+        lines.append(f"{metric}_count {t['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def export(path):
+    """Write the current metrics to `path`: Prometheus text for .prom/.txt, else JSON."""
+    import json
+    snap = snapshot()
+    with open(path, "w", encoding="utf-8") as f:
+        if path.endswith((".prom", ".txt")):
+            f.write(to_prometheus(snap))
+        else:
+            json.dump(snap, f, indent=2)
+
+
+@contextmanager
+def profile(path, mode="cprofile", top=30):
+    """Profile a block: cProfile stats to `path`, or the top tracemalloc allocations."""
+    if mode == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            profiler.dump_stats(path)
+    elif mode == "tracemalloc":
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            yield None
+        finally:
+            snap = tracemalloc.take_snapshot()
+            tracemalloc.stop()
+            with open(path, "w", encoding="utf-8") as f:
+                for stat in snap.statistics("lineno")[:top]:
+                    f.write(f"{stat}\n")
+    else:
+        raise ValueError(f"Unknown profile mode: {mode!r} (use 'cprofile' or 'tracemalloc')")
+
+
+def _start_from_env():
+    path = os.environ.get("PACKING_METRICS_FILE")
+    if path:
+        atexit.register(export, path)
+    spec = os.environ.get("PACKING_PROFILE")
+    if spec:
+        mode, _, out = spec.partition(":")
+        ctx = profile(out or f"packing.{mode}", mode)
+        ctx.__enter__()
+        atexit.register(ctx.__exit__, None, None, None)
+
+
+_start_from_env()
@@ -0,0 +1,180 @@
+"""Load test for packing_service.py, run against localhost.
+
+    python packing_service.py --port 8765 &
+    python load_test.py --clients 50 --duration 10
+    python load_test.py --spawn --workers 4 --clients 100 --json load.json
+
+Every client keeps one keep-alive connection and sends a seeded mix of
+requests drawn from the real templates and airlines: starting lists (40%),
+airline lookups (30%), trims (20%) and whole plans (10%). Trims reuse a
+small set of lists, so some requests arrive while an identical one is
+still running and exercise coalescing. The report gives throughput,
+p50 / p95 / p99 latency per endpoint and the status counts (typo'd airline
+names that match nothing come back 404).
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import quote, urlsplit
+
+from Final_code_project import AIRLINES, ACTIVITIES, template, base_list
+
+SEED = 2024
+MIX = (("list", 0.4), ("airline", 0.3), ("trim", 0.2), ("plan", 0.1))
+
+
+def request_mix(n, seed=SEED):
+    """n (method, path, body) tuples in the proportions of MIX."""
+    rng = random.Random(seed)
+    airlines = sorted(rec["airline"] for rec in AIRLINES.values())
+    weathers = list(template)
+
+    def trip():
+        acts = sorted(rng.sample(ACTIVITIES, rng.randint(0, 3)), key=ACTIVITIES.index)
+        return rng.choice(weathers), acts
+
+    lists = []   # a small pool of over-packed lists, so identical trims overlap
+    for _ in range(20):
+        weather, acts = trip()
+        items = base_list(weather, acts)
+        for item in rng.sample(sorted(items), min(4, len(items))):
+            items[item] += rng.randint(1, 3)
+        lists.append(items)
+
+    requests = []
+    for kind in rng.choices([k for k, _ in MIX], [w for _, w in MIX], k=n):
+        if kind == "list":
+            weather, acts = trip()
+            requests.append(("POST", "/list", {"weather": weather, "activities": acts}))
+        elif kind == "airline":
+            name = rng.choice(airlines)
+            if rng.random() < 0.3:   # the odd typo
+                cut = rng.randrange(len(name))
+                name = name[:cut] + name[cut + 1:]
+            requests.append(("GET", "/airline?name=" + quote(name.lower()), None))
+        elif kind == "trim":
+            requests.append(("POST", "/trim", {"items": rng.choice(lists), "airline": rng.choice(airlines)}))
+        else:
+            weather, acts = trip()
+            requests.append(("POST", "/plan", {"weather": weather, "activities": acts,
+                                               "airline": rng.choice(airlines)}))
+    return requests
+
+
+async def _call(reader, writer, host, method, path, body):
+    payload = b"" if body is None else json.dumps(body).encode("utf-8")
+    writer.write((f"{method} {path} HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                  f"Content-Length: {len(payload)}\r\n\r\n").encode("latin-1") + payload)
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.strip().lower() == "content-length":
+            length = int(value)
+    await reader.readexactly(length)
+    return status
+
+
+async def run_load(url, clients=50, duration=10.0, requests=None):
+    """Drive the service for `duration` seconds (or until `requests` are sent) -> report dict."""
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    mix = request_mix(max(requests or 0, 5000))
+    latencies = {kind: [] for kind, _ in MIX}
+    statuses = {}
+    sent = 0
+    deadline = time.perf_counter() + duration
+
+    async def client(n):
+        nonlocal sent
+        reader, writer = await asyncio.open_connection(host, port)
+        i = n
+        try:
+            while time.perf_counter() < deadline and (requests is None or sent < requests):
+                sent += 1
+                method, path, body = mix[i % len(mix)]
+                i += clients
+                start = time.perf_counter()
+                status = await _call(reader, writer, host, method, path, body)
+                latencies[path[1:].split("?")[0]].append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client(n) for n in range(clients)))
+    elapsed = time.perf_counter() - started
+
+    def pct(samples, q):
+        return sorted(samples)[min(len(samples) - 1, int(q * len(samples)))] * 1000 if samples else 0.0
+
+    total = sum(len(v) for v in latencies.values())
+    return {"url": url, "clients": clients, "seconds": round(elapsed, 2), "requests": total,
+            "per_second": round(total / elapsed, 1), "statuses": statuses,
+            "endpoints": {kind: {"count": len(v), "p50_ms": round(pct(v, 0.50), 2),
+                                 "p95_ms": round(pct(v, 0.95), 2), "p99_ms": round(pct(v, 0.99), 2)}
+                          for kind, v in latencies.items()}}
+
+
+async def _wait_until_up(url, timeout=30.0):
+    parts = urlsplit(url)
+    end = time.perf_counter() + timeout
+    while True:
+        try:
+            reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+            await _call(reader, writer, parts.hostname, "GET", "/health", None)
+            writer.close()
+            return
+        except OSError:
+            if time.perf_counter() > end:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the packing service on localhost.")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--clients", type=int, default=50, help="concurrent connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--requests", type=int, default=None, help="stop after this many instead")
+    parser.add_argument("--spawn", action="store_true", help="start packing_service.py for the run")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes with --spawn")
+    parser.add_argument("--json", help="also write the report here")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.spawn:
+        port = str(urlsplit(args.url).port or 8765)
+        cmd = [sys.executable, "packing_service.py", "--port", port]
+        if args.workers is not None:
+            cmd += ["--workers", str(args.workers)]
+        server = subprocess.Popen(cmd)
+    try:
+        asyncio.run(_wait_until_up(args.url))
+        report = asyncio.run(run_load(args.url, args.clients, args.duration, args.requests))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(f"{report['requests']:,} requests in {report['seconds']} s "
+          f"({report['per_second']:,.0f}/s) from {report['clients']} clients; statuses {report['statuses']}")
+    for kind, row in report["endpoints"].items():
+        print(f"  {kind:<8} {row['count']:>7,}  p50 {row['p50_ms']:>7.2f} ms  "
+              f"p95 {row['p95_ms']:>7.2f} ms  p99 {row['p99_ms']:>7.2f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
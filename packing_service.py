@@ -0,0 +1,313 @@
+"""HTTP service for the packing engine (asyncio, standard library only).
+
+Mobile clients get the same lists, airline rules and trims as the app. One
+event loop serves every connection; anything that can take real CPU time
+(trims, whole plans, group trips) runs on a process pool, so a long trim never holds up
+other requests. Identical requests that arrive while one is being worked
+on share its result instead of queuing a second job.
+
+    python packing_service.py --port 8765 --workers 4
+
+Endpoints (JSON in and out):
+
+    GET  /health
+    GET  /airline?name=ryan air           airline rules (get_airline_info), or close matches
+    POST /list   {"weather": "Cold", "activities": ["Sightseeing"]}
+                                          starting list (build_initial_items) with its weight
+    POST /trim   {"items": {...}, "airline": "KLM" | "limit_kg": 8, "safety_buffer": 0.3,
+                  "solver": "greedy"}     auto-trim (greedy_trim_to_limit_verbose), on the pool
+    POST /plan   a plan_trip spec         whole plan, on the pool
+    POST /group  a plan_group spec        group trip with shared items, on the pool
+    GET  /stats                           requests, coalesced requests, jobs in flight
+    GET  /metrics                         Prometheus text (with PACKING_METRICS=1)
+
+Errors come back as {"error": "..."} with 400 (bad request), 404, 422 (the
+engine rejected the input, e.g. an unknown weather band) or 503 (more than
+--max-pending jobs waiting). load_test.py drives it from localhost.
+"""
+
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import json
+import os
+import signal
+import sys
+from urllib.parse import parse_qs, urlsplit
+
+import instrumentation as metrics
+from Final_code_project import (WEIGHT_TABLE, _check_trip, base_list, get_airline_info,
+                                search_airlines, total_weight, check_fit, cached_trim_to_limit,
+                                plan_trip, resolve_baggage_rules, plan_group, refresh_catalog,
+                                catalog_reading, get_base_lists, get_airline_index)
+
+DEFAULT_PORT = 8765
+MAX_BODY = 1 << 20        # bytes
+MAX_PENDING = 256         # jobs queued for the pool before answering 503
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 422: "Unprocessable Entity", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+
+class _Overloaded(Exception):
+    pass
+
+
+# -----------------------
+# Handlers (plain functions; the pool ones run in worker processes)
+# -----------------------
+
+def _list(body):
+    weather, activities = _check_trip(body)   # same checks (and messages) as plan_trip
+    items = base_list(weather, activities)   # build_initial_items, precomputed per weather/activity set
+    return {"items": items, "total_kg": total_weight(items, WEIGHT_TABLE),
+            "volume_l": WEIGHT_TABLE.total_volume_l(items)}
+
+
+def _airline(name):
+    rec = get_airline_info(name)
+    if rec is None:
+        return None
+    return {key: rec.get(key) for key in ("airline", "weight_kg", "dimensions_cm", "extras", "dims_cm")}
+
+
+def _items(body):
+    items = body.get("items")
+    if not isinstance(items, dict) or not all(isinstance(q, int) and q >= 0 for q in items.values()):
+        raise ValueError('"items" must map item names to whole quantities >= 0')
+    return {item: qty for item, qty in items.items() if qty}
+
+
+def _trim(body):
+    refresh_catalog()
+    items = _items(body)
+    rules = resolve_baggage_rules(body.get("airline"), body.get("limit_kg"), body.get("dimensions_cm"))
+    if rules["limit_kg"] is None and rules["volume_l"] is None:
+        raise ValueError("Give an airline or a limit_kg to trim against.")
+    buffer = float(body.get("safety_buffer", 0.3))
+    trimmed, info = cached_trim_to_limit(items, WEIGHT_TABLE, rules["limit_kg"], safety_buffer=buffer,
+                                         solver=body.get("solver", "greedy"),
+                                         volume_limit_l=rules["volume_l"])
+    return {"rules": rules, "items": trimmed, "info": info,
+            "fit": check_fit(trimmed, rules["limit_kg"], rules["volume_l"], buffer=buffer)}
+
+
+POOL_JOBS = {"trim": _trim, "plan": plan_trip, "group": plan_group}
+
+
+def run_job(endpoint, body):
+    """Worker-side entry point: run one pool job and return JSON-ready data."""
+    return json.loads(json.dumps(POOL_JOBS[endpoint](body), default=str))
+
+
+def run_job_in_thread(endpoint, body):
+    """run_job for --workers 0: the threads share the tables, so reloads wait for running jobs."""
+    refresh_catalog()
+    with catalog_reading():
+        return run_job(endpoint, body)
+
+
+def run_local(route, query, body):
+    """The /airline and /list answers; run on a thread so a catalog reload never blocks the loop."""
+    refresh_catalog()
+    with catalog_reading():
+        if route == "/list":
+            return 200, _list(body)
+        name = (parse_qs(query).get("name") or [""])[0]
+        rec = _airline(name)
+        if rec is None:
+            close = [r["airline"] for _, r in search_airlines(name)]
+            return 404, {"error": f"Unknown airline: {name!r}", "did_you_mean": close}
+        return 200, rec
+
+
+def _warm_worker():
+    get_base_lists()
+    get_airline_index()
+
+
+# -----------------------
+# Service
+# -----------------------
+
+class PackingService:
+    """Routes requests, coalesces identical pool jobs and owns the worker pool."""
+
+    def __init__(self, workers=None, max_pending=MAX_PENDING):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending
+        self.pool = None
+        self.inflight = {}   # (endpoint, canonical body) -> task computing it
+        self.stats = {"requests": 0, "coalesced": 0, "jobs": 0, "pending": 0, "rejected": 0}
+
+    def start_pool(self):
+        _warm_worker()   # built before forking, so workers start with the tables in place
+        self.pool = self._new_pool()
+
+    def _new_pool(self):
+        if self.workers:
+            return ProcessPoolExecutor(max_workers=self.workers, initializer=_warm_worker)
+        return None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+
+    async def _submit(self, endpoint, body):
+        self.stats["jobs"] += 1
+        self.stats["pending"] += 1
+        pool = self.pool
+        # workers=0 runs jobs on the default thread pool (handy for tests, no processes)
+        job = run_job if pool is not None else run_job_in_thread
+        try:
+            return await asyncio.get_running_loop().run_in_executor(pool, job, endpoint, body)
+        except BrokenProcessPool:
+            # A worker died. Every job on that pool fails; the first one to get here
+            # replaces it, the others find a fresh pool already in place. The new
+            # workers build their tables in their initializer, not on the loop.
+            if self.pool is pool:
+                pool.shutdown(wait=False, cancel_futures=True)
+                self.pool = self._new_pool()
+            raise
+        finally:
+            self.stats["pending"] -= 1
+
+    async def pool_job(self, endpoint, body):
+        """Run a job on the pool; identical requests in flight share one job."""
+        key = (endpoint, json.dumps(body, sort_keys=True, separators=(",", ":")))
+        task = self.inflight.get(key)
+        if task is None:
+            if self.stats["pending"] >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise _Overloaded(f"More than {self.max_pending} jobs waiting, try again shortly.")
+            task = asyncio.ensure_future(self._submit(endpoint, body))
+            self.inflight[key] = task
+            task.add_done_callback(lambda _: self.inflight.pop(key, None))
+        else:
+            self.stats["coalesced"] += 1
+            metrics.count("service.coalesced")
+        return await asyncio.shield(task)   # a client going away does not cancel the others' job
+
+    async def dispatch(self, method, target, raw):
+        """-> (status, payload); payload is JSON-ready, or str for plain text."""
+        self.stats["requests"] += 1
+        url = urlsplit(target)
+        route = url.path.rstrip("/") or "/"
+        methods = {"/health": "GET", "/airline": "GET", "/stats": "GET", "/metrics": "GET",
+                   "/list": "POST", "/trim": "POST", "/plan": "POST", "/group": "POST"}
+        if route not in methods:
+            return 404, {"error": f"No such endpoint: {route}"}
+        if method != methods[route]:
+            return 405, {"error": f"Use {methods[route]} for {route}"}
+        body = {}
+        if method == "POST":
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                return 400, {"error": "Request body is not valid JSON."}
+            if not isinstance(body, dict):
+                return 400, {"error": "Request body must be a JSON object."}
+        try:
+            with metrics.stage("service" + route.replace("/", ".")):
+                if route == "/health":
+                    return 200, {"ok": True}
+                if route == "/stats":
+                    return 200, dict(self.stats, inflight=len(self.inflight), workers=self.workers)
+                if route == "/metrics":
+                    return 200, metrics.to_prometheus()
+                if route in ("/airline", "/list"):
+                    return await asyncio.get_running_loop().run_in_executor(
+                        None, run_local, route, url.query, body)
+                return 200, await self.pool_job(route[1:], body)
+        except (ValueError, TypeError, KeyError) as exc:
+            return 422, {"error": str(exc)}
+        except _Overloaded as exc:
+            return 503, {"error": str(exc)}
+        except Exception as exc:   # noqa: BLE001 - one bad request must not take the server down
+            print(f"{method} {target} failed: {exc!r}", file=sys.stderr)
+            return 500, {"error": "Internal error."}
+
+    async def handle_connection(self, reader, writer):
+        """HTTP/1.1 with keep-alive: one request after another on the same connection."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    method, target, version = line.decode("latin-1").split()
+                    headers = {}
+                    while True:
+                        line = await reader.readline()
+                        if line in (b"\r\n", b"\n", b""):
+                            break
+                        name, _, value = line.decode("latin-1").partition(":")
+                        headers[name.strip().lower()] = value.strip()
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError(f"Negative Content-Length: {length}")
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request."}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, {"error": f"Body over {MAX_BODY} bytes."}, False)
+                    break
+                raw = await reader.readexactly(length) if length else b""
+                status, payload = await self.dispatch(method.upper(), target, raw)
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, keep_alive):
+        if isinstance(payload, str):
+            body, kind = payload.encode("utf-8"), "text/plain; version=0.0.4"
+        else:
+            body, kind = json.dumps(payload, default=str).encode("utf-8"), "application/json"
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {kind}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}"
+                "\r\n\r\n")
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=DEFAULT_PORT, workers=None, max_pending=MAX_PENDING,
+                ready=None):
+    """Run the service until cancelled; `ready` (an asyncio.Event) is set once it listens."""
+    service = PackingService(workers, max_pending)
+    service.start_pool()
+    server = await asyncio.start_server(service.handle_connection, host, port, backlog=1024)
+    print(f"Packing service on http://{host}:{port} ({service.workers or 'no'} worker processes)",
+          file=sys.stderr)
+    try:
+        async with server:
+            if ready is not None:
+                ready.set()
+            await server.serve_forever()
+    finally:
+        service.close()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve packing lists, airline rules and trims over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for trims and plans (default: CPU count, 0 = threads)")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING)
+    args = parser.parse_args(argv)
+    signal.signal(signal.SIGTERM, signal.default_int_handler)   # stop like Ctrl-C: workers are shut down too
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.max_pending))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Local store for trips, packing lists and trim history (SQLite, no server).
+
+A trip is one row (who, where, when, airline rules, weather, activities and
+the rest of the CLI STATE); its list is one row per item, so thousands of
+saved lists come back from a single query without decoding a blob per list.
+Every automatic trim can be recorded against the trip.
+
+    store = PackingStore("packing.db")        # or open_store(): PACKING_STORE / packing.db
+    trip_id = store.save_trip(STATE, items)
+    store.record_trim(trip_id, info, limit_kg=10.0, solver="greedy")
+    store.trips_by_user("Ann")                 # newest first, indexed
+    store.load_lists(user="Ann")               # {trip_id: items} in one pass
+    store.compact(keep_trims=20)               # prune history, checkpoint and vacuum
+
+The database runs in WAL mode, so readers never wait for a writer. One
+connection is shared between threads behind a lock (the Streamlit app
+serves every session from the same process).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+STORE_FORMAT = 1
+DEFAULT_STORE_PATH = "packing.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS trips (
+    id            INTEGER PRIMARY KEY,
+    user          TEXT NOT NULL,
+    destination   TEXT NOT NULL,
+    list_name     TEXT,
+    start_date    TEXT,
+    weather       TEXT,
+    activities    TEXT,
+    airline       TEXT,
+    weight_kg     TEXT,
+    dimensions_cm TEXT,
+    state         TEXT,
+    created       REAL NOT NULL,
+    updated       REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS trips_by_user ON trips (user COLLATE NOCASE, updated);
+CREATE INDEX IF NOT EXISTS trips_by_destination ON trips (destination COLLATE NOCASE, updated);
+
+CREATE TABLE IF NOT EXISTS list_items (
+    trip_id  INTEGER NOT NULL REFERENCES trips (id) ON DELETE CASCADE,
+    item     TEXT NOT NULL,
+    qty      INTEGER NOT NULL,
+    PRIMARY KEY (trip_id, item)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS trims (
+    id        INTEGER PRIMARY KEY,
+    trip_id   INTEGER NOT NULL REFERENCES trips (id) ON DELETE CASCADE,
+    created   REAL NOT NULL,
+    limit_kg  REAL,
+    volume_l  REAL,
+    solver    TEXT,
+    before_kg REAL,
+    after_kg  REAL,
+    removed   TEXT,
+    note      TEXT
+);
+CREATE INDEX IF NOT EXISTS trims_by_trip ON trims (trip_id, created);
+"""
+
+# trips columns filled from a STATE-like dict; everything else goes into `state` as JSON
+_TRIP_FIELDS = ("user", "destination", "list_name", "start_date", "weather", "activities",
+                "airline", "weight_kg", "dimensions_cm")
+_STATE_KEYS = {"user": "name", "start_date": "trip_start_date"}
+# Other names for the same STATE key (the app's meta, the trips columns) -> the CLI name
+_STATE_ALIASES = {"user": "name", "start_date": "trip_start_date", "trip_start": "trip_start_date",
+                  "temp_label": "weather"}
+
+
+def normalize_state(state):
+    """CLI STATE or app meta -> one schema (the CLI key names), whichever saved the trip."""
+    out = {k: v for k, v in state.items() if k not in _STATE_ALIASES}
+    for alias, key in _STATE_ALIASES.items():
+        if out.get(key) is None and state.get(alias) is not None:
+            out[key] = state[alias]
+    return out
+
+
+def _trip_row(state):
+    """STATE (CLI) or a plan/meta dict -> values for the trips columns."""
+    state = normalize_state(state)
+    row = {}
+    for field in _TRIP_FIELDS:
+        value = state.get(_STATE_KEYS.get(field, field), state.get(field))
+        if field == "activities":
+            value = json.dumps(list(value or []))
+        elif value is not None and field != "user":
+            value = str(value)
+        row[field] = value
+    if not row["user"] or not row["destination"]:
+        raise ValueError("A saved trip needs a user name and a destination.")
+    row["state"] = json.dumps(state, default=str, sort_keys=True)
+    return row
+
+
+def _trip_dict(row):
+    trip = dict(row)
+    trip["activities"] = json.loads(trip["activities"] or "[]")
+    trip["state"] = normalize_state(json.loads(trip["state"] or "{}"))
+    return trip
+
+
+class PackingStore:
+    """Trips, their packing lists and trim history in one SQLite file."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode = WAL")
+            self._db.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            version = self._db.execute("PRAGMA user_version").fetchone()[0]
+            if version not in (0, STORE_FORMAT):
+                raise ValueError(f"{path}: store format {version}, expected {STORE_FORMAT}")
+            self._db.executescript(_SCHEMA)
+            self._db.execute(f"PRAGMA user_version = {STORE_FORMAT}")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _write(self, fn):
+        """Run fn(cursor) in one transaction."""
+        with self._lock:
+            cur = self._db.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(cur)
+            except BaseException:
+                cur.execute("ROLLBACK")
+                raise
+            cur.execute("COMMIT")
+            return result
+
+    def _read(self, sql, params=()):
+        with self._lock:
+            return self._db.execute(sql, params).fetchall()
+
+    # -----------------------
+    # Trips and lists
+    # -----------------------
+
+    def save_trip(self, state, items, trip_id=None):
+        """Insert a trip (or replace trip_id's details and list) -> trip id."""
+        return self.save_trips([(state, items, trip_id)])[0]
+
+    def save_trips(self, trips):
+        """Bulk save [(state, items) or (state, items, trip_id)] in one transaction -> ids."""
+        now = time.time()
+        rows = [(_trip_row(t[0]), t[1], t[2] if len(t) > 2 else None) for t in trips]
+
+        def write(cur):
+            ids = []
+            for row, items, trip_id in rows:
+                if trip_id is None:
+                    cols = ", ".join(row)
+                    cur.execute(f"INSERT INTO trips ({cols}, created, updated) "
+                                f"VALUES ({', '.join('?' * len(row))}, ?, ?)",
+                                (*row.values(), now, now))
+                    trip_id = cur.lastrowid
+                else:
+                    sets = ", ".join(f"{c} = ?" for c in row)
+                    cur.execute(f"UPDATE trips SET {sets}, updated = ? WHERE id = ?",
+                                (*row.values(), now, trip_id))
+                    if not cur.rowcount:
+                        raise KeyError(f"No saved trip with id {trip_id}")
+                    cur.execute("DELETE FROM list_items WHERE trip_id = ?", (trip_id,))
+                cur.executemany("INSERT INTO list_items (trip_id, item, qty) VALUES (?, ?, ?)",
+                                [(trip_id, i, int(q)) for i, q in items.items() if q > 0])
+                ids.append(trip_id)
+            return ids
+        return self._write(write)
+
+    def load_trip(self, trip_id):
+        """The trip's details with its list under "items"; None if it does not exist."""
+        rows = self._read("SELECT * FROM trips WHERE id = ?", (trip_id,))
+        if not rows:
+            return None
+        trip = _trip_dict(rows[0])
+        trip["items"] = self.load_lists([trip_id]).get(trip_id, {})
+        return trip
+
+    def delete_trip(self, trip_id):
+        self._write(lambda cur: cur.execute("DELETE FROM trips WHERE id = ?", (trip_id,)))
+
+    def trips_by_user(self, user, limit=None):
+        """Trip details (without lists) for a user, newest first; case-insensitive."""
+        return self._find("user", user, limit)
+
+    def trips_by_destination(self, destination, limit=None):
+        return self._find("destination", destination, limit)
+
+    def _find(self, column, value, limit):
+        sql = (f"SELECT * FROM trips WHERE {column} = ? COLLATE NOCASE "
+               "ORDER BY updated DESC" + (" LIMIT ?" if limit else ""))
+        return [_trip_dict(r) for r in self._read(sql, (value, limit) if limit else (value,))]
+
+    def load_lists(self, trip_ids=None, user=None):
+        """{trip_id: items} for the given trips, a user's trips, or every trip.
+
+        One query streams (trip_id, item, qty) rows in key order and the dicts
+        are built in a single pass, however many lists there are.
+        """
+        if trip_ids is not None:
+            trip_ids = list(trip_ids)
+            if not trip_ids:
+                return {}
+            sql = ("SELECT trip_id, item, qty FROM list_items WHERE trip_id IN "
+                   "(SELECT value FROM json_each(?)) ORDER BY trip_id")
+            params = (json.dumps(trip_ids),)
+        elif user is not None:
+            sql = ("SELECT l.trip_id, l.item, l.qty FROM trips t JOIN list_items l ON l.trip_id = t.id "
+                   "WHERE t.user = ? COLLATE NOCASE ORDER BY l.trip_id")
+            params = (user,)
+        else:
+            sql, params = "SELECT trip_id, item, qty FROM list_items ORDER BY trip_id", ()
+        lists = {}
+        for trip_id, item, qty in self._read(sql, params):
+            lists.setdefault(trip_id, {})[item] = qty
+        return lists
+
+    # -----------------------
+    # Trim history
+    # -----------------------
+
+    def record_trim(self, trip_id, info, limit_kg=None, volume_l=None, solver="greedy"):
+        """Store one trim result (the `info` dict of trim_to_limit) -> its id."""
+        row = (trip_id, time.time(), limit_kg, volume_l, solver, info.get("before"),
+               info.get("after"), json.dumps(list(info.get("removed", []))), info.get("note", ""))
+        return self._write(lambda cur: cur.execute(
+            "INSERT INTO trims (trip_id, created, limit_kg, volume_l, solver, before_kg, after_kg, "
+            "removed, note) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", row).lastrowid)
+
+    def trim_history(self, trip_id):
+        """The trip's trims, oldest first, with "removed" as a list."""
+        rows = self._read("SELECT * FROM trims WHERE trip_id = ? ORDER BY created, id", (trip_id,))
+        return [dict(r, removed=json.loads(r["removed"] or "[]")) for r in rows]
+
+    # -----------------------
+    # Maintenance
+    # -----------------------
+
+    def compact(self, keep_trims=20):
+        """Keep each trip's newest keep_trims trims, fold the WAL into the file and vacuum."""
+        def prune(cur):
+            cur.execute("DELETE FROM trims WHERE id IN (SELECT id FROM ("
+                        "SELECT id, ROW_NUMBER() OVER (PARTITION BY trip_id "
+                        "ORDER BY created DESC, id DESC) AS n FROM trims) WHERE n > ?)",
+                        (keep_trims,))
+            return cur.rowcount
+        pruned = self._write(prune)
+        with self._lock:
+            self._db.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            self._db.execute("VACUUM")
+        return pruned
+
+    def stats(self):
+        with self._lock:
+            counts = {t: self._db.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0]
+                      for t in ("trips", "list_items", "trims")}
+        counts["bytes"] = os.path.getsize(self.path) if self.path != ":memory:" else 0
+        return counts
+
+
+_STORE = {"path": None, "store": None}
+_STORE_LOCK = threading.Lock()
+
+
+def open_store(path=None):
+    """The shared store for `path` (default: PACKING_STORE or packing.db), opened once."""
+    path = path or os.environ.get("PACKING_STORE") or DEFAULT_STORE_PATH
+    with _STORE_LOCK:
+        if _STORE["path"] != path:
+            if _STORE["store"] is not None:
+                _STORE["store"].close()
+            _STORE["store"] = PackingStore(path)
+            _STORE["path"] = path
+        return _STORE["store"]
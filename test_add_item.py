@@ -0,0 +1,58 @@
+"""Items a user adds stay on their own list."""
+
+import pytest
+
+from Final_code_project import (WEIGHT_TABLE, ItemCatalog, ItemOverlay, PackingList, add_item,
+                                batch_weight_report, check_fit, complete_items, compare_airlines,
+                                quantities_matrix, resolve_item, suggest_actions, total_weight,
+                                trim_to_limit)
+
+
+def test_custom_item_stays_on_its_list():
+    version, size = WEIGHT_TABLE.version, len(WEIGHT_TABLE)
+    mine, theirs = PackingList({"Socks": 2}), PackingList({"Socks": 2})
+    assert add_item(mine, "travel kettle", 2, "Heavy") == "travel kettle"
+    assert (WEIGHT_TABLE.version, len(WEIGHT_TABLE)) == (version, size)
+    assert "travel kettle" not in WEIGHT_TABLE and theirs.catalog is WEIGHT_TABLE
+    assert isinstance(mine.catalog, ItemOverlay)
+    assert resolve_item("Travel  Kettle", mine.catalog) == "travel kettle"
+    assert resolve_item("travel kettle") is None
+    assert complete_items("trav ke", 3, mine.catalog)[0] == "travel kettle"
+    assert "travel kettle" not in complete_items("trav", 8)
+
+
+def test_custom_item_is_priced_everywhere():
+    items = PackingList({"Socks": 2})
+    add_item(items, "travel kettle", 2, "Heavy")
+    expected = round(2 * WEIGHT_TABLE.weight_kg("Socks") + 2.0, 3)
+    assert items.total_kg == expected
+    assert check_fit(items, 10)["total"] == expected
+    assert check_fit(items, 10, weight_table=WEIGHT_TABLE)["total"] == expected
+    trimmed, info = trim_to_limit(items, WEIGHT_TABLE, 1.5, safety_buffer=0)
+    assert (info["before"], trimmed) == (expected, {"Socks": 2, "travel kettle": 1})
+    assert suggest_actions(items, 2.0, 0)["actions"][0]["item"] == "travel kettle"
+    assert compare_airlines(items)[0]["total"] == expected
+
+
+def test_plain_dict_cannot_define_items():
+    with pytest.raises(TypeError):
+        add_item({}, "travel kettle", 1, "Light")
+    assert "travel kettle" not in WEIGHT_TABLE
+
+
+def test_batch_report_prices_custom_items():
+    items = PackingList({"Socks": 2, "Boots": 1})
+    add_item(items, "travel kettle", 2, "Heavy")
+    lists = [items.to_dict(), {"travel kettle": 1}, {"Socks": 1}]
+    report = batch_weight_report(lists, 10, catalog=items.catalog)
+    assert list(report["total"]) == [total_weight(q, items.catalog) for q in lists]
+    assert quantities_matrix(lists, items.catalog).shape == (3, len(WEIGHT_TABLE) + 1)
+
+
+def test_completions_never_come_from_a_freed_catalog():
+    for n in range(50):   # a new catalog often gets the id (and version) of the one just freed
+        names = ["Alpha", "Alpine Hat", "Beta"] if n % 2 else ["Bear", "Beta", "Boat"]
+        catalog = ItemCatalog([{name: {"weight": 0.1} for name in names}])
+        assert complete_items("Be", 3, catalog) == (["Beta"] if n % 2 else ["Bear", "Beta"])
+        assert complete_items("Al", 3, catalog) == (["Alpha", "Alpine Hat"] if n % 2 else [])
+        del catalog
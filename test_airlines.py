@@ -0,0 +1,14 @@
+"""Airline lookups follow the table they are given."""
+
+from Final_code_project import get_airline_info, search_airlines
+
+
+def _table(name, weight):
+    return {name.lower(): {"airline": name, "weight_kg": weight, "dimensions_cm": "55x40x20"}}
+
+
+def test_index_follows_short_lived_tables():
+    for n in range(50):   # new dicts often reuse the id of the one just freed
+        name = f"Air {n}"
+        assert get_airline_info(name, _table(name, n))["weight_kg"] == n
+        assert search_airlines(name, k=1, airlines=_table(name, n))[0][1]["airline"] == name
@@ -0,0 +1,67 @@
+"""Splitting a list across bags: limits per bag, nothing lost."""
+
+import random
+
+import pytest
+
+from Final_code_project import (ACTIVITIES, WEIGHT_TABLE, ItemCatalog, allocate_bags, base_list,
+                                template, total_volume, total_weight)
+
+BAGS = [{"name": "Carry-on", "limit_kg": 7.0, "volume_l": 30.0, "paid": False},
+        {"name": "Personal item", "limit_kg": None, "volume_l": 12.0, "paid": False},
+        {"name": "Small bag", "limit_kg": 2.0, "volume_l": None, "paid": False},
+        {"name": "Checked bag", "limit_kg": 20.0, "volume_l": 80.0, "paid": True}]
+
+
+def _check(items, bags, allocation, table, buffer=0.3):
+    limits = {bag["name"]: bag for bag in bags}
+    packed = {}
+    for manifest in allocation["bags"]:
+        bag = limits[manifest["bag"]]
+        if bag["limit_kg"] is not None:
+            assert total_weight(manifest["items"], table) <= bag["limit_kg"] - buffer + 1e-9
+        if bag["volume_l"] is not None:
+            assert total_volume(manifest["items"], table) <= bag["volume_l"] + 1e-9
+        for item, qty in manifest["items"].items():
+            packed[item] = packed.get(item, 0) + qty
+    for item, qty in allocation["left_behind"].items():
+        packed[item] = packed.get(item, 0) + qty
+    assert packed == {i: q for i, q in items.items() if q}
+    paid = {}
+    for manifest in allocation["bags"]:
+        if manifest["paid"]:
+            for item, qty in manifest["items"].items():
+                paid[item] = paid.get(item, 0) + qty
+    assert allocation["moved_to_paid"] == paid
+
+
+@pytest.mark.parametrize("solver", ["greedy", "exact"])
+def test_bags_stay_within_their_limits_and_nothing_is_lost(solver):
+    rng = random.Random(11)
+    for _ in range(40):
+        items = base_list(rng.choice(list(template)), rng.sample(ACTIVITIES, rng.randint(0, 3)))
+        for item in rng.sample(sorted(items), 3):
+            items[item] += rng.randint(1, 4)
+        bags = rng.sample(BAGS, rng.randint(1, len(BAGS)))
+        _check(items, bags, allocate_bags(items, bags, solver=solver), WEIGHT_TABLE)
+
+
+@pytest.mark.parametrize("solver", ["greedy", "exact"])
+def test_an_item_no_bag_can_take_is_reported(solver):
+    table = ItemCatalog([{"Anvil": {"weight": 25.0, "volume_l": 15.0},
+                          "Sleeping Bag": {"weight": 3.0, "volume_l": 90.0},
+                          "Book": {"weight": 0.5, "volume_l": 1.0}}])
+    items = {"Anvil": 1, "Sleeping Bag": 1, "Book": 2}
+    allocation = allocate_bags(items, BAGS, table, solver=solver)
+    _check(items, BAGS, allocation, table)
+    assert allocation["left_behind"] == {"Anvil": 1, "Sleeping Bag": 1}
+    assert allocation["note"] == "2 item(s) do not fit any bag."
+
+
+@pytest.mark.parametrize("solver", ["greedy", "exact"])
+def test_essentials_that_overflow_a_bag_are_left_behind(solver):
+    items = {"Socks": 10, "Underwear": 10, "T-shirt": 2}
+    bags = [{"name": "Pouch", "limit_kg": 0.8, "volume_l": 1.0, "paid": False}]
+    allocation = allocate_bags(items, bags, solver=solver)
+    _check(items, bags, allocation, WEIGHT_TABLE)
+    assert allocation["left_behind"]
@@ -0,0 +1,24 @@
+"""Bulk mode: bad input lines become error rows, not a failed run."""
+
+import csv
+
+from bulk_packing import run_bulk
+
+
+def test_bad_lines_get_error_rows(tmp_path):
+    trips = tmp_path / "trips.jsonl"
+    trips.write_text('{"trip_id": "t1", "weather": "Cold", "activities": [], "airline": "KLM"}\n'
+                     '{"trip_id": "t2", "weather": \n'
+                     '[1, 2]\n'
+                     '{"trip_id": "t4", "weather": "Hot", "activities": "Sightseeing"}\n'
+                     '{"trip_id": "t5", "weather": "Hot", "activities": ["Sightseeing"]}\n',
+                     encoding="utf-8")
+    out, summary = tmp_path / "lists.csv", tmp_path / "summary.csv"
+    assert run_bulk(str(trips), str(out), str(summary), workers=0, log=None) == 5
+    with open(summary, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    assert [r["status"] == "error" for r in rows] == [False, True, True, True, False]
+    assert "Line 2 is not valid JSON" in rows[1]["note"]
+    assert "Line 3 is not a JSON object" in rows[2]["note"]
+    with open(out, newline="", encoding="utf-8") as f:
+        assert {r["trip_id"] for r in csv.DictReader(f)} == {"t1", "t5"}
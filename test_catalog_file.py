@@ -0,0 +1,105 @@
+"""Catalog file: export -> compile -> load -> reload."""
+
+import copy
+import json
+import threading
+
+import pytest
+
+import Final_code_project as engine
+from catalog_file import check_source, compile_catalog, export_catalog
+
+
+@pytest.fixture
+def source(tmp_path):
+    """The built-in tables as a source dict; the engine's tables are put back afterwards."""
+    table = engine.WEIGHT_TABLE
+    columns = [c if isinstance(c, memoryview) else copy.copy(c)
+               for c in (table.grams, table.volume, table.weather)]
+    saved = (list(table.names), dict(table.ids), *columns, table.loaded)
+    tables = [copy.deepcopy(t) for t in (engine.template, engine.activity_template, engine.AIRLINES)]
+    activities, catalog = list(engine.ACTIVITIES), dict(engine._CATALOG)
+    export_catalog(str(tmp_path / "catalog.json"))
+    with open(tmp_path / "catalog.json", encoding="utf-8") as f:
+        yield json.load(f)
+    table.names, table.ids, table.grams, table.volume, table.weather, table.loaded = saved
+    table.version += 1
+    for live, old in zip((engine.template, engine.activity_template, engine.AIRLINES), tables):
+        live.clear()
+        live.update(old)
+    engine.ACTIVITIES[:] = activities
+    engine._CATALOG.clear()
+    engine._CATALOG.update(catalog)
+    engine.invalidate_airline_index()
+
+
+def _load(tmp_path, source, name="catalog"):
+    with open(tmp_path / f"{name}.json", "w", encoding="utf-8") as f:
+        json.dump(source, f)
+    compile_catalog(str(tmp_path / f"{name}.json"), str(tmp_path / "catalog.pkc"))
+    return engine.use_catalog(str(tmp_path / "catalog.pkc"))
+
+
+def test_export_leaves_out_derived_bag_sizes(source):
+    assert all("dims_cm" not in rec for rec in source["airlines"].values())
+
+
+def test_loads_only_the_file_items_and_keeps_columns_mapped(tmp_path, source):
+    source["templates"] = {"Hot": {"T-shirt (Hot)": 2}}
+    source["activity_templates"], source["activities"] = {}, []
+    source["items"] = {"T-shirt (Hot)": source["items"]["T-shirt (Hot)"]}
+    _load(tmp_path, source)
+    assert list(engine.WEIGHT_TABLE) == ["T-shirt (Hot)"]
+    assert isinstance(engine.WEIGHT_TABLE.grams, memoryview)
+
+
+def test_reload_drops_removed_items_and_keeps_runtime_adds(tmp_path, source):
+    engine.WEIGHT_TABLE.add("Travel Kettle", 0.6, volume_l=1.5)
+    edited = copy.deepcopy(source)
+    del edited["items"]["Sun Hat"]
+    edited["templates"] = {band: {i: q for i, q in items.items() if i != "Sun Hat"}
+                           for band, items in edited["templates"].items()}
+    _load(tmp_path, edited, "edited")
+    assert "Sun Hat" not in engine.WEIGHT_TABLE
+    assert engine.WEIGHT_TABLE.weight_kg("Travel Kettle") == 0.6
+    _load(tmp_path, source)
+    assert "Sun Hat" in engine.WEIGHT_TABLE
+    assert engine.WEIGHT_TABLE.weight_kg("Travel Kettle") == 0.6
+
+
+def test_edited_bag_size_is_used(tmp_path, source):
+    key = next(k for k, rec in source["airlines"].items() if rec["airline"] == "Lufthansa")
+    source["airlines"][key]["dimensions_cm"] = "40×30×20"
+    _load(tmp_path, source)
+    rules = engine.resolve_baggage_rules("Lufthansa")
+    assert rules["dims_cm"] == (40, 30, 20)
+    assert rules["volume_l"] == engine.bag_volume_l((40, 30, 20))
+    row = next(r for r in engine.compare_airlines({"Socks": 1}) if r["airline"] == "Lufthansa")
+    assert row["volume_l"] == rules["volume_l"]
+
+
+def test_unreadable_bag_size_is_rejected(source):
+    next(iter(source["airlines"].values()))["dimensions_cm"] = "carry-on size"
+    with pytest.raises(ValueError, match="L×W×H"):
+        check_source(source)
+
+
+def test_reload_waits_for_readers(tmp_path, source):
+    reader_in, reader_out, reloaded = threading.Event(), threading.Event(), threading.Event()
+
+    def reader():
+        with engine.catalog_reading():
+            assert engine.refresh_catalog() is False   # never reloads under a reader
+            reader_in.set()
+            reader_out.wait(5)
+
+    def writer():
+        _load(tmp_path, source)
+        reloaded.set()
+
+    threading.Thread(target=reader).start()
+    reader_in.wait(5)
+    threading.Thread(target=writer).start()
+    assert not reloaded.wait(0.3)   # held off while the reader runs
+    reader_out.set()
+    assert reloaded.wait(5)
@@ -0,0 +1,77 @@
+"""PackingList against a model that keeps a full copy of the list per version."""
+
+import random
+
+import pytest
+
+from Final_code_project import WEIGHT_TABLE, PackingList, total_volume, total_weight
+
+POOL = ["Socks", "Underwear", "T-shirt", "Jeans", "Boots", "Sneakers", "Rain Jacket", "Toiletries"]
+
+
+def _step(rng, items):
+    """Apply one random operation -> True if it was a change (not undo/redo)."""
+    op = rng.choice(["set", "set", "swap", "trim", "undo", "undo", "redo"])
+    if op == "set":
+        items.change({rng.choice(POOL): rng.randint(0, 4) for _ in range(rng.randint(1, 3))})
+    elif op == "swap":
+        items.swap(rng.choice(POOL), rng.choice(POOL), rng.choice([None, 1, 2]))
+    elif op == "trim":
+        items.trim(rng.uniform(0.5, 4.0), safety_buffer=0.0)
+    elif op == "undo":
+        items.undo()
+    else:
+        items.redo()
+    return op not in ("undo", "redo")
+
+
+@pytest.mark.parametrize("max_history", [3, 500])
+def test_matches_a_model(max_history):
+    rng = random.Random(max_history)
+    items = PackingList({"Socks": 2, "Jeans": 1}, max_history=max_history)
+    snaps = {0: items.to_dict()}   # version -> the list at that version
+    low = top = 0                  # versions still in the history
+    for _ in range(1000):
+        version = items.version
+        changed = _step(rng, items)
+        if changed and items.version != version:
+            assert items.version == version + 1
+            top = items.version
+            low = max(low, top - max_history)
+            snaps[top] = items.to_dict()
+        elif not changed:
+            assert low <= items.version <= top
+        assert items.to_dict() == snaps[items.version]
+        assert (items.can_undo, items.can_redo) == (items.version > low, items.version < top)
+        assert items.total_kg == total_weight(items.to_dict(), WEIGHT_TABLE)
+        assert items.volume_l == total_volume(items.to_dict(), WEIGHT_TABLE)
+        assert len(items.history()) == top - low
+        a, b = rng.randint(low, top), rng.randint(low, top)
+        expected = {i: (snaps[a].get(i, 0), snaps[b].get(i, 0)) for i in POOL
+                    if snaps[a].get(i, 0) != snaps[b].get(i, 0)}
+        assert items.diff(a, b) == expected
+    if low:
+        with pytest.raises(ValueError):
+            items.diff(low - 1)
+
+
+def test_undo_and_redo_return_labels_and_stop_at_the_ends():
+    items = PackingList({"Socks": 2})
+    assert items.undo() is None
+    items.swap("Socks", "T-shirt")
+    items.trim(0.01, safety_buffer=0.0)
+    assert (items.undo(), items.undo(), items.undo()) == ("trim", "swap", None)
+    assert items.to_dict() == {"Socks": 2}
+    assert (items.redo(), items.redo(), items.redo()) == ("swap", "trim", None)
+    items.undo()
+    items["Boots"] = 1   # a new change drops what could be redone
+    assert items.redo() is None
+    assert [label for _, label, _ in items.history()] == ["swap", "edit"]
+
+
+def test_no_op_changes_are_not_recorded():
+    items = PackingList({"Socks": 2})
+    items.swap("Socks", "Socks")
+    items["Socks"] = 2
+    items.replace({"Socks": 2})
+    assert (items.version, items.history()) == (0, [])
@@ -0,0 +1,109 @@
+"""Packing service: routing, errors, coalescing and pool restarts (no worker processes)."""
+
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+import json
+import threading
+
+import packing_service
+from packing_service import PackingService
+
+
+def _dispatch(method, target, body=None, service=None):
+    service = service or PackingService(workers=0)
+    raw = body if isinstance(body, bytes) else (b"" if body is None else json.dumps(body).encode())
+    return asyncio.run(service.dispatch(method, target, raw))
+
+
+def test_endpoints():
+    assert _dispatch("GET", "/health") == (200, {"ok": True})
+    status, listed = _dispatch("POST", "/list", {"weather": "Cold", "activities": ["Sightseeing"]})
+    assert status == 200 and listed["items"] and listed["total_kg"] > 0
+    status, trimmed = _dispatch("POST", "/trim", {"items": listed["items"], "limit_kg": 3})
+    assert status == 200 and trimmed["fit"]["total"] <= 3
+    assert _dispatch("GET", "/airline?name=ryan%20air")[1]["airline"] == "RyanAir"
+
+
+def test_errors():
+    assert _dispatch("GET", "/nope")[0] == 404
+    assert _dispatch("GET", "/list")[0] == 405
+    assert _dispatch("POST", "/list", b"{not json")[0] == 400
+    assert _dispatch("POST", "/list", [1, 2])[0] == 400
+    status, error = _dispatch("POST", "/list", {"weather": "Tropical"})
+    assert status == 422 and "Unknown weather" in error["error"]
+    assert _dispatch("POST", "/list", {"weather": "Cold", "activities": ["Juggling"]})[0] == 422
+    assert _dispatch("POST", "/trim", {"items": {"Socks": -1}, "limit_kg": 3})[0] == 422
+    assert _dispatch("GET", "/airline?name=zzzz")[0] == 404
+
+
+def _raw_request(head):
+    async def run():
+        service = PackingService(workers=0)
+        server = await asyncio.start_server(service.handle_connection, "127.0.0.1", 0)
+        async with server:
+            reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+            writer.write(head)
+            status = int((await reader.readline()).split()[1])
+            writer.close()
+            return status
+    return asyncio.run(run())
+
+
+def test_bad_content_length():
+    assert _raw_request(b"POST /list HTTP/1.1\r\nContent-Length: -1\r\n\r\n") == 400
+    assert _raw_request(b"POST /list HTTP/1.1\r\nContent-Length: abc\r\n\r\n") == 400
+    assert _raw_request(b"POST /list HTTP/1.1\r\nContent-Length: 99999999\r\n\r\n") == 413
+
+
+def test_identical_jobs_share_one_run():
+    service = PackingService(workers=0)
+    body = {"items": {"Boots": 1, "Socks": 4, "Jeans": 2}, "limit_kg": 1}
+
+    async def run():
+        return await asyncio.gather(*(service.pool_job("trim", body) for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert all(r == results[0] for r in results)
+    assert (service.stats["jobs"], service.stats["coalesced"]) == (1, 4)
+
+
+class _BrokenPool:
+    def __init__(self):
+        self.shutdowns = 0
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_exception(BrokenProcessPool("a worker died"))
+        return future
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shutdowns += 1
+
+
+def test_broken_pool_is_replaced_once(monkeypatch):
+    warmed = []
+    monkeypatch.setattr(packing_service, "_warm_worker", lambda: warmed.append(1))
+    service = PackingService(workers=0)
+    broken, restarts = _BrokenPool(), []
+    service.pool = broken
+    service._new_pool = lambda: restarts.append(1)   # no worker processes in the tests
+
+    async def run():
+        jobs = [service.pool_job("trim", {"items": {"Socks": n}, "limit_kg": 1}) for n in (1, 2, 3)]
+        return await asyncio.gather(*jobs, return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert all(isinstance(r, BrokenProcessPool) for r in results)
+    assert (broken.shutdowns, len(restarts), service.pool) == (1, 1, None)
+    assert not warmed   # the new workers warm up in their initializer, not on the event loop
+    assert _dispatch("POST", "/trim", {"items": {"Socks": 2}, "limit_kg": 1}, service)[0] == 200
+
+
+def test_lists_and_lookups_run_off_the_event_loop(monkeypatch):
+    threads = []
+    real_list = packing_service._list
+    monkeypatch.setattr(packing_service, "_list",
+                        lambda body: threads.append(threading.get_ident()) or real_list(body))
+    assert _dispatch("POST", "/list", {"weather": "Cold"})[0] == 200
+    assert threads and threading.get_ident() not in threads
@@ -0,0 +1,20 @@
+"""Saved trips: the CLI and the app read each other's trips."""
+
+import datetime
+
+from packing_store import PackingStore
+
+
+def test_cli_and_app_trips_share_one_schema():
+    store = PackingStore(":memory:")
+    cli = store.save_trip({"name": "Ann", "destination": "Rome", "weather": "Cool",
+                           "trip_start_date": datetime.date(2026, 10, 19), "activities": []},
+                          {"Socks": 3})
+    app = store.save_trip({"name": "Ann", "destination": "Oslo", "temp_label": "Cold",
+                           "trip_start": datetime.date(2026, 11, 2), "activities": ["Sightseeing"]},
+                          {"Coat": 1})
+    for trip_id, weather, start in ((cli, "Cool", "2026-10-19"), (app, "Cold", "2026-11-02")):
+        trip = store.load_trip(trip_id)
+        assert (trip["weather"], trip["start_date"]) == (weather, start)
+        assert (trip["state"]["weather"], trip["state"]["trip_start_date"]) == (weather, start)
+        assert "temp_label" not in trip["state"] and "trip_start" not in trip["state"]
@@ -0,0 +1,72 @@
+"""Group trips: where the shared items end up."""
+
+from Final_code_project import ItemCatalog, plan_group, total_volume, total_weight
+
+TABLE = ItemCatalog([{"Tent": {"weight": 2.0, "volume_l": 20.0},
+                      "Camera": {"weight": 0.5, "volume_l": 1.0},
+                      "Toiletries": {"weight": 0.8, "volume_l": 1.5},
+                      "Beach Towel": {"weight": 0.4, "volume_l": 2.0},
+                      "Socks": {"weight": 0.05, "volume_l": 0.1}}])
+SHARED = {"Tent": None, "Camera": None, "Toiletries": 4, "Beach Towel": 2}
+
+
+def _traveller(name, weight_kg, dims, **items):
+    return {"name": name, "weight_kg": weight_kg, "dimensions_cm": dims,
+            "items": {item.replace("_", " "): qty for item, qty in items.items()}}
+
+
+def _carried(plan):
+    carried = dict(plan["unplaced"])
+    for t in plan["travellers"]:
+        for item, qty in t["carries"].items():
+            carried[item] = carried.get(item, 0) + qty
+    return carried
+
+
+def test_shared_units_are_rounded_per_group_size_and_carried_once():
+    travellers = [_traveller(f"T{n}", 12, "55x40x30", Toiletries=1, Beach_Towel=1, Socks=3)
+                  for n in range(5)]
+    travellers[0]["items"]["Camera"] = 2
+    plan = plan_group({"travellers": travellers, "shared": SHARED}, TABLE)
+    units = {item: s["units"] for item, s in plan["shared"].items()}
+    assert units == {"Toiletries": 2, "Beach Towel": 3, "Camera": 2}   # ceil(5/4), ceil(5/2), most asked
+    assert plan["shared"]["Camera"]["needed_by"] == 1
+    assert _carried(plan) == units and plan["unplaced"] == {}
+    for t in plan["travellers"]:
+        assert t["items"] == dict({"Socks": 3}, **t["carries"])
+        assert t["weight"]["fits"]
+    saved = 3 * 0.8 + 2 * 0.4   # 5 wash bags and towels packed, 2 and 3 carried
+    assert plan["saved_kg"] == round(saved, 3)
+
+
+def test_units_no_bag_has_room_for_are_unplaced():
+    travellers = [_traveller("Light", 0.5, None, Tent=1, Socks=1),              # no weight to spare
+                  _traveller("Small", 0, "20x20x10", Tent=1, Camera=1)]         # no volume for a tent
+    plan = plan_group({"travellers": travellers, "shared": SHARED, "safety_buffer": 0}, TABLE)
+    assert plan["unplaced"] == {"Tent": 1}
+    assert plan["travellers"][1]["carries"] == {"Camera": 1}
+    assert _carried(plan) == {"Tent": 1, "Camera": 1}
+    assert plan["note"] == "1 shared item(s) do not fit any bag."
+
+
+def test_roomy_bags_take_what_a_heavier_spare_bag_has_no_room_for():
+    travellers = [_traveller("Tiny", 20, "10x10x10", Camera=1),    # most spare weight, no room for a camera
+                  _traveller("Small", 10, "20x20x10", Tent=1),    # room for the camera only
+                  _traveller("Big", 5, "55x40x30", Socks=1)]
+    plan = plan_group({"travellers": travellers, "shared": SHARED, "safety_buffer": 0}, TABLE)
+    carries = {t["name"]: t["carries"] for t in plan["travellers"]}
+    assert carries == {"Tiny": {}, "Small": {"Camera": 1}, "Big": {"Tent": 1}}
+    assert plan["unplaced"] == {}
+    for t in plan["travellers"]:
+        rules = t["rules"]
+        assert total_weight(t["items"], TABLE) <= rules["limit_kg"]
+        assert total_volume(t["items"], TABLE) <= rules["volume_l"]
+
+
+def test_many_small_pieces_after_a_bag_is_dropped():
+    travellers = [_traveller("Tiny", 20, "10x10x10")] + [
+        _traveller(f"T{n}", 8, "30x20x10", Beach_Towel=1) for n in range(6)]
+    plan = plan_group({"travellers": travellers, "shared": SHARED}, TABLE)
+    assert plan["shared"]["Beach Towel"]["units"] == 3   # ceil(6 / 2): Tiny asked for none
+    assert plan["travellers"][0]["carries"] == {}
+    assert _carried(plan) == {"Beach Towel": 3}
@@ -0,0 +1,14 @@
+"""Smart suggestions follow the catalog they are given."""
+
+from Final_code_project import ItemCatalog, get_substitution_index, suggest_actions
+
+
+def test_substitutes_never_come_from_a_freed_catalog():
+    for n in range(50):   # a new catalog often gets the id of the one just freed
+        light, heavy = (0.5, 1.5) if n % 2 else (1.5, 0.5)
+        table = ItemCatalog([{"Boots": {"weight": heavy}, "Sneakers": {"weight": light}}])
+        index = get_substitution_index(table)
+        assert list(index) == (["Boots"] if n % 2 else ["Sneakers"])
+        action = suggest_actions({"Boots": 1, "Sneakers": 1}, 1.5, 0, table)["actions"][0]
+        assert action["action"] == "swap"
+        del table, index, action
@@ -0,0 +1,112 @@
+"""Exact trim against brute force; cached and precomputed trims."""
+
+import itertools
+import random
+
+from Final_code_project import (WEIGHT_TABLE, ItemCatalog, _base_entry, _importance_tiers,
+                                _limit_g, _max_subset_sum, _max_weight_within_volume, base_trim,
+                                cached_trim_to_limit, exact_trim_to_limit, total_volume,
+                                total_weight, trim_to_limit)
+
+NAMES = ["Underwear", "Socks", "T-shirt", "Jeans", "Sneakers", "Tent", "Book"]   # four priority groups
+
+
+def _brute_force(items, table, limit_kg, buffer, volume_l=None):
+    """The best kept grams per priority group (most important first), over every choice."""
+    cap = _limit_g(limit_kg - buffer)
+    vcap = None if volume_l is None else _limit_g(volume_l)
+    tiers = _importance_tiers(list(items), True)
+    best = None
+    for counts in itertools.product(*(range(q + 1) for q in items.values())):
+        kept = dict(zip(items, counts))
+        if sum(table.weight_g(i) * q for i, q in kept.items()) > cap:
+            continue
+        if vcap is not None and sum(table.volume_ml(i) * q for i, q in kept.items()) > vcap:
+            continue
+        score = tuple(sum(table.weight_g(i) * kept[i] for i in tier) for tier in tiers)
+        best = score if best is None else max(best, score)
+    return best
+
+
+def _score(kept, items, table):
+    return tuple(sum(table.weight_g(i) * kept.get(i, 0) for i in tier)
+                 for tier in _importance_tiers(list(items), True))
+
+
+def _random_case(rng):
+    table = ItemCatalog([{name: {"weight": rng.choice((0.1, 0.2, 0.3, 0.4)),
+                                 "volume_l": rng.randrange(1, 20) / 10} for name in NAMES}])
+    items = {name: rng.randint(1, 3) for name in rng.sample(NAMES, rng.randint(3, 5))}
+    return table, items
+
+
+def test_subset_sums_match_brute_force():
+    rng = random.Random(3)
+    for _ in range(200):
+        pieces = [(f"item{n}", 1, rng.randrange(10, 400, 10), rng.randrange(100, 2000, 100))
+                  for n in range(rng.randint(1, 7))]
+        cap, vcap = rng.randrange(0, 1500), rng.randrange(0, 6000)
+        subsets = [c for r in range(len(pieces) + 1) for c in itertools.combinations(pieces, r)]
+        best, used = _max_subset_sum(pieces, cap, float("inf"))
+        assert best == max(sum(p[2] for p in c) for c in subsets if sum(p[2] for p in c) <= cap)
+        assert sum(p[2] for p in used) == best
+        fitting = [c for c in subsets if sum(p[2] for p in c) <= cap and sum(p[3] for p in c) <= vcap]
+        best, used = _max_weight_within_volume(pieces, cap, vcap, float("inf"))
+        assert best == max(sum(p[2] for p in c) for c in fitting)
+        assert sum(p[2] for p in used) == best
+        assert sum(p[3] for p in used) == min(sum(p[3] for p in c) for c in fitting
+                                              if sum(p[2] for p in c) == best)
+
+
+def test_matches_brute_force():
+    rng = random.Random(5)
+    for _ in range(300):
+        table, items = _random_case(rng)
+        limit = rng.uniform(0.3, total_weight(items, table) + 0.3)
+        trimmed, info = exact_trim_to_limit(items, table, limit, 0.3, time_budget_s=10)
+        assert info["solver"] == "exact"
+        assert total_weight(trimmed, table) <= limit - 0.3 + 1e-9
+        assert _score(trimmed, items, table) == _brute_force(items, table, limit, 0.3)
+
+
+def test_groups_with_room_keep_the_lightest_fill():
+    table = ItemCatalog([{"T-shirt": {"weight": 0.15, "volume_l": 0.5},
+                          "Jeans": {"weight": 0.6, "volume_l": 1.5},
+                          "Big": {"weight": 0.1, "volume_l": 1.9}}])
+    items = {"T-shirt": 4, "Jeans": 1, "Big": 1}
+    trimmed, info = exact_trim_to_limit(items, table, 1.0, 0.3, volume_limit_l=3.5)
+    assert trimmed == {"Jeans": 1, "Big": 1}
+    assert (info["after"], info["volume_after"]) == (0.7, 3.4)
+
+
+def test_matches_brute_force_with_volume():
+    rng = random.Random(7)
+    for _ in range(300):
+        table, items = _random_case(rng)
+        total_kg, total_l = total_weight(items, table), total_volume(items, table)
+        limit = rng.uniform(0.3, total_kg + 0.3)
+        volume = rng.uniform(0.3 * total_l, total_l)
+        trimmed, _ = exact_trim_to_limit(items, table, limit, 0.3, time_budget_s=10,
+                                         volume_limit_l=volume)
+        assert total_weight(trimmed, table) <= limit - 0.3 + 1e-9
+        assert total_volume(trimmed, table) <= volume + 1e-9
+        assert _score(trimmed, items, table) == _brute_force(items, table, limit, 0.3, volume)
+
+
+def test_base_trim_does_not_grow_the_base_lists():
+    entry = _base_entry("Cold", [])
+    before = dict(entry["trims"])
+    for n in range(20):
+        trimmed, info = base_trim("Cold", [], 4 + n / 7, safety_buffer=0.1 * n)
+        assert (trimmed, info) == trim_to_limit(entry["items"], WEIGHT_TABLE, 4 + n / 7,
+                                                safety_buffer=0.1 * n)
+    assert entry["trims"] == before
+    limit, volume = next(iter(before))[:2]
+    assert base_trim("Cold", [], limit, volume_l=volume) == before[limit, volume, 0.3, "greedy"]
+
+
+def test_trim_cache_never_mixes_short_lived_catalogs():
+    for n in range(50):   # a new catalog often gets the id of the one just freed
+        table = ItemCatalog([{"Thing": {"weight": 1.0 if n % 2 else 0.1}}])
+        trimmed, _ = cached_trim_to_limit({"Thing": 5}, table, 1.3)
+        assert trimmed == ({"Thing": 1} if n % 2 else {"Thing": 5})